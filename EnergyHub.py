@@ -39,708 +39,693 @@
     feed in price:      https://www.roedl.com/renewable-energy-consulting/markets/countries/marketing-models-brazil#:~:text=Differently%20from%20some%20developed%20countries,used%20is%20%E2%80%9CNet%20Metering%E2%80%9D.
 """
 
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
+import argparse
 import csv
+from types import SimpleNamespace
 
-import cvxpy as cp
-import mosek
-import data_import
-
-#Help functions
-def pie_plot_production(name):
-    # Energy sources and their respective production values
-    energy_sources = ['Solar', 'Natural Gas','CHP','HeatPump', 'Grid']
-    production_values = [P_out_pv.value.sum(), P_out_gb.value.sum(), P_out_heat_chp.value.sum()+P_out_elec_chp.value.sum() , P_out_gshp.value.sum(), Imp_elec.value.sum()]
-
-    # Creating the pie plot
-    plt.figure(figsize=(8, 8))
-    plt.pie(production_values, labels=energy_sources, autopct='%1.1f%%', startangle=140)
-    plt.title('Energy Production by Source')
-    plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-    plt.legend()
-    plt.savefig(name,dpi=300)
-    plt.show()
-
-
-def pie_plot_capacity(name):
-    # Energy sources and their respective production values
-    energy_sources = ['Solar', 'Natural Gas','CHP' ,'HeatPump', 'Battery', 'Heat Storage']
-    production_values = [Cap_pv.value.sum(), Cap_gb.value.sum(),Cap_chp.value.sum(),Cap_gshp.value.sum(), Cap_bat.value.sum(), Cap_ts.value.sum()]
-
-    # Filter out energy sources with production values of zero
-    filtered_sources = []
-    filtered_values = []
-    for source, value in zip(energy_sources, production_values):
-        if value != 0:
-            filtered_sources.append(source)
-            filtered_values.append(value)
-
-    # Creating the pie plot
-    plt.figure(figsize=(8, 8))
-    plt.pie(filtered_values,labels=[f'{source}: {value}' for source, value in zip(filtered_sources, filtered_values)], startangle=140)
-    plt.title('Capacity Installed by Source')
-    plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-    plt.legend()
-    plt.savefig(name, dpi=300)
-    plt.show()
-
-#Energy Demands
-"""
-
-BRAZIL DATA IMPORT
-
-"""
-
-elec_demand, heat_demand = data_import.get_data()
+import numpy as np
 
-"""
+import sweep
+import telemetry
 
-IMPORT FINISH
+# Importing this module only defines the model and the workflow. pandas, matplotlib, cvxpy and the solvers are
+# imported by the functions that use them, so batch workers that build and solve a single scenario start fast.
+# The figures are drawn by figures.py.
 
-"""
+# Compiled problems of build_model by (objective, co2 bound set, investment bound set)
+PROBLEMS = {('cost', False, False): 'prob_min_cost', ('co2', False, False): 'prob_min_co2',
+            ('cost', True, False): 'prob_min_cost_co2', ('cost', False, True): 'prob_min_cost_inv',
+            ('cost', True, True): 'prob_min_cost_co2_inv', ('co2', False, True): 'prob_min_co2_inv'}
 
-# Renewable energy potentials
-# ============================
-#solar = pd.read_excel('solar.xlsx', header=None, names=['Solar radiation [kWh/m2]'])
-solar = pd.read_csv('maruas_solar.csv', delimiter=',', comment='#')['swgdn']*0.001 # in kWh/m2
-solar_header = solar.head(4)
-solar.drop(solar.index[:4], inplace=True)
-both_solar = [solar, solar_header]
-solar = pd.concat(both_solar, ignore_index=True)
-assert len(solar) == 8760
-
-
-wind = pd.read_excel('wind.xlsx', header=None, names=['Wind speed [m/s]'])
-
-# Optimization horizon
-# =====================
-Horizon = 8760  # Hours in a calendar year
-
-# Discounted cash flow calculations
-# ==================================
-d = 0.03  # Interest rate used to discount future operational cashflows
-
-# Connections with energy grids at the input of the energy system
-# ================================================================
-
-# Variable definitions
-# --------------------
-Imp_elec = cp.Variable(Horizon)  # Electricity import from the grid for every time step [kWh]
-Imp_gas = cp.Variable(Horizon)  # Natural gas import from the grid for every time step [kWh]
-Exp_elec = cp.Variable(Horizon)  # Electricity export from the grid for every time step [kWh]
-
-# Parameter definitions
-# ---------------------
-price_gas = 0.21*1.4  # Natural gas price [CHF, EUR, USD/kWh]  # USD: 0.231*1.4; CHF 0.21*1.4
-esc_gas = 0.02  # Escalation rate per year for natural gas price # assumption: 2% per year -> average inflation rate
-price_elec = 0.16  # Grid electricity price [CHF/kWh]
-esc_elec = 0.02  # Escalation rate per year for electricity price
-exp_price_elec = 0.0  # Feed-in tariff for exported electricity [CHF/kWh] #assumption no export possible -> a feed-in-tariff does not seem to be avaialble to such an extent in Brazil as in Europe, see following source for more information: https://www.roedl.com/renewable-energy-consulting/markets/countries/marketing-models-brazil#:~:text=Differently%20from%20some%20developed%20countries,used%20is%20%E2%80%9CNet%20Metering%E2%80%9D.
-esc_elec_exp = 0.02  # Escalation rate per year for feed-in tariff for exported electricity [%]
-co2_gas = 0.198  # Natural gas emission factor [kgCO2/kWh]
-co2_elec = 0.1295  # Electricity emission factor [kgCO2/kWh]
-
-# Constraint definitions
-# ----------------------
-grid_con = [Imp_elec >= 0, Imp_gas >= 0, Exp_elec >= 0]
-
-## Natural gas boiler (gb)
-# ========================
-
-# Parameter definitions
-# ---------------------
-eff_gb = 0.9  # Conversion efficiency of gas boiler
-cost_gb = 110  # Investment cost for gas boiler [CHF, EUR, USD/kW]
-jobs_created_gb = 0.00237 #[job years/ kW] excluding fuel related jobs as we have a pipeline already built with fuel available
-
-# Capacity variable
-# ------------------
-Cap_gb = cp.Variable(1)  # Capacity of natural gas boiler [kW]
-
-# Input and output variables
-# --------------------------
-P_in_gb = cp.Variable(Horizon)  # Input energy to natural gas boiler [kWh]
-P_out_gb = cp.Variable(Horizon)  # Heat generation by natural gas boiler [kWh]
-
-# Gas boiler constraints
-# ----------------------
-gb_con = [Cap_gb >= 0, P_out_gb == P_in_gb * eff_gb, P_in_gb >= 0, P_out_gb >= 0, P_out_gb <= Cap_gb]
-
-# Ground-source heat pump (gshp)
-# ===============================
-
-# Parameter definitions
-# ---------------------
-eff_gshp = 4  # Conversion efficiency (Coefficient of Performance) of ground-source heat pump
-cost_gshp = 850  # Investment cost for ground-source heat pump [CHF, EUR, USD/kW]
-jobs_created_gshp = 0.0073 #[job years/ kW]
-
-# Capacity variables
-# ------------------
-Cap_gshp = cp.Variable(1)  # Capacity of ground-source heat pump [kW]
-
-# Input and output variables
-# --------------------------
-P_in_gshp = cp.Variable(Horizon)  # Input energy to ground-source heat pump [kWh]
-P_out_gshp = cp.Variable(Horizon)  # Heat generation by ground-source heat pump [kWh]
-
-# GSHP constraints
-# ----------------
-gshp_con = [Cap_gshp >= 0, P_out_gshp == P_in_gshp * eff_gshp, P_in_gshp >= 0, P_out_gshp >= 0, P_out_gshp <= Cap_gshp]
-
-# Combined heat and power engine (chp)
-# =====================================
-
-# Parameter definitions
-# ---------------------
-eff_elec_chp = 0.3  # Electrical efficiency of combined heat and power engine
-eff_heat_chp = 0.6  # Thermal efficiency of combined heat and power engine
-cost_chp = 700  # Investment cost for combined heat and power engine [CHF, EUR, USD/kWe]
-jobs_created_chp = 0.00076 # [job-years/kW]
-
-# Capacity variable
-# -----------------
-Cap_chp = cp.Variable(1)  # Electrical capacity of combined heat and power engine [kWe]
-
-# Input and output variables
-# --------------------------
-P_in_chp = cp.Variable(Horizon)  # Input energy to combined heat and power engine (natural gas) [kWh]
-P_out_heat_chp = cp.Variable(Horizon)  # Heat generation by combined heat and power engine [kWh]
-P_out_elec_chp = cp.Variable(Horizon)  # Electricity generation by combined heat and power engine [kWh]
-
-# CHP constraints
-# ---------------
-chp_con = [Cap_chp >= 0, P_out_heat_chp == P_in_chp * eff_heat_chp, P_out_elec_chp == P_in_chp * eff_elec_chp,
-           P_in_chp >= 0, P_out_heat_chp >= 0, P_out_elec_chp >= 0, P_out_elec_chp <= Cap_chp]
-
-# Photovoltaic panels
-# ====================
-
-# Parameter definitions
-size_favela = 1.2e6  # Area of the favela [m2]
-percentage_area_roof = 0.3  # Percentage of the favela area that can be used for photovoltaic panels
-jobs_created_pv = 0.0341 #[job years/ kW]
-
-# Definitions
-# -----------
-eff_pv = 0.15  # Conversion efficiency (Coefficient of Performance) of photovoltaic panels
-cost_pv = 250  # Investment cost for photovoltaic panels [CHF, EUR, USD/m2]
-max_solar_area = size_favela*percentage_area_roof  # Maximum available area to accommodate photovoltaic panels [m2]
-
-# Capacity variable
-# -----------------
-Cap_pv = cp.Variable(1)  # Capacity of photovoltaic panels [m2]
-
-# Input and output variables
-# --------------------------
-P_out_pv = cp.Variable(Horizon)  # Electricity generation by photovoltaic panels [kWh]
-
-# PV constraints
-# --------------
-pv_con = [Cap_pv >= 0, Cap_pv <= max_solar_area, P_out_pv >= 0,
-          P_out_pv == solar.values * Cap_pv * eff_pv]
-
-# Wind turbine -> not considered
-# =============
 
-# Definitions
-# -----------
-cut_out_wind_speed = 25  # Cut-off wind speed [m/s]
-cut_in_wind_speed = 3  # Cut-in wind speed [m/s]
-rated_wind_speed = 12.5  # Rated wind speed [m/s]
-cost_wind = 1600  # Investment cost for wind turbines [CHF, EUR, USD/kW]
-max_wind_cap = 0  # Maximum possible capacity of wind turbines that can be accommodated [kW]
-
-# Capacity variable
-# -----------------
-Cap_wind = cp.Variable(1)  # Capacity of wind turbines [kW]
-
-# Input and output variables
-# --------------------------
-P_out_wind = cp.Variable(Horizon)  # Electricity generation by wind turbines [kWh]
-
-# Wind constraints
-# ----------------
-wind_con = [Cap_wind == 0, Cap_wind <= max_wind_cap, P_out_wind >= 0]
-
-for t in np.arange(0, 8760):
-    if wind.loc[t, 'Wind speed [m/s]'] <= cut_in_wind_speed or wind.loc[t, 'Wind speed [m/s]'] >= cut_out_wind_speed:
-        wind_con = wind_con + [P_out_wind[t] == 0]
-    elif wind.loc[t, 'Wind speed [m/s]'] < cut_out_wind_speed and wind.loc[t, 'Wind speed [m/s]'] >= rated_wind_speed:
-        wind_con = wind_con + [P_out_wind[t] == Cap_wind]
+#Help functions
+def aggregation_error(hub_full, hub_agg, cache):
+    # Relative error in cost and co2 of the cost optimal design of the aggregated model against the full hourly model
+    for hub in [hub_full, hub_agg]:
+        if cache is None:
+            hub.prob_min_cost.solve(solver='SCIPY')
+        else:
+            cache.solve(hub.prob_min_cost, solver='SCIPY')
+    error_cost = (hub_agg.cost.value[0] - hub_full.cost.value[0]) / hub_full.cost.value[0]
+    error_co2 = (hub_agg.co2.value - hub_full.co2.value) / hub_full.co2.value
+    return error_cost, error_co2
+
+
+def set_inputs(hub, elec_demand, heat_demand, solar=None, wind_speed=None, size_favela=None):
+    """ Set other hourly inputs (and favela area) of model hub, e.g. for another site. Returns the model.
+
+    The demands, the area and the yields of the renewables (from the solar radiation and wind speeds, see
+    components.set_resources) are parameters, so the compiled problems of hub stay valid. The series must have the
+    length of the model's horizon.
+    """
+    import components
+
+    n = hub.Horizon
+    if solar is not None or wind_speed is not None:
+        if solar is not None:
+            hub.solar = np.asarray(solar, dtype=float)[:n]
+        if wind_speed is not None:
+            hub.wind_speed = np.asarray(wind_speed, dtype=float)[:n]
+        components.set_resources(hub.renewable, {'solar': hub.solar, 'wind_speed': hub.wind_speed}, n, hub.dt)
+        vars(hub).update({name: value for name, value in hub.renewable.attrs.items() if name.startswith('cf_')})
+    hub.elec_demand = np.asarray(elec_demand, dtype=float)[:n]
+    hub.heat_demand = np.asarray(heat_demand, dtype=float)[:n]
+    hub.elec_load.value = hub.elec_demand
+    hub.heat_load.value = hub.heat_demand
+    if size_favela is not None:
+        hub.size_favela = size_favela
+        hub.max_solar_area.value = size_favela * hub.percentage_area_roof
+    return hub
+
+
+def update_op_prices(hub):
+    """ Set the discounted 25-year energy prices of hub from its prices (parameters) and escalation rates (numbers).
+
+    Call after changing price_gas, price_elec, exp_price_elec or an escalation rate esc_gas, esc_elec, esc_elec_exp
+    (the prices of the streams of the grid block, see components.grid_block).
+    """
+    for stream, (_, price, _) in hub.streams.items():
+        escalation = np.power(1 + getattr(hub, 'esc_' + stream), hub.years - 1)
+        getattr(hub, 'escalation_' + stream).value = escalation
+        setattr(hub, 'op_factor_' + stream, np.sum(escalation * hub.discount))
+        getattr(hub, 'op_price_' + stream).value = getattr(hub, 'op_factor_' + stream) * getattr(hub, price).value
+
+
+def set_parameters(hub, values):
+    """ Set parameters of hub by name, e.g. {'price_gas': 0.3, 'esc_gas': 0.03, 'eff_pv': 0.17}.
+
+    Names are cvxpy parameters of build_model or the escalation rates; the compiled problems stay valid.
+    """
+    import cvxpy as cp
+
+    for name, value in values.items():
+        attr = getattr(hub, name, None)
+        if name.startswith('esc_') and attr is not None:
+            setattr(hub, name, float(value))
+        elif isinstance(attr, cp.Parameter):
+            attr.value = value
+        else:
+            raise ValueError(f'{name!r} is not a parameter of the energy hub')
+    update_op_prices(hub)
+
+
+def build_model(elec_demand, heat_demand, solar, wind_speed, rep_days=None, storage_start=None, heat_penalty=None,
+                dt=1, technologies=None, data_years=None):
+    """ Build the energy hub model for the given hourly demands [kWh], solar radiation [kWh/m2] and wind speeds [m/s].
+
+    With dt the series have time steps of dt hours instead (energies per step, see aggregation.resample); capacity
+    limits, storage rates and self-discharge are scaled to the step length.
+
+    With rep_days (see aggregation.representative_days) the series are those of the representative days and the
+    storage states are linked across the year. With storage_start = (E_ts_start, E_bat_start) (one value per storage
+    of the technology table) the stored energy at the start of the horizon is given by the parameters E_ts_start and
+    E_bat_start (initialized to these values) instead of empty storages. With heat_penalty [CHF, EUR, USD/kWh] heat
+    demand may be left unmet (Unmet_heat) at this cost, which keeps problems with fixed capacities feasible.
+    technologies is the technology table (see components.load_technologies) or the path of its JSON file (default:
+    technologies.json). data_years is the number of years the operation is averaged over (default: the years of the
+    input series), e.g. that of the whole input for a time block of it. Returns all variables, parameters,
+    expressions, constraints and problems of the model by their names.
+    """
+    import cvxpy as cp
+    import components
+    import data_import
+
+    # Optimization horizon
+    # =====================
+    Horizon = len(elec_demand)  # Time steps of the input series: one or several calendar years (or the representative days)
+    if rep_days is not None and dt != 1:
+        raise ValueError('Representative days are only available with hourly time steps')
+
+    # Site inputs
+    # ============
+    # The demands enter as parameters, so the compiled problems can be reused for the demands of other sites (see
+    # set_inputs). They are right hand sides only, so compiling stays linear in the horizon.
+    elec_load = cp.Parameter(Horizon, value=np.asarray(elec_demand[:Horizon], dtype=float))  # Electricity demand [kWh]
+    heat_load = cp.Parameter(Horizon, value=np.asarray(heat_demand[:Horizon], dtype=float))  # Heat demand [kWh]
+
+    # Yearly sum of an hourly quantity (on representative days, every hour counts for all the days it represents)
+    # ============================================================================================================
+    # Input series of several years (e.g. weather years) are averaged to one typical year of operation
+    if data_years is None:
+        data_years = max(1, round((Horizon * dt if rep_days is None else len(rep_days.days) * 24) / 8760))
+
+    def annual(x):
+        total = cp.sum(x) if rep_days is None else rep_days.weights @ x
+        return total if data_years == 1 else total / data_years
+
+    # Discounted cash flow calculations
+    # ==================================
+    d = 0.03  # Interest rate used to discount future operational cashflows
+
+    # Technologies
+    # =============
+    # Grid connections, conversion technologies, renewables and storages are read from the technology table (see
+    # components.py and technologies.json). Every class is one block of stacked variables and vectorized
+    # constraints; the parameters, flows and capacities of every technology are attributes of the hub by name.
+    if not isinstance(technologies, dict):
+        technologies = components.load_technologies(technologies)
+
+    # Bounds of the site
+    size_favela = data_import.SIZE_FAVELA  # Area of the favela [m2]
+    percentage_area_roof = 0.3  # Percentage of the favela area that can be used for photovoltaic panels
+    max_wind_cap = 0  # Maximum possible capacity of wind turbines that can be accommodated [kW] -> wind not considered
+    site_bounds = {'max_solar_area': size_favela * percentage_area_roof, 'max_wind_cap': max_wind_cap}
+
+    grid = components.grid_block(technologies['grid'], Horizon)
+    conversion = components.conversion_block(technologies['conversion'], Horizon, dt, site_bounds)
+    renewable = components.renewable_block(technologies['renewable'], Horizon, dt, site_bounds,
+                                           {'solar': solar, 'wind_speed': wind_speed})
+    storage = components.storage_block(technologies['storage'], Horizon, dt, site_bounds, rep_days, storage_start)
+    blocks = [grid, conversion, renewable, storage]
+    streams = grid.streams
+    attrs = {name: value for block in blocks for name, value in block.attrs.items()}
+
+    # Balance equations
+    # ==================
+    # One balance per carrier (the columns of CARRIERS): supply of all blocks == demand, for every time step
+    carriers = components.CARRIERS
+    column = {carrier: np.eye(len(carriers))[[i]] for i, carrier in enumerate(carriers)}
+    supply = sum(block.flow for block in blocks if block.flow is not None)
+    demand = cp.reshape(elec_load, (Horizon, 1), order='C') @ column['elec'] + cp.reshape(heat_load, (Horizon, 1), order='C') @ column['heat']
+    if heat_penalty is None:
+        balance_con = [supply == demand]
     else:
-        wind_con = wind_con + [P_out_wind[t] == Cap_wind * (wind.loc[t, 'Wind speed [m/s]'] - cut_in_wind_speed) / (
-                    rated_wind_speed - cut_in_wind_speed)]
-
-# Thermal storage tank
-# =====================
-
-# Definitions
-# -----------
-self_dis_ts = 0.01  # Self-discharging losses of thermal storage tank
-ch_eff_ts = 0.9  # Charging efficiency of thermal storage tank
-dis_eff_ts = 0.9  # Discharging efficiency of thermal storage tank
-max_ch_ts = 0.25  # Maximum charging rate of thermal storage tank (given as percentage of tank capacity)
-max_dis_ts = 0.25 # Maximum discharging rate of thermal storage tank
-cost_ts = 30  # Investment cost for thermal storage tank [CHF, EUR, USD/kWh]
-jobs_created_ts = 0.00023 #[job years/ kW]
-
-# Capacity variables
-# ------------------
-Cap_ts = cp.Variable(1)  # Capacity of thermal storage tank [kWh]
-
-# Storage variables
-# -----------------
-Q_in_ts = cp.Variable(Horizon)  # Input energy flow to thermal storage tank [kWh]
-Q_out_ts = cp.Variable(Horizon)  # Output energy flow from thermal storage tank [kWh]
-E_ts = cp.Variable(Horizon + 1)  # Stored energy in thermal storage tank [kWh]
-
-# Storage tank constraints
-# ------------------------
-ts_con_1 = [Cap_ts >= 0, Q_in_ts >= 0, Q_out_ts >= 0, E_ts >= 0, E_ts <= Cap_ts, Q_in_ts <= max_ch_ts * Cap_ts,
-            Q_out_ts <= max_dis_ts * Cap_ts]
-
-# Storage constraints
-# -------------------
-ts_con_2 = [E_ts[1:] == (1 - self_dis_ts) * E_ts[:-1] + ch_eff_ts * Q_in_ts - (1 / dis_eff_ts) * Q_out_ts, E_ts[0] == 0]
-
-# Combine constraints
-# -------------------
-ts_con = ts_con_1 + ts_con_2
-
-# Battery
-# ========
-
-# Definitions
-# -----------
-self_dis_bat = 0.001  # Self-discharging losses of battery
-ch_eff_bat = 0.95  # Charging efficiency of battery
-dis_eff_bat = 0.95  # Discharging efficiency of battery
-max_ch_bat = 0.30   # Maximum charging rate of battery (as percentage of capacity)
-max_dis_bat = 0.30  # Maximum discharging rate of battery
-cost_bat = 350  # Investment cost for battery [CHF, EUR, USD/kWh]
-jobs_created_bat = 0.0281 #[job years/ kW]
-
-# Capacity variables
-# ------------------
-Cap_bat = cp.Variable(1)  # Capacity of battery [kWh]
-
-# Storage variables
-# -----------------
-Q_in_bat = cp.Variable(Horizon)  # Input energy flow to battery [kWh]
-Q_out_bat = cp.Variable(Horizon)  # Output energy flow from battery [kWh]
-E_bat = cp.Variable(Horizon + 1)  # Stored energy in battery [kWh]
-
-# Battery constraints
-# -------------------
-bat_con_1 = [Cap_bat >= 0, Cap_bat <= 70000, Q_in_bat >= 0, Q_out_bat >= 0, E_bat >= 0, E_bat <= Cap_bat,
-             Q_in_bat <= max_ch_bat * Cap_bat, Q_out_bat <= max_dis_bat * Cap_bat] # Max Capacity of Battery included for a more realistic scenario: see source at the top of the code
-
-# Battery constraints
-# -------------------
-bat_con_2 = [E_bat[1:] == (1 - self_dis_bat) * E_bat[:-1] + ch_eff_bat * Q_in_bat - (1 / dis_eff_bat) * Q_out_bat,
-             E_bat[1] == 0]
-
-# Combine constraints
-# -------------------
-bat_con = bat_con_1 + bat_con_2
-
-# Balance equations
-# ==================
-heat_con = [P_out_heat_chp + P_out_gshp + P_out_gb + Q_out_ts - Q_in_ts == heat_demand[:Horizon]]  # Heat balance
-power_con = [Imp_elec + P_out_pv + P_out_wind + P_out_elec_chp - P_in_gshp + Q_out_bat - Q_in_bat == elec_demand[
-                                                                                                     :Horizon] + Exp_elec]  # Electricity balance
-gas_con = [Imp_gas - P_in_gb - P_in_chp == 0]  # Natural gas balance
-
-# Objective function
-# ===================
-
-# Total costs: Investment costs + 25 years of energy costs
-# --------------------------------------------------------
-Inv = Cap_gb * cost_gb + Cap_gshp * cost_gshp + Cap_chp * cost_chp + Cap_pv * cost_pv + Cap_wind * cost_wind + Cap_ts * cost_ts + Cap_bat * cost_bat
-
-Op = cp.Variable(25)
-op_con = []
-for y in np.arange(0, 25):
-    op_con = op_con + [Op[y] == cp.sum(Imp_gas * price_gas * (np.power(1 + esc_gas, y - 1))) + cp.sum(
-        Imp_elec * price_elec * (np.power(1 + esc_elec, y - 1))) - cp.sum(
-        Exp_elec * exp_price_elec * (np.power(1 + esc_elec_exp, y - 1)))]
-
-cost = Inv + cp.sum(Op / np.power((1 + d), np.arange(1, 26)))
-co2 = 25 * cp.sum(Imp_gas * co2_gas + Imp_elec * co2_elec)
-jobs = Cap_gb * jobs_created_gb + Cap_chp*jobs_created_chp + Cap_gshp * jobs_created_gshp + Cap_pv * jobs_created_pv + Cap_ts * jobs_created_ts + Cap_bat * jobs_created_bat
-
-# Collect all constraints
-# ========================
-constraints = grid_con + gb_con + gshp_con + chp_con + pv_con + wind_con + ts_con + bat_con + heat_con + power_con + gas_con + op_con
-
-# Start the optimization
-# =======================
-
-# Select the desired objective
-# ----------------------------
-#objective = cost
-# objective = co2
-
-#prob = cp.Problem(cp.Minimize(objective), constraints)
-# Optimize the design of the energy system
-# ----------------------------------------
-
-print('Installed solvers:', cp.installed_solvers())
-#prob.solve(solver='SCIPY')
-
-
-#Multi Objective Optimization -> cost and co2
-eta = [i/10 for i in range(1,10,1)]
-sol_cost = []
-sol_co2 = []
-#initial optimization
-#minimze cost optimal
-prob = cp.Problem(cp.Minimize(cost), constraints)
-prob.solve(solver='SCIPY')
-sol_cost.append(cost.value)
-sol_co2.append(co2.value)
-pie_plot_production("pie_plot_production_min_cost.png")
-pie_plot_capacity("pie_plot_capacity_min_cost.png")
-total_area_pv = Cap_pv.value
-print("Total area of PV panels installed in cost optimal case: ", total_area_pv)
-print("Percentage of roof area covered by PV panels in cost optimal case: ", total_area_pv / max_solar_area * 100, "%")
-
-#minimize co2 optimal
-prob = cp.Problem(cp.Minimize(co2), constraints)
-prob.solve(solver='SCIPY')
-sol_cost.append(cost.value)
-sol_co2.append(co2.value)
-pie_plot_production("pie_plot_production_min_emission.png")
-pie_plot_capacity("pie_plot_capacity_min_emission.png")
-total_area_pv = Cap_pv.value
-print("Total area of PV panels installed in emission optimal case: ", total_area_pv)
-print("Percentage of roof area covered by PV panels in emission optimal case: ", total_area_pv / max_solar_area * 100, "%")
-
-
-
-for i in eta:
-    print('Multi Objective Optimization with eta = ', i)
-    co2_con = [co2 <= sol_co2[1]+i*(sol_co2[0]-sol_co2[1])]
-    constraints_mo = constraints + co2_con
-    #minimize cost and co2
-    prob = cp.Problem(cp.Minimize(cost), constraints_mo)
-    prob.solve(solver='SCIPY')
-    sol_cost.append(cost.value)
-    sol_co2.append(co2.value)
-
-
-print(sol_co2)
-print(sol_cost)
+        Unmet_heat = cp.Variable(Horizon, name='Unmet_heat')  # Heat demand that is not met [kWh]
+        balance_con = [supply + cp.reshape(Unmet_heat, (Horizon, 1), order='C') @ column['heat'] == demand, Unmet_heat >= 0]
+
+    # Objective function
+    # ===================
+
+    # Total costs: Investment costs + 25 years of energy costs
+    # --------------------------------------------------------
+    Inv = cp.reshape(sum(block.cost @ block.Cap for block in blocks[1:] if block.Cap is not None), (1,), order='C')
+
+    # Operational costs of the 25 years: the yearly energy costs only differ by the escalation of the prices, so the
+    # escalated and discounted costs of each price stream collapse into a single price on the yearly energy bought/sold.
+    # Products of parameters are not DPP, so these prices are parameters of their own, set from the prices and the
+    # escalation rates by update_op_prices (before every solve of EnergyHubModel)
+    years = np.arange(0, 25)
+    discount = 1 / np.power((1 + d), years + 1)
+    # Price of every year relative to the price [-] and discounted costs (revenue) of the 25 years per kWh imported
+    # (exported) in a year, by stream (gas, elec, elec_exp)
+    escalation = {stream: cp.Parameter(len(years), nonneg=True) for stream in streams}
+    op_price = {stream: cp.Parameter(nonneg=True) for stream in streams}
+
+    # Operational costs in every year (for reporting only, not part of the problem)
+    Op = sum(sign * annual(attrs[flow]) * attrs[price] * escalation[stream] for stream, (flow, price, sign) in streams.items())
+
+    cost = Inv + sum(sign * op_price[stream] * annual(attrs[flow]) for stream, (flow, _, sign) in streams.items())
+    if heat_penalty is not None:
+        cost = cost + heat_penalty * annual(Unmet_heat)
+    co2 = 25 * annual(grid.emissions)
+    jobs = cp.reshape(sum(block.jobs @ block.Cap for block in blocks[1:] if block.Cap is not None), (1,), order='C')
+
+    # Collect all constraints
+    # ========================
+    constraints = [con for block in blocks for con in block.constraints] + balance_con
+    capacities = [name for block in blocks[1:] for name in block.capacities]
+    upper_bounds = {name: bound for block in blocks[1:] for name, bound in block.upper_bounds.items()}
+    slots = {name: slot for block in blocks for name, slot in block.slots.items()}
+
+    # Bounds used in the multi objective and investment analysis
+    # ===========================================================
+    co2_max = cp.Parameter(nonneg=True)  # Epsilon bound on the total emissions [kgCO2]
+    inv_max = cp.Parameter(nonneg=True)  # Upper bound on the investment costs [CHF, EUR, USD]
+
+    # Compiled problems
+    # ==================
+    # All prices, costs, efficiencies and bounds enter as parameters (DPP), so every problem is canonicalized
+    # once on its first solve and later solves only update the parameter values.
+    prob_min_cost = cp.Problem(cp.Minimize(cost), constraints)
+    prob_min_co2 = cp.Problem(cp.Minimize(co2), constraints)
+    prob_min_cost_co2 = cp.Problem(cp.Minimize(cost), constraints + [co2 <= co2_max])
+    prob_min_cost_inv = cp.Problem(cp.Minimize(cost), constraints + [Inv <= inv_max])
+    prob_min_cost_co2_inv = cp.Problem(cp.Minimize(cost), constraints + [co2 <= co2_max, Inv <= inv_max])
+    prob_min_co2_inv = cp.Problem(cp.Minimize(co2), constraints + [Inv <= inv_max])
+
+    hub = SimpleNamespace(**locals())
+    del hub.cp, hub.components, hub.data_import
+    vars(hub).update(attrs)
+    vars(hub).update({'escalation_' + stream: value for stream, value in escalation.items()})
+    vars(hub).update({'op_price_' + stream: value for stream, value in op_price.items()})
+    update_op_prices(hub)
+    return hub
+
+
+def load_inputs():
+    """ Hourly input series (elec_demand, heat_demand, solar, wind_speed) of the favela, read from the data files.
+
+    The parsed series are kept in .input_cache and only parsed again when one of the data files changes.
+    """
+    import data_import
+    import input_cache
+
+    with telemetry.phase('inputs'):
+        #Energy Demands
+        elec_demand, heat_demand = input_cache.load('demand', data_import.demand_files() + ['manaus_heat.csv'], data_import.get_data)
+
+        # Renewable energy potentials
+        # ============================
+        solar = input_cache.load('solar', ['maruas_solar.csv'], data_import.get_solar)
+        wind_speed = input_cache.load('wind', ['wind.xlsx'], data_import.get_wind)
+
+    return elec_demand, heat_demand, solar, wind_speed
+
+
+class EnergyHubModel:
+    """ Energy hub as a library object, with separate steps to build the model, solve it and read the results.
+
+        model = EnergyHubModel().build()  # Inputs from the data files, or EnergyHubModel((elec, heat, solar, wind))
+        model.solve('cost', co2_max=5e6)
+        model.results()['Cap_pv']
+
+    aggregation_days optimizes that many representative days instead of the full year. dt optimizes time steps of
+    dt hours (e.g. 2, 4 or 24 for screening, 0.25 for storage detail) with the hourly inputs resampled. cache is
+    True for a solve_cache.SolveCache in .solve_cache, a SolveCache, or None to always solve. technologies is the
+    technology table or its JSON file (default: technologies.json, see components.py).
+    """
+
+    def __init__(self, inputs=None, aggregation_days=None, cache=True, solver='SCIPY', dt=1, technologies=None):
+        self.inputs = inputs
+        self.aggregation_days = aggregation_days
+        self.dt = dt
+        self.technologies = technologies
+        self.solver = solver
+        if cache is True:
+            import solve_cache
+            cache = solve_cache.SolveCache()
+        self.cache = cache
+        self.rep_days = None
+        self.hub = None
+
+    def build(self):
+        """Build the model (loading the inputs from the data files if none were given). Returns the model itself."""
+        if self.inputs is None:
+            self.inputs = load_inputs()
+        with telemetry.phase('build'):
+            if self.dt != 1:
+                import aggregation
+                if self.aggregation_days is not None:
+                    raise ValueError('Representative days are only available with hourly time steps')
+                elec, heat, solar, wind = self.inputs
+                self.hub = build_model(*[aggregation.resample(x, self.dt) for x in (elec, heat, solar)],
+                                       aggregation.resample(wind, self.dt, mean=True), dt=self.dt,
+                                       technologies=self.technologies)
+            elif self.aggregation_days is None:
+                self.hub = build_model(*self.inputs, technologies=self.technologies)
+            else:
+                import aggregation
+                self.rep_days = aggregation.representative_days(list(self.inputs[:3]), self.aggregation_days)
+                self.hub = build_model(*[aggregation.aggregate(x, self.rep_days) for x in self.inputs], rep_days=self.rep_days,
+                                       technologies=self.technologies)
+        return self
+
+    def solve(self, objective='cost', extra_constraints=None, co2_max=None, inv_max=None):
+        """Minimize objective ('cost', 'co2' or a cvxpy expression of self.hub) and return its optimal value.
+
+        co2_max and inv_max bound the total emissions and investment costs, extra_constraints is a list of cvxpy
+        constraints on the variables of self.hub. Without extra constraints the compiled problems of the model are
+        reused, so repeated solves only update parameter values.
+        """
+        if self.hub is None:
+            self.build()
+        hub = self.hub
+        update_op_prices(hub)
+        if co2_max is not None:
+            hub.co2_max.value = co2_max
+        if inv_max is not None:
+            hub.inv_max.value = inv_max
+
+        key = (objective, co2_max is not None, inv_max is not None)
+        if isinstance(objective, str) and not extra_constraints and key in PROBLEMS:
+            name = PROBLEMS[key]
+            prob = getattr(hub, name)
+        else:
+            name = 'custom'
+            import cvxpy as cp
+            expr = getattr(hub, objective) if isinstance(objective, str) else objective
+            bounds = [hub.co2 <= hub.co2_max] if co2_max is not None else []
+            bounds += [hub.Inv <= hub.inv_max] if inv_max is not None else []
+            prob = cp.Problem(cp.Minimize(expr), hub.constraints + bounds + list(extra_constraints or []))
+
+        hits = self.cache.hits if self.cache is not None else 0
+        with telemetry.phase('solve'):
+            if self.cache is None:
+                value = prob.solve(solver=self.solver)
+            else:
+                value = self.cache.solve(prob, solver=self.solver)
+        cache_hit = self.cache is not None and self.cache.hits > hits
+        telemetry.problem(name, prob, self.solver, cache_hit=cache_hit)
+        if prob.status != 'optimal':
+            raise RuntimeError(f'Energy hub problem is {prob.status}')
+        return value
+
+    def results(self):
+        """KPIs, capacities and dispatch series of the last solve (and the demands), by the names of the model."""
+        from components import CAPACITIES
+        from dispatch import SERIES, STATES, series_of, states_of
+
+        hub = self.hub
+        capacities = CAPACITIES + [name for name in hub.capacities if name not in CAPACITIES]
+        series = SERIES + STATES + [name for name in series_of(hub) + states_of(hub) if name not in SERIES + STATES]
+        results = {name: float(np.sum(getattr(hub, name).value)) for name in ['cost', 'co2', 'jobs', 'Inv'] + capacities
+                   if hasattr(hub, name)}
+        results.update({name: np.asarray(getattr(hub, name).value, dtype=float).ravel() for name in series
+                        if hasattr(hub, name)})
+        results.update(elec_demand=np.asarray(hub.elec_demand, dtype=float), heat_demand=np.asarray(hub.heat_demand, dtype=float))
+        return results
+
+
+# Sweep points
+# =============
+# Independent solves of the sweeps, run in parallel by sweep.run_sweep (the forked workers inherit _model and
+# _store). Every point is a (scenario, bound) pair; its full results are written to the results store.
+_model = None
+_store = None
+
+
+def keep(scenario):
+    # Write the results of the last solve to the results store as scenario, and its telemetry record
+    if _store is not None:
+        with telemetry.phase('store'):
+            _store.put(scenario, _model.results())
+    telemetry.emit(scenario)
+
+
+def solve_co2_bound(point):
+    # Minimize cost with the total emissions bounded by bound [kgCO2]
+    scenario, bound = point
+    hub = _model.hub
+    _model.solve('cost', co2_max=bound)
+    keep(scenario)
+    return hub.cost.value, hub.co2.value, hub.jobs.value
+
+
+def solve_inv_bound(point):
+    # Minimize cost with the investment costs bounded by bound [CHF, EUR, USD]
+    scenario, bound = point
+    hub = _model.hub
+    _model.solve('cost', inv_max=bound)
+    keep(scenario)
+    return hub.cost.value, hub.co2.value, hub.jobs.value
+
+
+def run_workflow(model, processes=None, aggregation_check=True, plots='files', results_dir='results', front_solves=9,
+                 front_tol=1e-3):
+    """ Analysis of the study on a built model: cost/co2 and jobs sweeps, investment analysis and the node plots.
+
+    Writes the CSV files and figures of the repository, and the full results of every solved scenario to a
+    results_store.ResultsStore in results_dir. processes is the number of worker processes for the sweeps and
+    the figures (None: one per CPU core, 1: no parallelism). plots is 'files' to render the figures headless,
+    'show' to also open them in windows, or None to skip them. The cost-co2 front gets up to front_solves points
+    between the anchors, fewer if its error bound (see pareto.py) drops below front_tol first.
+    """
+    import cvxpy as cp
+
+    import figures
+    import pareto
+    import results_store
+
+    global _model, _store
+    _model = model
+    _store = store = results_store.ResultsStore(results_dir)
+    hub = model.hub
+    figure_jobs = []  # Figures of the run (function of figures.py, arguments), rendered at the end
+
+    # Time series aggregation
+    # ========================
+    # Report the error in cost and co2 of the aggregated model against the full hourly model
+    if model.aggregation_days is not None and aggregation_check:
+        with telemetry.phase('aggregation_check'):
+            hub_full = build_model(*model.inputs, dt=model.dt, technologies=model.technologies)
+            error_cost, error_co2 = aggregation_error(hub_full, hub, model.cache)
+        print(f'Aggregation to {model.aggregation_days} days: error in cost {error_cost:.2%}, error in co2 {error_co2:.2%}')
+    telemetry.emit('setup', horizon=hub.Horizon, dt=hub.dt, aggregation_days=model.aggregation_days)
+
+    # Start the optimization
+    # =======================
+
+    # Select the desired objective
+    # ----------------------------
+    #objective = cost
+    # objective = co2
+
+    #prob = cp.Problem(cp.Minimize(objective), constraints)
+    # Optimize the design of the energy system
+    # ----------------------------------------
+
+    print('Installed solvers:', cp.installed_solvers())
+    #prob.solve(solver='SCIPY')
+
+
+    #Multi Objective Optimization -> cost and co2
+    sol_cost = []
+    sol_co2 = []
+    #initial optimization
+    #minimze cost optimal
+    model.solve('cost')
+    keep('min_cost')
+    sol_cost.append(hub.cost.value)
+    sol_co2.append(hub.co2.value)
+    figure_jobs.append(('pie_plot_production', (store.load('min_cost'), "pie_plot_production_min_cost.png")))
+    figure_jobs.append(('pie_plot_capacity', (store.load('min_cost'), "pie_plot_capacity_min_cost.png")))
+    total_area_pv = hub.Cap_pv.value
+    print("Total area of PV panels installed in cost optimal case: ", total_area_pv)
+    print("Percentage of roof area covered by PV panels in cost optimal case: ", total_area_pv / hub.max_solar_area.value * 100, "%")
+
+    #minimize co2 optimal
+    model.solve('co2')
+    keep('min_co2')
+    sol_cost.append(hub.cost.value)
+    sol_co2.append(hub.co2.value)
+    figure_jobs.append(('pie_plot_production', (store.load('min_co2'), "pie_plot_production_min_emission.png")))
+    figure_jobs.append(('pie_plot_capacity', (store.load('min_co2'), "pie_plot_capacity_min_emission.png")))
+    total_area_pv = hub.Cap_pv.value
+    print("Total area of PV panels installed in emission optimal case: ", total_area_pv)
+    print("Percentage of roof area covered by PV panels in emission optimal case: ", total_area_pv / hub.max_solar_area.value * 100, "%")
 
-# Specify the file name
-file_name = "emissions_costs_data.csv"
 
-# Writing data to CSV file
-with open(file_name, 'w', newline='') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(["Emissions (kg)", "Costs"])  # Writing header
-    writer.writerows(zip(list(sol_co2), sol_cost))  # Writing data rows
 
-print("Data has been successfully saved to", file_name)
+    #minimize cost and co2
+    # Adaptive front between the two anchors: the segments with the largest approximation error are split first
+    front = pareto.adaptive_front(solve_co2_bound, (sol_co2[1], sol_cost[1][0]), (sol_co2[0], sol_cost[0][0]),
+                                  front_tol, front_solves, processes)
+    front_scenarios = ['min_co2'] + [scenario for scenario, _, _ in front] + ['min_cost']
+    print('Multi Objective Optimization with co2 bounds = ', [float(bound) for _, bound, _ in front])
+    for _, _, (cost_i, co2_i, jobs_i) in front:
+        sol_cost.append(cost_i)
+        sol_co2.append(co2_i)
+
+
+    print(sol_co2)
+    print(sol_cost)
+
+    # Specify the file name
+    file_name = "emissions_costs_data.csv"
+
+    # Writing data to CSV file
+    with open(file_name, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Emissions (kg)", "Costs"])  # Writing header
+        writer.writerows(zip(list(sol_co2), sol_cost))  # Writing data rows
+
+    print("Data has been successfully saved to", file_name)
+
+
+    # Plotting
+    # Front from the lowest emissions to the cost optimum
+    front_kpis = store.kpis(front_scenarios)
+    emission = list(front_kpis['co2'])
+    costs = list(front_kpis['cost'])
+    figure_jobs.append(('front_plot', (emission, costs, 'Emissions (kg)', 'Costs (CHF)', 'Emissions vs Costs', 'emission_vs_cost.png')))
+
+
+
+
+    #Multiobjective Optimization -> cost and jobs
+    """
+    Note that we tried to implement a multiobjective optimization with cost and jobs. 
+    However maximizing jobs did not converge even after adding constraints such as maximal allowed investment costs or 
+    an upper bound of capacity for each technology or an upper bound of jobs created.
+    Consequently, we decided to show jobs created as an output of the multiobjective optimization with cost and co2.
+    (Maximizing jobs is unbounded without a budget on the total cost; augmecon.py generates the cost, co2 and jobs
+    front with such a budget.)
+    """
+    sol_cost = []
+    sol_jobs = []
+    sol_co2 = []
+    #initial optimization
+    #minimze cost optimal
+    model.solve('cost')
+    sol_cost.append(hub.cost.value)
+    sol_jobs.append(hub.jobs.value)
+    sol_co2.append(hub.co2.value)
+
+    #minimize jobs optimal
+    model.solve('co2')
+    sol_cost.append(hub.cost.value)
+    sol_jobs.append(hub.jobs.value)
+    sol_co2.append(hub.co2.value)
+    #jobs_con = [jobs >= sol_jobs[0]+i*(sol_jobs[1]-sol_jobs[0])]
+    #jobs_max = [jobs <= 55361*25]
+    #inv_max = [Inv <= sol_cost[0]*2.5]
+    #minimize cost and co2 (the points of the cost-co2 front)
+    for _, _, (cost_i, co2_i, jobs_i) in front:
+        sol_cost.append(cost_i)
+        sol_jobs.append(jobs_i)
 
+    print(sol_jobs)
+    print(sol_cost)
 
-# Plotting
-sol_co2 = pd.read_csv('emissions_costs_data.csv')['Emissions (kg)']
-sol_cost = pd.read_csv('emissions_costs_data.csv')['Costs']
+    # Specify the file name
+    file_name = "jobs_costs_data.csv"
 
-emission = list(sol_co2)
-costs = [float(x[1:-1]) for x in sol_cost]
-emission = emission[1:] + [emission[0]]
-costs = costs[1:] + [costs[0]]
-plt.plot(emission, costs, marker='o', linestyle='-')
+    # Writing data to CSV file
+    with open(file_name, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Jobs", "Costs"])  # Writing header
+        writer.writerows(zip(list(sol_jobs), sol_cost))  # Writing data rows
 
-# Adding labels and title
-plt.xlabel('Emissions (kg)')
-plt.ylabel('Costs (CHF)')
-plt.title('Emissions vs Costs')
+    print("Data has been successfully saved to", file_name)
 
-# Displaying the plot
-plt.grid(True)
-plt.savefig('emission_vs_cost.png', dpi=300)
-plt.show()
+    # Plotting
+    jobs = list(front_kpis['jobs'])
+    costs = list(front_kpis['cost'])
+    figure_jobs.append(('front_plot', (jobs, costs, 'Jobs created', 'Costs (CHF)', 'Jobs vs Costs', 'jobs_vs_cost.png')))
 
 
+    #Investment Analysis
+    #Parameters
+    annual_income_per_persom = 155*12 #Income per person per year [US Dollar] # in CHF: 155*12; in USD: 170*12
+    percentage_invest = 0.01 #Percentage of income invested
+    populationsize = 55361 #Population size
+    average_government_exp = 180 #Average government expenses per person per year [US Dollar/Person] # in CHF: 180; in USD: 198
+    inv_base_case = hub.heat_demand.max()/hub.dt*hub.cost_chp.value*(hub.eff_elec_chp.value/hub.eff_heat_chp.value) #Investment for base case -> as there is no heat grid to import heat directly, at least the given heat demand must be met to ensure feasibility, thus there must be enough money to invest in the cheapest heat source to meet the maximum demand
+    Inv_bound = [inv_base_case,annual_income_per_persom*percentage_invest*populationsize, average_government_exp*populationsize]
 
+    inv_sol_cost = []
+    inv_sol_co2 = []
+    inv_sol_jobs = []
 
-#Multiobjective Optimization -> cost and jobs
-"""
-Note that we tried to implement a multiobjective optimization with cost and jobs. 
-However maximizing jobs did not converge even after adding constraints such as maximal allowed investment costs or 
-an upper bound of capacity for each technology or an upper bound of jobs created.
-Consequently, we decided to show jobs created as an output of the multiobjective optimization with cost and co2.
-"""
-eta = [i/10 for i in range(1,10,1)]
-sol_cost = []
-sol_jobs = []
-sol_co2 = []
-#initial optimization
-#minimze cost optimal
-prob = cp.Problem(cp.Minimize(cost), constraints)
-prob.solve(solver='SCIPY')
-sol_cost.append(cost.value)
-sol_jobs.append(jobs.value)
-sol_co2.append(co2.value)
-
-#minimize jobs optimal
-prob = cp.Problem(cp.Minimize(co2), constraints)
-prob.solve(solver='SCIPY')
-sol_cost.append(cost.value)
-sol_jobs.append(jobs.value)
-sol_co2.append(co2.value)
-for i in eta:
-    print('Multi Objective Optimization with eta = ', i)
-    #jobs_con = [jobs >= sol_jobs[0]+i*(sol_jobs[1]-sol_jobs[0])]
-    #jobs_max = [jobs <= 55361*25]
-    #inv_max = [Inv <= sol_cost[0]*2.5]
-    co2_con = [co2 <= sol_co2[1] + i * (sol_co2[0] - sol_co2[1])]
-    constraints_mo = constraints + co2_con #+ jobs_con + jobs_max #+ inv_max
+    print('Investment Analysis with bounds = ', Inv_bound)
     #minimize cost and co2
-    prob = cp.Problem(cp.Minimize(cost), constraints_mo)
-    prob.solve(solver='SCIPY')
-    sol_cost.append(cost.value)
-    sol_jobs.append(jobs.value)
-
-print(sol_jobs)
-print(sol_cost)
-
-# Specify the file name
-file_name = "jobs_costs_data.csv"
-
-# Writing data to CSV file
-with open(file_name, 'w', newline='') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(["Jobs", "Costs"])  # Writing header
-    writer.writerows(zip(list(sol_jobs), sol_cost))  # Writing data rows
-
-print("Data has been successfully saved to", file_name)
-
-# Plotting
-sol_jobs = pd.read_csv('jobs_costs_data.csv')['Jobs']
-sol_cost = pd.read_csv('jobs_costs_data.csv')['Costs']
-
-
-jobs = [float(x[1:-1]) for x in sol_jobs]
-costs = [float(x[1:-1]) for x in sol_cost]
-jobs = jobs[1:] + [jobs[0]]
-costs = costs[1:] + [costs[0]]
-plt.plot(jobs, costs, marker='o', linestyle='-')
-
-# Adding labels and title
-plt.xlabel('Jobs created')
-plt.ylabel('Costs (CHF)')
-plt.title('Jobs vs Costs')
-
-# Displaying the plot
-plt.grid(True)
-plt.savefig('jobs_vs_cost.png', dpi=300)
-plt.show()
-
-
-#Investment Analysis
-#Parameters
-annual_income_per_persom = 155*12 #Income per person per year [US Dollar] # in CHF: 155*12; in USD: 170*12
-percentage_invest = 0.01 #Percentage of income invested
-populationsize = 55361 #Population size
-average_government_exp = 180 #Average government expenses per person per year [US Dollar/Person] # in CHF: 180; in USD: 198
-inv_base_case = heat_demand.max()*cost_chp*(eff_elec_chp/eff_heat_chp) #Investment for base case -> as there is no heat grid to import heat directly, at least the given heat demand must be met to ensure feasibility, thus there must be enough money to invest in the cheapest heat source to meet the maximum demand
-Inv_bound = [inv_base_case,annual_income_per_persom*percentage_invest*populationsize, average_government_exp*populationsize]
-
-inv_sol_cost = []
-inv_sol_co2 = []
-inv_sol_jobs = []
-
-for bound in Inv_bound:
-    print('Investment Analysis with bound = ', bound)
-    inv_con = [Inv <= bound]
-    constraints_inv = constraints + inv_con
-    #minimize cost and co2
-    prob = cp.Problem(cp.Minimize(cost), constraints_inv)
-    prob.solve(solver='SCIPY')
-    inv_sol_cost.append(cost.value)
-    inv_sol_co2.append(co2.value)
-    inv_sol_jobs.append(jobs.value[0])
-
-#unlimited investment
-prob = cp.Problem(cp.Minimize(cost), constraints)
-prob.solve(solver='SCIPY')
-inv_sol_cost.append(cost.value)
-inv_sol_co2.append(co2.value)
-inv_sol_jobs.append(jobs.value)
-
-
-print(inv_sol_co2)
-print(inv_sol_cost)
-
-# Specify the file name
-file_name = "investment_costs_data.csv"
-
-# Writing data to CSV file
-with open(file_name, 'w', newline='') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(["Emissions (kg)", "Costs"])  # Writing header
-    writer.writerows(zip(list(inv_sol_co2), inv_sol_cost))  # Writing data rows
-
-print("Data has been successfully saved to", file_name)
-
-file_name = "investment_jobs_data.csv"
-
-# Writing data to CSV file
-with open(file_name, 'w', newline='') as csvfile:
-    writer = csv.writer(csvfile)
-    writer.writerow(["Jobs", "Costs"])  # Writing header
-    writer.writerows(zip(list(inv_sol_jobs), inv_sol_cost))  # Writing data rows
-
-print("Data has been successfully saved to", file_name)
-
-# Plotting
-inv_sol_co2 = pd.read_csv('investment_costs_data.csv')['Emissions (kg)']
-inv_sol_cost = pd.read_csv('investment_costs_data.csv')['Costs']
-inv_sol_jobs = pd.read_csv('investment_jobs_data.csv')['Jobs']
-
-#PLot
-# Sample data (replace with your actual data)
-scenarios = ['Base Case', 'Income', 'Government', 'Unlimited']
-emissions = list(inv_sol_co2)  # Emissions in kg
-costs = list([float(x[1:-1]) for x in inv_sol_cost])
-jobs_created = list([float(x) for x in inv_sol_jobs[0:-1]])
-jobs_created+=[float(inv_sol_jobs[3][1:-1])]
-
-# Setting up positions for the bars
-x = np.arange(len(scenarios))  # the scenario locations
-width = 0.35  # the width of the bars
-
-# Plotting emissions
-fig, ax = plt.subplots()
-bars1 = ax.bar(x - width/2, emissions, width, label='Emissions in kg CO2')
-
-# Plotting costs
-bars2 = ax.bar(x + width/2, costs, width, label='Costs in CHF')
-
-# Adding labels and title
-ax.set_xlabel('Scenarios')
-ax.set_ylabel('Values')
-ax.set_title('Emissions and Costs for Different Scenarios')
-ax.set_xticks(x)
-ax.set_xticklabels(scenarios)
-ax.legend()
-
-# Show plot
-plt.savefig("investment.png",dpi=300)
-plt.show()
-
-#PLot with Jobs created
-
-# Setting up positions for the bars
-x = np.arange(len(scenarios))  # the scenario locations
-width = 0.2  # the width of the bars
-
-# Plotting emissions
-fig, ax = plt.subplots()
-bars1 = ax.bar(x - width, emissions, width, label='Emissions in kg CO2')
-
-# Plotting costs
-bars2 = ax.bar(x, costs, width, label='Costs in CHF')
-
-# Plotting jobs created (using a secondary y-axis)
-ax2 = ax.twinx()
-bars3 = ax2.bar(x + width, jobs_created, width, color='orange', label='Jobs Created')
-
-# Adding labels and title
-ax.set_xlabel('Scenarios')
-ax.set_ylabel('Emissions and Costs')
-ax2.set_ylabel('Jobs Created')
-ax.set_title('Emissions, Costs, and Jobs Created for Different Scenarios')
-ax.set_xticks(x)
-ax.set_xticklabels(scenarios)
-# Positioning legends
-ax.legend(loc='upper center', bbox_to_anchor=(0.67, 1))
-ax2.legend(loc='upper center', bbox_to_anchor=(0.32, 1))
-
-
-# Show plot
-plt.tight_layout()  # Adjust layout to prevent overlapping labels
-plt.savefig("investment_with_jobs.png", dpi=300)
-plt.show()
-
-# Output objective function value
-# ================================
-print('The value of the total system cost is equal to: ', str(cost.value), ' CHF, EUR, USD')
-print('The value of the total system emissions is equal to: ', str(co2.value), ' kg CO_2')
-
-# Output optimal energy system design
-# ====================================
-print('The capacity of the gas boiler is: ', str(np.round(Cap_gb.value, 1)), ' kW')
-print('The capacity of the combined heat and power engine is: ', str(np.round(Cap_chp.value)), ' kW')
-print('The capacity of the ground-source heat pump is: ', str(np.round(Cap_gshp.value)), ' kW')
-print('The capacity of the photovoltaic panels is: ', str(np.round(Cap_pv.value)), ' m2')
-print('The capacity of the wind turbines is: ', str(np.round(Cap_wind.value)), ' kW')
-print('The capacity of the thermal storage is: ', str(np.round(Cap_ts.value)), ' kWh')
-print('The capacity of the battery is: ', str(np.round(Cap_bat.value)), ' kWh')
-
-
-# Plot the optimal energy system operation results
-# =================================================
-
-# Power
-t = np.arange(0, Horizon)
-plt.figure()
-plt.plot(t, elec_demand[:Horizon], label='Load')
-plt.plot(t, P_out_elec_chp.value, label='CHP')
-plt.plot(t, -P_in_gshp.value, label='GSHP')
-plt.plot(t, P_out_pv.value, label='PV')
-plt.plot(t, P_out_wind.value, label='Wind')
-plt.plot(t, Imp_elec.value, label='Electricity grid')
-plt.plot(t, Q_out_bat.value, label='Battery out')
-plt.plot(t, -Q_in_bat.value, label='Battery in')
-plt.legend()
-plt.xlabel('Time [h]')
-plt.ylabel('Output [kW]')
-plt.title('Power node')
-plt.tight_layout()
-plt.savefig('fig1.png', bbox_inches='tight')
-plt.show()
-
-# Heat
-plt.figure()
-plt.plot(t, heat_demand[:Horizon], label='Load')
-plt.plot(t, P_out_heat_chp.value, label='CHP')
-plt.plot(t, P_out_gshp.value, label='GSHP')
-plt.plot(t, P_out_gb.value, label='Gas boiler')
-plt.plot(t, Q_out_ts.value, label='Storage tank out')
-plt.plot(t, -Q_in_ts.value, label='Storage tank in')
-plt.legend()
-plt.xlabel('Time [h]')
-plt.ylabel('Output [kW]')
-plt.title('Heat node')
-plt.tight_layout()
-plt.savefig('fig2.png', bbox_inches='tight')
-plt.show()
-
-
-# Gas
-plt.figure()
-plt.plot(t, P_in_chp.value, label='CHP')
-plt.plot(t, P_in_gb.value, label='Gas boiler')
-plt.plot(t, Imp_gas.value, label='Natural gas grid')
-plt.legend()
-plt.xlabel('Time [h]')
-plt.ylabel('Output [kW]')
-plt.title('Gas node')
-plt.tight_layout()
-plt.savefig('fig3.png', bbox_inches='tight')
-plt.show()
-
-
-# End
-
-
-
-
+    inv_scenarios = ['inv_base_case', 'inv_income', 'inv_government', 'inv_unlimited']
+    for cost_i, co2_i, jobs_i in sweep.run_sweep(solve_inv_bound, list(zip(inv_scenarios, Inv_bound)), processes):
+        inv_sol_cost.append(cost_i)
+        inv_sol_co2.append(co2_i)
+        inv_sol_jobs.append(jobs_i[0])
+
+    #unlimited investment
+    model.solve('cost')
+    keep('inv_unlimited')
+    inv_sol_cost.append(hub.cost.value)
+    inv_sol_co2.append(hub.co2.value)
+    inv_sol_jobs.append(hub.jobs.value)
+
+
+    print(inv_sol_co2)
+    print(inv_sol_cost)
+
+    # Specify the file name
+    file_name = "investment_costs_data.csv"
+
+    # Writing data to CSV file
+    with open(file_name, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Emissions (kg)", "Costs"])  # Writing header
+        writer.writerows(zip(list(inv_sol_co2), inv_sol_cost))  # Writing data rows
+
+    print("Data has been successfully saved to", file_name)
+
+    file_name = "investment_jobs_data.csv"
+
+    # Writing data to CSV file
+    with open(file_name, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(["Jobs", "Costs"])  # Writing header
+        writer.writerows(zip(list(inv_sol_jobs), inv_sol_cost))  # Writing data rows
+
+    print("Data has been successfully saved to", file_name)
+
+    # Plotting
+    investment = store.kpis(inv_scenarios)
+
+    #PLot
+    scenarios = ['Base Case', 'Income', 'Government', 'Unlimited']
+    emissions = list(investment['co2'])  # Emissions in kg
+    costs = list(investment['cost'])
+    jobs_created = list(investment['jobs'])
+
+    figure_jobs.append(('investment_plot', (scenarios, emissions, costs, "investment.png")))
+
+    #PLot with Jobs created
+    figure_jobs.append(('investment_jobs_plot', (scenarios, emissions, costs, jobs_created, "investment_with_jobs.png")))
+
+    # Output objective function value
+    # ================================
+    print('The value of the total system cost is equal to: ', str(hub.cost.value), ' CHF, EUR, USD')
+    print('The value of the total system emissions is equal to: ', str(hub.co2.value), ' kg CO_2')
+
+    # Output optimal energy system design
+    # ====================================
+    print('The capacity of the gas boiler is: ', str(np.round(hub.Cap_gb.value, 1)), ' kW')
+    print('The capacity of the combined heat and power engine is: ', str(np.round(hub.Cap_chp.value)), ' kW')
+    print('The capacity of the ground-source heat pump is: ', str(np.round(hub.Cap_gshp.value)), ' kW')
+    print('The capacity of the photovoltaic panels is: ', str(np.round(hub.Cap_pv.value)), ' m2')
+    print('The capacity of the wind turbines is: ', str(np.round(hub.Cap_wind.value)), ' kW')
+    print('The capacity of the thermal storage is: ', str(np.round(hub.Cap_ts.value)), ' kWh')
+    print('The capacity of the battery is: ', str(np.round(hub.Cap_bat.value)), ' kWh')
+
+
+    # Plot the optimal energy system operation results
+    # =================================================
+    results = store.load('inv_unlimited')
+    figure_jobs.append(('power_node_plot', (results, 'fig1.png')))
+    figure_jobs.append(('heat_node_plot', (results, 'fig2.png')))
+    figure_jobs.append(('gas_node_plot', (results, 'fig3.png')))
+
+    if plots is not None:
+        with telemetry.phase('plots'):
+            figures.render(figure_jobs, processes, show=plots == 'show')
+        telemetry.emit('figures', figures=len(figure_jobs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Energy hub of the favelas in Manaus: cost/co2 and jobs sweeps and '
+                                                 'investment analysis, written to CSV files and figures.')
+    parser.add_argument('--aggregation-days', type=int, default=None,
+                        help='number of representative days optimized instead of the full year (screening runs)')
+    parser.add_argument('--no-aggregation-check', action='store_true',
+                        help='do not compare the aggregated model against the full hourly model')
+    parser.add_argument('--time-step', type=float, default=1,
+                        help='time step [h] of the model, e.g. 4 or 24 for screening, 0.25 for storage detail (default: 1)')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='worker processes for the sweeps (default: one per CPU core, 1: no parallelism)')
+    parser.add_argument('--no-cache', action='store_true', help='always solve instead of reading cached solutions')
+    parser.add_argument('--technologies', default=None,
+                        help='JSON file of the technologies (default: technologies.json, see components.py)')
+    parser.add_argument('--front-solves', type=int, default=9, help='maximum number of points of the cost-co2 front')
+    parser.add_argument('--front-tol', type=float, default=1e-3,
+                        help='error bound of the cost-co2 front (relative to the range of the anchors) to stop at')
+    parser.add_argument('--results', default='results', help='directory of the results store (default: results)')
+    parser.add_argument('--plots', choices=['files', 'show', 'none'], default='files',
+                        help='render the figures to files (headless), also show them in windows, or skip them')
+    parser.add_argument('--telemetry', default=None,
+                        help='append phase timings and problem statistics of every scenario to this JSON lines file')
+    parser.add_argument('--profile', default=None,
+                        help='with --telemetry, also profile building and solving (cProfile, one .prof file per scenario in this directory)')
+    args = parser.parse_args(argv)
+    if args.telemetry:
+        telemetry.configure(args.telemetry, args.profile)
+
+    # Solutions are cached by a hash of the problem data, so solves repeated within or across runs (e.g. the cost
+    # and co2 anchors of both sweeps and the unlimited investment case) are read back instead of being solved again
+    model = EnergyHubModel(aggregation_days=args.aggregation_days, cache=None if args.no_cache else True,
+                           dt=args.time_step, technologies=args.technologies).build()
+    run_workflow(model, args.processes, aggregation_check=not args.no_aggregation_check,
+                 plots=None if args.plots == 'none' else args.plots, results_dir=args.results,
+                 front_solves=args.front_solves, front_tol=args.front_tol)
+
+
+if __name__ == '__main__':
+    main()
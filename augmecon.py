@@ -0,0 +1,239 @@
+""" Three-objective front of the energy hub: minimum cost, minimum co2 and maximum jobs (AUGMECON2).
+
+ Maximizing jobs alone is unbounded: jobs grow with every installed kW and only PV, battery and wind have an upper
+ bound. All problems here are therefore bounded by a cost budget, the highest cost of the payoff table of cost
+ and co2 (the cost of the lexicographic co2 optimum), so the jobs maximum is that of the cost range of the
+ cost-co2 front.
+
+ The payoff table optimizes each objective lexicographically (cost, co2, jobs in turn) and gives the ranges of
+ co2 and jobs. Cost is then minimized on a grid of co2 bounds and jobs levels with the augmented
+ epsilon-constraint problem
+
+    min cost - w_jobs s_jobs - w_co2 s_co2   s.t.  co2 + s_co2 = e_co2,  jobs - s_jobs = e_jobs,  cost <= budget
+
+ (w = eps * cost range / objective range, the co2 slack weighted 10 times less), which only has efficient
+ solutions. The problem is built and compiled once; grid points only set e_co2 and e_jobs. The co2 bounds are
+ solved from loose to tight and the jobs levels from low to high, and grid points are skipped where the outcome
+ is already known (the feasible sets of tighter points are subsets that still contain the solution):
+
+    bypass:      a solution with slacks s_jobs and s_co2 also solves the next floor(s_jobs / jobs step) jobs levels
+                 and, for these, the next floor(s_co2 / co2 step) co2 bounds (AUGMECON2, and AUGMECON-R for co2)
+    early exit:  a point is infeasible: so are all points with higher jobs levels and tighter co2 bounds
+
+ The co2 bounds are solved in batches over a process pool (sweep.run_sweep); a batch skips the points known from
+ all batches before it.
+
+ Usage:
+
+    python augmecon.py [--grid 6] [--aggregation-days 12] [--processes 4]
+"""
+
+import argparse
+import csv
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+import sweep
+from components import CAPACITIES
+
+OBJECTIVES = ['cost', 'co2', 'jobs']
+
+
+def build_problem(hub, eps=1e-3):
+    """Augmented epsilon-constraint problem of hub, with the bounds and slack weights as parameters."""
+    import cvxpy as cp
+
+    f = SimpleNamespace(eps=eps)
+    f.e_co2 = cp.Parameter(nonneg=True)  # co2 bound [kgCO2]
+    f.e_jobs = cp.Parameter(nonneg=True)  # Jobs level [job years]
+    f.budget = cp.Parameter(nonneg=True)  # Cost budget [CHF, EUR, USD]
+    f.w_co2 = cp.Parameter(nonneg=True)  # Weight of the co2 slack [CHF, EUR, USD/kgCO2]
+    f.w_jobs = cp.Parameter(nonneg=True)  # Weight of the jobs slack [CHF, EUR, USD/job year]
+    f.s_co2 = cp.Variable(1, name='s_co2', nonneg=True)
+    f.s_jobs = cp.Variable(1, name='s_jobs', nonneg=True)
+    f.prob = cp.Problem(cp.Minimize(hub.cost - f.w_jobs * f.s_jobs - f.w_co2 * f.s_co2),
+                        hub.constraints + [hub.co2 + f.s_co2 == f.e_co2, hub.jobs - f.s_jobs == f.e_jobs,
+                                           hub.cost <= f.budget])
+    return f
+
+
+def _kpis(hub):
+    return {name: float(np.sum(getattr(hub, name).value)) for name in OBJECTIVES + ['Inv'] + CAPACITIES}
+
+
+def payoff_table(model, rel_tol=1e-6):
+    """Lexicographic optima of cost, co2 and jobs (each row: KPIs of one optimum) and the cost budget.
+
+    The jobs maximum is taken within the budget, the highest cost of the cost and co2 optima.
+    """
+    hub = model.hub
+    senses = {'cost': hub.cost, 'co2': hub.co2, 'jobs': -hub.jobs}  # All minimized
+
+    def lexicographic(first, constraints):
+        constraints = list(constraints)
+        for name in [first] + [name for name in OBJECTIVES if name != first]:
+            value = model.solve(senses[name], extra_constraints=constraints)
+            constraints.append(senses[name] <= value + rel_tol * abs(value))
+        return _kpis(hub)
+
+    rows = {'cost': lexicographic('cost', []), 'co2': lexicographic('co2', [])}
+    budget = max(rows['cost']['cost'], rows['co2']['cost'])
+    rows['jobs'] = lexicographic('jobs', [hub.cost <= budget])
+    return rows, budget
+
+
+# Grid points
+# ============
+# The co2 bounds are solved in the workers of sweep.run_sweep, which inherit the compiled problem, the model and
+# the store
+_model = None
+_front = None
+_store = None
+
+
+def _solve():
+    # Solve the front problem at the current bounds; False if it is infeasible
+    prob = _front.prob
+    if _model.cache is None:
+        prob.solve(solver=_model.solver)
+    else:
+        _model.cache.solve(prob, solver=_model.solver)
+    if prob.status in ('infeasible', 'infeasible_inaccurate'):
+        return False
+    if prob.status != 'optimal':
+        raise RuntimeError(f'Front problem is {prob.status}')
+    return True
+
+
+def solve_co2_level(level):
+    # Unknown jobs levels (flags 0) of one co2 bound, with bypass and early exit. Returns the solved points (with
+    # the co2 bounds they bypass), the number of solves and the flags of the levels (1 solved, -1 infeasible)
+    i, e_co2, flags = level
+    hub = _model.hub
+    _front.e_co2.value = e_co2
+    points, solves = [], 0
+    for k in range(len(flags)):
+        if flags[k] != 0:
+            continue
+        _front.e_jobs.value = _front.jobs_levels[k]
+        solves += 1
+        if not _solve():
+            flags[k:] = -1
+            break
+        scenario = f'front3_{i:02d}_{k:02d}'
+        if _store is not None:
+            _store.put(scenario, _model.results())
+        skip_jobs = int(np.floor(float(_front.s_jobs.value[0]) / _front.jobs_step + 1e-9))
+        skip_co2 = int(np.floor(float(_front.s_co2.value[0]) / _front.co2_step + 1e-9))
+        flags[k:k + skip_jobs + 1] = 1
+        points.append(dict(_kpis(hub), scenario=scenario, e_co2=e_co2, e_jobs=_front.jobs_levels[k], level=(i, k),
+                           skip=(skip_co2, skip_jobs)))
+    return points, solves, flags
+
+
+def _nondominated(points, rtol=1e-6):
+    # Points not dominated in (min cost, min co2, max jobs), duplicates removed
+    keys = np.array([[p['cost'], p['co2'], -p['jobs']] for p in points])
+    scale = np.maximum(np.abs(keys).max(axis=0), 1.0) * rtol
+    kept = []
+    for a in range(len(points)):
+        better_eq = np.all(keys <= keys[a] + scale, axis=1)
+        strictly = np.any(keys < keys[a] - scale, axis=1)
+        duplicate = np.all(np.abs(keys - keys[a]) <= scale, axis=1) & (np.arange(len(points)) < a)
+        if not (better_eq & strictly).any() and not duplicate.any():
+            kept.append(points[a])
+    return kept
+
+
+def front(model, grid=6, eps=1e-3, processes=None, store=None):
+    """Three-objective front of model (an EnergyHubModel) on a grid of grid + 1 co2 bounds and jobs levels.
+
+    Returns points (KPIs and capacities of the non-dominated solutions, by increasing co2 and jobs), the payoff
+    table, the budget, the number of solves and the size of the full grid. Every solved point is written to
+    store (a results_store.ResultsStore) if given.
+    """
+    import multiprocessing
+
+    global _model, _front, _store
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if model.hub is None:
+        model.build()
+    hub = model.hub
+    rows, budget = payoff_table(model)
+    ranges = {name: (min(row[name] for row in rows.values()), max(row[name] for row in rows.values()))
+              for name in OBJECTIVES}
+    r = {name: max(high - low, 1e-9) for name, (low, high) in ranges.items()}
+
+    f = build_problem(hub, eps)
+    f.budget.value = budget
+    f.w_jobs.value = eps * r['cost'] / r['jobs']
+    f.w_co2.value = 0.1 * eps * r['cost'] / r['co2']
+    f.jobs_levels = np.linspace(ranges['jobs'][0], ranges['jobs'][1], grid + 1)
+    f.jobs_step, f.co2_step = r['jobs'] / grid, r['co2'] / grid
+    co2_levels = np.linspace(ranges['co2'][1], ranges['co2'][0], grid + 1)  # From loose to tight
+    f.e_co2.value, f.e_jobs.value = co2_levels[0], f.jobs_levels[0]
+    f.prob.get_problem_data(model.solver)  # Compile once, before forking
+    _model, _front, _store = model, f, store
+
+    flags = np.zeros((grid + 1, grid + 1), dtype=int)  # By co2 bound and jobs level: 1 solved, -1 infeasible
+    points, solves, i = [], 0, 0
+    while i <= grid:
+        batch = [(j, co2_levels[j], flags[j].copy()) for j in range(i, min(i + processes, grid + 1))]
+        for (j, _, _), (level_points, level_solves, level_flags) in zip(
+                batch, sweep.run_sweep(solve_co2_level, batch, processes)):
+            points += level_points
+            solves += level_solves
+            flags[j] = level_flags
+            for point in level_points:
+                (_, k), (skip_co2, skip_jobs) = point.pop('level'), point.pop('skip')
+                block = flags[j + 1:j + skip_co2 + 1, k:k + skip_jobs + 1]
+                block[block == 0] = 1
+            infeasible = np.flatnonzero(level_flags == -1)
+            if len(infeasible):
+                block = flags[j + 1:, infeasible[0]:]
+                block[block == 0] = -1
+        i += len(batch)
+
+    points = sorted(_nondominated(points), key=lambda p: (p['co2'], p['jobs']))
+    return SimpleNamespace(points=points, payoff=rows, budget=budget, solves=solves, grid_points=(grid + 1) ** 2)
+
+
+def main(argv=None):
+    import results_store
+    from EnergyHub import EnergyHubModel
+
+    parser = argparse.ArgumentParser(description='Cost, co2 and jobs front of the energy hub (AUGMECON2).')
+    parser.add_argument('--grid', type=int, default=6, help='intervals of the co2 and jobs ranges (default: 6)')
+    parser.add_argument('--eps', type=float, default=1e-3, help='weight of the slacks (default: 1e-3)')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='worker processes (default: one per CPU core, 1: no parallelism and most pruning)')
+    parser.add_argument('--aggregation-days', type=int, default=None,
+                        help='number of representative days optimized instead of the full year (screening runs)')
+    parser.add_argument('--no-cache', action='store_true', help='always solve instead of reading cached solutions')
+    parser.add_argument('--results', default='results', help='directory of the results store (default: results)')
+    args = parser.parse_args(argv)
+
+    model = EnergyHubModel(aggregation_days=args.aggregation_days, cache=None if args.no_cache else True).build()
+    result = front(model, args.grid, args.eps, args.processes, results_store.ResultsStore(args.results))
+
+    print(f'{"payoff":<8} {"cost":>14} {"co2":>14} {"jobs":>10}')
+    for name, row in result.payoff.items():
+        print(f'max {name:<4}' if name == 'jobs' else f'min {name:<4}', f'{row["cost"]:14.1f} {row["co2"]:14.1f} {row["jobs"]:10.1f}')
+    print(f'Budget {result.budget:.1f}; {len(result.points)} efficient points from {result.solves} solves '
+          f'(full grid: {result.grid_points})')
+
+    os.makedirs(args.results, exist_ok=True)
+    path = os.path.join(args.results, 'front3.csv')
+    fields = ['scenario', 'e_co2', 'e_jobs'] + OBJECTIVES + ['Inv'] + CAPACITIES
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(result.points)
+    print(f'Front written to {path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+""" Benders decomposition of the energy hub into capacity planning and hourly operation.
+
+ The master problem only contains the capacities (Cap_*) and an estimate theta of the operational costs, which
+ is bounded from below by optimality cuts. The subproblem is the hourly operation with the capacities fixed
+ to the master's solution; its optimal value and the duals of the fixing constraints give the cut
+
+    theta >= op_k - dual_k' (Cap - Cap_k)
+
+ The subproblem is built with a penalty on unmet heat demand, so it is feasible for every design and no
+ feasibility cuts are needed. It can be split into time blocks that are solved in parallel; the storages then
+ start each block empty (an approximation of the full year operation). The operation of every block is averaged
+ over the years of the whole input, so the blocks add up to the operational costs of the monolithic model.
+
+ The master problem is compiled once: the cuts are rows of parameters (inactive until set), so every iteration
+ only updates their values and re-solves.
+
+ Usage (in EnergyHub.py):
+
+    result = benders.solve_benders(build_model, (elec_demand, heat_demand, solar, wind_speed))
+    print(result.design, result.cost)
+"""
+
+import time
+from types import SimpleNamespace
+
+import cvxpy as cp
+import numpy as np
+
+import sweep
+
+# Subproblems of the current solve_benders call (inherited by the forked workers)
+_blocks = []
+
+
+def _solve_block(args):
+    b, design, solver = args
+    sub, prob, fixed = _blocks[b]
+    for name, value in design.items():
+        fixed[name][0].value = value
+    prob.solve(solver=solver)
+    if prob.status != 'optimal':
+        raise RuntimeError(f'Benders subproblem of block {b} is {prob.status}')
+    return prob.value, {name: np.asarray(con.dual_value, dtype=float) for name, (_, con) in fixed.items()}
+
+
+def solve_benders(build_model, inputs, blocks=None, heat_penalty=1000, tol=1e-4, max_iter=200, theta_min=0.0,
+                  solver='SCIPY', processes=None, log=print, dt=1):
+    """Minimum cost design of the energy hub by Benders decomposition.
+
+    inputs are the series (elec, heat, solar, wind) passed to build_model with time steps of dt hours, blocks is
+    None for a single subproblem over the whole horizon or a list of time steps per block (e.g.
+    dispatch.MONTH_HOURS). tol is the
+    relative gap between the upper and lower bound at which to stop, theta_min a lower bound on the operational
+    costs (0 is valid as long as there is no feed-in revenue). Returns a namespace with the best design, its cost,
+    the lower bound, the per-iteration history and the subproblem models (set to the best design).
+    """
+    global _blocks
+    n = len(inputs[0])
+    data_years = max(1, round(n * dt / 8760))  # Years of the whole input, which the operation is averaged over
+    if blocks is None:
+        ranges, storage_start = [(0, n)], None
+    else:
+        ends = np.cumsum(blocks)
+        ranges, storage_start = list(zip(np.concatenate([[0], ends[:-1]]), ends)), (0, 0)
+
+    _blocks = []
+    for start, end in ranges:
+        sub = build_model(*[np.asarray(x)[start:end] for x in inputs], storage_start=storage_start,
+                          heat_penalty=heat_penalty, dt=dt, data_years=data_years)
+        fixed = {}
+        for name in sub.capacities:
+            value = cp.Parameter(1, value=np.zeros(1))
+            fixed[name] = (value, getattr(sub, name) == value)
+        prob = cp.Problem(cp.Minimize(sub.cost - sub.Inv), sub.constraints + [con for _, con in fixed.values()])
+        _blocks.append((sub, prob, fixed))
+    sub = _blocks[0][0]
+    names = list(_blocks[0][2])
+
+    # Master problem
+    # ===============
+    cap = {name: cp.Variable(1, name=name) for name in names}
+    theta = cp.Variable(name='theta')  # Estimate of the operational costs
+    inv = sum(cap[name] * getattr(sub, 'cost_' + name[len('Cap_'):]) for name in names)
+    master_con = [theta >= theta_min] + [cap[name] >= 0 for name in names]
+    master_con += [cap[name] <= getattr(sub, sub.upper_bounds[name]) for name in names if name in sub.upper_bounds]
+    # Optimality cuts theta >= cut_op - cut_dual @ Cap, one row per iteration (theta >= theta_min until set)
+    cut_op = cp.Parameter(max_iter, value=np.full(max_iter, float(theta_min)))
+    cut_dual = cp.Parameter((max_iter, len(names)), value=np.zeros((max_iter, len(names))))
+    master_con.append(theta >= cut_op - cut_dual @ cp.hstack([cap[name] for name in names]))
+    master = cp.Problem(cp.Minimize(inv + theta), master_con)
+
+    upper, lower, best, history = np.inf, -np.inf, None, []
+    for iteration in range(1, max_iter + 1):
+        t0 = time.perf_counter()
+        master.solve(solver=solver)
+        lower = master.value
+        design = {name: np.maximum(cap[name].value, 0) for name in names}
+        t1 = time.perf_counter()
+
+        results = sweep.run_sweep(_solve_block, [(b, design, solver) for b in range(len(_blocks))],
+                                  processes if len(_blocks) > 1 else 1)
+        op = sum(r[0] for r in results)
+        dual = {name: sum(r[1][name] for r in results) for name in names}
+        t2 = time.perf_counter()
+
+        total = float(inv.value[0]) + op
+        if total < upper:
+            upper, best = total, design
+        gap = (upper - lower) / abs(upper)
+        history.append(SimpleNamespace(iteration=iteration, lower=lower, upper=upper, gap=gap,
+                                       master_time=t1 - t0, subproblem_time=t2 - t1))
+        if log is not None:
+            log(f'Benders iteration {iteration}: lower bound {lower:.6e}, upper bound {upper:.6e}, gap {gap:.3%}, '
+                f'master {t1 - t0:.2f} s, subproblem {t2 - t1:.2f} s')
+        if gap <= tol:
+            break
+        # Optimality cut theta >= op - dual' (Cap - Cap_k)
+        ops, duals = cut_op.value.copy(), cut_dual.value.copy()
+        duals[iteration - 1] = [float(dual[name][0]) for name in names]
+        ops[iteration - 1] = op + duals[iteration - 1] @ [float(design[name][0]) for name in names]
+        cut_op.value, cut_dual.value = ops, duals
+
+    # Leave the subproblems at the best design, so their series can be used for plotting
+    results = sweep.run_sweep(_solve_block, [(b, best, solver) for b in range(len(_blocks))], 1)
+    return SimpleNamespace(design=best, cost=upper, lower_bound=lower, iterations=len(history), history=history,
+                           subproblems=[b[0] for b in _blocks])
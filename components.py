@@ -0,0 +1,305 @@
+""" Technology components of the energy hub: parameter tables and stacked constraint blocks.
+
+ The technologies are read from a table (technologies.json by default) with one entry per class:
+
+    grid:        imported and exported carriers with their prices, escalation rates and emission factors
+    conversion:  input carrier, output carriers with their efficiencies, the output the capacity refers to,
+                 investment cost and jobs (boilers, heat pumps, CHP engines)
+    renewable:   output carrier, resource (solar radiation, or wind speeds with a power curve), efficiency,
+                 investment cost, jobs and upper bound
+    storage:     carrier, self-discharge, charging and discharging efficiencies and rates, investment cost, jobs,
+                 upper bound and the time step at which it is empty
+
+ Every class is one block with one stacked variable per flow (time steps x technologies, e.g. Q_in of all
+ storages) and one capacity vector, and one vectorized constraint per rule, so the number of cvxpy objects does
+ not grow with the number of technologies. The flow of a block is its net supply to the balance of every carrier
+ (time steps x CARRIERS). Efficiencies and costs stay scalar parameters by name (eff_gb, cost_bat, ...) and the
+ flows and capacities of every technology keep the names of the model (P_in_gb, Q_out_bat, Cap_pv, ...) as slices
+ of the stacked variables.
+
+ An upper bound is a number (the parameter max_cap_<name>) or the name of a bound of the site (max_solar_area,
+ max_wind_cap). A technology with an upper bound of zero is left out of the problem: its capacity and flows are
+ zero.
+
+ Usage (in EnergyHub.build_model):
+
+    techs = components.load_technologies('technologies.json')
+    conversion = components.conversion_block(techs['conversion'], Horizon, dt)
+    conversion.flow  # Net supply to the balance of every carrier [kWh], Horizon x len(CARRIERS)
+    conversion.attrs['P_in_gb']  # Input energy of the gas boiler [kWh]
+"""
+
+import json
+import os
+from types import SimpleNamespace
+
+import cvxpy as cp
+import numpy as np
+
+CARRIERS = ['elec', 'heat', 'gas']  # Columns of the balances
+CLASSES = ['conversion', 'renewable', 'storage']  # Technology classes with a capacity
+# Capacities of the default technologies (technologies.json), the columns of the results and reports
+CAPACITIES = ['Cap_gb', 'Cap_gshp', 'Cap_chp', 'Cap_pv', 'Cap_wind', 'Cap_ts', 'Cap_bat']
+TECHNOLOGIES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'technologies.json')
+
+
+def load_technologies(path=None):
+    """Technology table of path (default: TECHNOLOGIES), see the module docstring."""
+    path = TECHNOLOGIES if path is None else path
+    with open(path) as f:
+        techs = json.load(f)
+    grid = techs.setdefault('grid', {})
+    carriers = [flow['carrier'] for key in ['imports', 'exports'] for flow in grid.setdefault(key, [])]
+    names = set()
+    for cls in CLASSES:
+        for tech in techs.setdefault(cls, []):
+            if tech['name'] in names:
+                raise ValueError(f'Technology {tech["name"]!r} appears twice in {path}')
+            names.add(tech['name'])
+            carriers += [tech[key] for key in ['input', 'capacity', 'carrier'] if key in tech]
+            carriers += list(tech.get('outputs', {}))
+    unknown = set(carriers) - set(CARRIERS)
+    if unknown:
+        raise ValueError(f'Unknown carriers {sorted(unknown)} in {path}, expected some of {CARRIERS}')
+    return techs
+
+
+# Helper functions
+# =================
+def _units(carriers):
+    # Matrix mapping technologies (rows) to the balance columns of their carriers
+    units = np.zeros((len(carriers), len(CARRIERS)))
+    units[np.arange(len(carriers)), [CARRIERS.index(carrier) for carrier in carriers]] = 1
+    return units
+
+
+def _rows(x, steps):
+    # Vector x repeated for every time step (steps x len(x))
+    return np.ones((steps, 1)) @ cp.reshape(x, (1, x.shape[0]), order='C')
+
+
+def _block(techs, bounds, cls):
+    # Technologies of the table with an upper bound other than zero (the others get zero capacities), their
+    # capacity vector with its bounds, and the investment costs (parameters), jobs and bounds by name
+    b = SimpleNamespace(techs=[], excluded=[], attrs={}, slots={}, constraints=[], capacities=[], upper_bounds={},
+                        Cap=None, cost=None, jobs=None, flow=None)
+    bounded = []
+    for tech in techs:
+        name = tech['name']
+        b.attrs['cost_' + name] = cp.Parameter(nonneg=True, value=tech['cost'])  # Investment cost [CHF, EUR, USD/kW]
+        b.attrs['jobs_created_' + name] = tech.get('jobs', 0.0)  # Jobs [job years/kW]
+        bound = tech.get('max_cap')
+        if isinstance(bound, str):
+            value = bounds[bound]
+        else:
+            bound, value = 'max_cap_' + name, bound
+        if value == 0:
+            b.attrs[bound] = 0
+            b.attrs['Cap_' + name] = cp.Constant(np.zeros(1))  # Not part of the problem
+            b.excluded.append(tech)
+            continue
+        if value is not None:
+            b.attrs[bound] = cp.Parameter(nonneg=True, value=value)  # Upper bound of the capacity
+            b.upper_bounds['Cap_' + name] = bound
+            bounded.append(len(b.techs))
+        b.techs.append(tech)
+
+    n = len(b.techs)
+    if n:
+        b.Cap = cp.Variable(n, name='Cap_' + cls)  # Capacities of the technologies
+        b.constraints = [b.Cap >= 0]
+        if bounded:
+            upper = cp.hstack([b.attrs[b.upper_bounds['Cap_' + b.techs[j]['name']]] for j in bounded])
+            b.constraints.append(b.Cap[bounded] <= upper)
+        for j, tech in enumerate(b.techs):
+            b.attrs['Cap_' + tech['name']] = b.Cap[j:j + 1]
+            b.slots['Cap_' + tech['name']] = (b.Cap, slice(j, j + 1))
+        b.capacities = ['Cap_' + tech['name'] for tech in b.techs]
+        b.cost = cp.hstack([b.attrs['cost_' + tech['name']] for tech in b.techs])
+        b.jobs = np.array([tech.get('jobs', 0.0) for tech in b.techs])
+    return b
+
+
+def wind_capacity_factor(wind_speed, cut_in_wind_speed, rated_wind_speed, cut_out_wind_speed):
+    # Capacity factor of the wind turbines following the power curve
+    # (zero below cut-in and above cut-out, linear between cut-in and rated, 1 above rated)
+    wind_speed = np.asarray(wind_speed, dtype=float)
+    cf_wind = np.clip((wind_speed - cut_in_wind_speed) / (rated_wind_speed - cut_in_wind_speed), 0, 1)
+    cf_wind[(wind_speed <= cut_in_wind_speed) | (wind_speed >= cut_out_wind_speed)] = 0
+    return cf_wind
+
+
+def _series(b, name, matrix, j):
+    # Column j of a stacked variable as the series name of a technology
+    b.attrs[name] = matrix[:, j]
+    b.slots[name] = (matrix, (slice(None), j))
+
+
+# Technology blocks
+# ==================
+def grid_block(grid, Horizon):
+    """Grid connections: imports Imp and exports Exp (Horizon x carriers), with their prices and emission factors.
+
+    streams maps every priced flow (gas, elec, elec_exp, ...) to the name of its series, the name of its price and
+    its sign in the costs; emissions is the co2 of the imports of every time step [kgCO2].
+    """
+    b = SimpleNamespace(attrs={}, slots={}, constraints=[], streams={}, flow=None, emissions=None)
+    flows = []
+    for key, var, prefix, suffix, sign in [('imports', 'Imp', 'price_', '', 1), ('exports', 'Exp', 'exp_price_', '_exp', -1)]:
+        entries = grid[key]
+        if not entries:
+            continue
+        X = cp.Variable((Horizon, len(entries)), name=var)  # Energy imported or exported in every time step [kWh]
+        b.constraints.append(X >= 0)
+        flows.append(sign * X @ _units([entry['carrier'] for entry in entries]))
+        for j, entry in enumerate(entries):
+            carrier = entry['carrier']
+            _series(b, f'{var}_{carrier}', X, j)
+            b.attrs[prefix + carrier] = cp.Parameter(nonneg=True, value=entry['price'])  # [CHF, EUR, USD/kWh]
+            b.attrs['esc_' + carrier + suffix] = entry.get('escalation', 0.0)  # Escalation rate per year
+            b.streams[carrier + suffix] = (f'{var}_{carrier}', prefix + carrier, sign)
+        if key == 'imports':
+            co2 = [cp.Parameter(nonneg=True, value=entry.get('co2', 0.0)) for entry in entries]  # [kgCO2/kWh]
+            b.attrs.update({'co2_' + entry['carrier']: p for entry, p in zip(entries, co2)})
+            b.emissions = X @ cp.hstack(co2)
+        setattr(b, var, X)
+    b.flow = sum(flows) if flows else None
+    return b
+
+
+def conversion_block(techs, Horizon, dt=1, bounds=None):
+    """Conversion technologies: input energies P_in (Horizon x technologies), outputs limited by the capacities."""
+    b = _block(techs, bounds or {}, 'conversion')
+    eff = {}
+    for tech in techs:
+        for carrier, value in tech['outputs'].items():
+            name = 'eff_' + tech['name'] if len(tech['outputs']) == 1 else f'eff_{carrier}_{tech["name"]}'
+            eff[tech['name'], carrier] = b.attrs[name] = cp.Parameter(nonneg=True, value=value)  # Efficiency
+    for tech in b.excluded:
+        b.attrs['P_in_' + tech['name']] = cp.Constant(np.zeros(Horizon))
+    if not b.techs:
+        return b
+
+    n = len(b.techs)
+    P_in = cp.Variable((Horizon, n), name='P_in')  # Input energy of every technology [kWh]
+    outputs = sum(eff[tech['name'], carrier] * np.outer(np.eye(n)[j], np.eye(len(CARRIERS))[CARRIERS.index(carrier)])
+                  for j, tech in enumerate(b.techs) for carrier in tech['outputs'])  # Efficiencies, technologies x carriers
+    eff_cap = cp.hstack([eff[tech['name'], tech['capacity']] for tech in b.techs])
+    b.constraints += [P_in >= 0, P_in @ cp.diag(eff_cap) <= _rows(dt * b.Cap, Horizon)]
+    b.flow = P_in @ (outputs - _units([tech['input'] for tech in b.techs]))
+
+    for j, tech in enumerate(b.techs):
+        name = tech['name']
+        _series(b, 'P_in_' + name, P_in, j)
+        for carrier in tech['outputs']:
+            out = 'P_out_' + name if len(tech['outputs']) == 1 else f'P_out_{carrier}_{name}'
+            b.attrs[out] = P_in[:, j] * eff[name, carrier]  # Output energy [kWh]
+    b.P_in = P_in
+    return b
+
+
+def renewable_block(techs, Horizon, dt=1, bounds=None, resources=None):
+    """Renewable technologies: output energies P_out (Horizon x technologies) of the capacities.
+
+    resources are the series by name (solar radiation per time step [kWh/m2], wind speeds [m/s]). The yield of a
+    technology is its resource times its efficiency or, with a power curve (cut-in, rated and cut-out wind speed),
+    its capacity factor times the time step (cf_<name>, e.g. cf_wind). The yields are the parameter Y, so the
+    series of another site are parameter values (see set_resources).
+    """
+    b = _block(techs, bounds or {}, 'renewable')
+    for tech in techs:
+        if 'eff' in tech:
+            b.attrs['eff_' + tech['name']] = cp.Parameter(nonneg=True, value=tech['eff'])  # Efficiency
+    for tech in b.excluded:
+        b.attrs['P_out_' + tech['name']] = cp.Constant(np.zeros(Horizon))
+    b.Y = None
+    if b.techs:
+        b.Y = cp.Parameter((Horizon, len(b.techs)))  # Yield per unit of capacity (time steps x technologies)
+    set_resources(b, resources, Horizon, dt)
+    if not b.techs:
+        return b
+
+    # Output: yield times efficiency times capacity. A parameter times a parameter is not DPP, so the efficiencies
+    # scale the capacities in the variable Eff_cap; the parameter matrix Y times the diagonal of a variable also keeps
+    # compiling linear in the horizon (cp.multiply of a parameter series and a capacity would not)
+    eff = cp.hstack([b.attrs.get('eff_' + tech['name'], 1.0) for tech in b.techs])
+    Eff_cap = cp.Variable(len(b.techs), name='Eff_cap')  # Capacities times efficiencies
+    b.constraints.append(Eff_cap == cp.multiply(eff, b.Cap))
+    P_out = b.Y @ cp.diag(Eff_cap)  # Output energy of every technology [kWh]
+    b.flow = P_out @ _units([tech['carrier'] for tech in b.techs])
+    for j, tech in enumerate(b.techs):
+        b.attrs['P_out_' + tech['name']] = P_out[:, j]
+    b.P_out = P_out
+    return b
+
+
+def set_resources(b, resources, Horizon, dt=1):
+    """Set the yields of the renewable block b (its parameter Y and capacity factors cf_<name>) from resources."""
+    yields = {}
+    for tech in b.techs + b.excluded:
+        series = np.asarray(resources[tech['resource']][:Horizon], dtype=float)
+        if 'power_curve' in tech:
+            b.attrs['cf_' + tech['name']] = wind_capacity_factor(series, *tech['power_curve'])  # Capacity factor
+            series = b.attrs['cf_' + tech['name']] * dt
+        yields[tech['name']] = series
+    if b.Y is not None:
+        b.Y.value = np.column_stack([yields[tech['name']] for tech in b.techs])
+
+
+def storage_block(techs, Horizon, dt=1, bounds=None, rep_days=None, storage_start=None):
+    """Storage technologies: charging Q_in, discharging Q_out (Horizon x technologies) and stored energy E.
+
+    With rep_days the stored energy of every storage is linked across the year (aggregation.linked_storage). With
+    storage_start (one value per storage of techs) the stored energy at the start of the horizon is given by the
+    parameters E_<name>_start instead of empty storages at their empty_step.
+    """
+    b = _block(techs, bounds or {}, 'storage')
+    for tech in techs:
+        for key in ['self_dis', 'ch_eff', 'dis_eff', 'max_ch', 'max_dis']:
+            b.attrs[f'{key}_{tech["name"]}'] = tech[key]
+    for tech in b.excluded:
+        for name in ['Q_in_', 'Q_out_']:
+            b.attrs[name + tech['name']] = cp.Constant(np.zeros(Horizon))
+        b.attrs['E_' + tech['name']] = cp.Constant(np.zeros(Horizon + 1))
+    if not b.techs:
+        return b
+
+    n = len(b.techs)
+    value = {key: np.array([tech[key] for tech in b.techs], dtype=float)
+             for key in ['self_dis', 'ch_eff', 'dis_eff', 'max_ch', 'max_dis']}
+    Q_in = cp.Variable((Horizon, n), name='Q_in')  # Input energy flow to every storage [kWh]
+    Q_out = cp.Variable((Horizon, n), name='Q_out')  # Output energy flow from every storage [kWh]
+    b.constraints += [Q_in >= 0, Q_out >= 0, Q_in <= _rows(cp.multiply(value['max_ch'] * dt, b.Cap), Horizon),
+                      Q_out <= _rows(cp.multiply(value['max_dis'] * dt, b.Cap), Horizon)]
+    b.flow = (Q_out - Q_in) @ _units([tech['carrier'] for tech in b.techs])
+    for j, tech in enumerate(b.techs):
+        _series(b, 'Q_in_' + tech['name'], Q_in, j)
+        _series(b, 'Q_out_' + tech['name'], Q_out, j)
+
+    if rep_days is None:
+        E = cp.Variable((Horizon + 1, n), name='E')  # Stored energy of every storage [kWh]
+        keep = (1 - value['self_dis']) ** dt  # Share of the stored energy left after one time step
+        b.constraints += [E >= 0, E <= _rows(b.Cap, Horizon + 1),
+                          E[1:] == E[:-1] @ np.diag(keep) + Q_in @ np.diag(value['ch_eff'])
+                          - Q_out @ np.diag(1 / value['dis_eff'])]
+        if storage_start is None:
+            b.constraints += [E[[tech.get('empty_step', 0) for tech in b.techs], np.arange(n)] == 0]
+        else:
+            start = {tech['name']: s for tech, s in zip(techs, storage_start)}
+            for tech in b.techs:
+                # Stored energy at the start of the horizon [kWh]
+                b.attrs[f'E_{tech["name"]}_start'] = cp.Parameter(nonneg=True, value=start[tech['name']])
+            b.constraints += [E[0] == cp.hstack([b.attrs[f'E_{tech["name"]}_start'] for tech in b.techs])]
+        for j, tech in enumerate(b.techs):
+            _series(b, 'E_' + tech['name'], E, j)
+        b.E = E
+    else:
+        import aggregation
+        for j, tech in enumerate(b.techs):
+            name = tech['name']
+            b.attrs['E_' + name], con = aggregation.linked_storage(
+                Q_in[:, j], Q_out[:, j], b.Cap[j:j + 1], tech['self_dis'], tech['ch_eff'], tech['dis_eff'], rep_days,
+                '_' + name, tech.get('empty_step', 0))
+            b.constraints += con
+    b.Q_in, b.Q_out = Q_in, Q_out
+    return b
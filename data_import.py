@@ -1,36 +1,152 @@
+import calendar
 import os
-import pandas as pd
 import numpy as np
 
-def get_data():
-    dir = 'elec_demand'
-    df_months = []
-    for filename in os.listdir(dir):
-        if filename.endswith('.csv'):
-            path = os.path.join(dir, filename)
-            df = pd.read_csv(path)
-            df.drop(df.index[-1], inplace=True)
-            df_months.append(df)
-
-    year = pd.concat(df_months, ignore_index=True)
-    year.dropna(inplace=True)
-
-    scaling_factor = (0.1741*0.88*55361*0.25*12)/year["Demand (MWh)"].sum() # monthly conusmption per household * number of households * 0.25 * 12 months / total consumption
-    elec = year["Demand (MWh)"] * scaling_factor * 1000 # in kWh
-
-    heat = pd.read_csv('manaus_heat.csv', delimiter=',', comment='#')['total_demand']
-    #print(heat.head())
-    header = heat.head(4)
-    heat.drop(heat.index[:4], inplace=True)
-
-    both = [heat, header]
-    heat = pd.concat(both, ignore_index=True)
+# UTC offsets [h] of the time zone abbreviations in the EIA timestamps
+TZ_OFFSETS = {'EST': -5, 'EDT': -4, 'CST': -6, 'CDT': -5, 'MST': -7, 'MDT': -6, 'PST': -8, 'PDT': -7,
+              'AKST': -9, 'AKDT': -8, 'HST': -10}
+
+HOUSEHOLDS = 55361  # Households of the favela (Manaus)
+SIZE_FAVELA = 1.2e6  # Area of the favela (Manaus) [m2]
+
+# Monthly EIA exports in elec_demand/, in calendar order (os.listdir order depends on the filesystem)
+MONTHS = ['jan', 'feb', 'mar', 'apr', 'mai', 'jun', 'jul', 'aug', 'sep', 'okt', 'nov', 'dez']
+
+
+def demand_files(dir='elec_demand'):
+    return [os.path.join(dir, month + '.csv') for month in MONTHS]
+
+
+def stream_demand(paths, region='US48', start='2023-01-01', hours=8760, standard_offset=-5, total=None,
+                  chunksize=100_000):
+    """Hourly demand [MWh] of region from EIA exports of any size, read in chunks of chunksize rows.
+
+    The rows are placed by their hour ending timestamp converted to UTC, so the daylight saving time changes,
+    duplicated rows (e.g. the first hour of the next month at the end of every monthly file) and the order of
+    the files do not matter; duplicates are averaged and missing hours interpolated. The series has hours
+    values starting with the hour ending at start 0:00 in local standard time (UTC offset standard_offset).
+    With total the series is scaled to sum up to total. Only the chunk being read and the hourly sums are kept
+    in memory.
+    """
+    import pandas as pd
+
+    start_hour = np.datetime64(start, 'h').astype(np.int64) - standard_offset  # Hours since the epoch, UTC
+    sums = np.zeros(hours)
+    counts = np.zeros(hours)
+    pattern = r'^(\d+)/(\d+)/(\d+) (\d+) ([ap])\.m\. ([A-Z]+)$'
+    for path in paths:
+        reader = pd.read_csv(path, usecols=['Region Code', 'Timestamp (Hour Ending)', 'Demand (MWh)'],
+                             encoding='utf-8-sig', chunksize=chunksize)
+        for chunk in reader:
+            chunk = chunk[chunk['Region Code'] == region].dropna()
+            if chunk.empty:
+                continue
+            parts = chunk['Timestamp (Hour Ending)'].str.extract(pattern)
+            if parts.isna().any().any():
+                raise ValueError(f'{path}: unknown timestamp format')
+            date = pd.to_datetime({'year': parts[2].astype(int), 'month': parts[0].astype(int), 'day': parts[1].astype(int)})
+            hour = parts[3].astype(int).values % 12 + 12 * (parts[4].values == 'p')
+            offset = parts[5].map(TZ_OFFSETS).values
+            if np.isnan(offset).any():
+                raise ValueError(f'{path}: unknown time zone in {set(parts[5][np.isnan(offset)])}')
+            utc = date.values.astype('datetime64[h]').astype(np.int64) + hour - offset.astype(np.int64)
+            index = utc - start_hour
+            inside = (index >= 0) & (index < hours)
+            np.add.at(sums, index[inside], chunk['Demand (MWh)'].values[inside])
+            np.add.at(counts, index[inside], 1)
+
+    if not counts.any():
+        raise ValueError(f'No demand of region {region} in the given period')
+    demand = np.full(hours, np.nan)
+    demand[counts > 0] = sums[counts > 0] / counts[counts > 0]
+    missing = counts == 0
+    if missing.any():
+        demand[missing] = np.interp(np.flatnonzero(missing), np.flatnonzero(~missing), demand[~missing])
+    if total is not None:
+        demand *= total / demand.sum()
+    return demand
+
+
+def annual_elec_demand(households=HOUSEHOLDS):
+    return 0.1741*0.88*households*0.25*12*1000 # in kWh: monthly conusmption per household * number of households * 0.25 * 12 months
+
+
+def utc_shift(path):
+    """Hours to shift a renewables.ninja series (UTC) by to start at local standard time 0:00."""
+    import pandas as pd
+
+    times = pd.read_csv(path, comment='#', usecols=['time', 'local_time'], parse_dates=['time', 'local_time'])
+    return -int((times['local_time'] - times['time']).min() / pd.Timedelta(hours=1))  # Daylight saving time excluded
+
+
+def get_heat(path='manaus_heat.csv'):
+    import pandas as pd
+
+    heat = pd.read_csv(path, delimiter=',', comment='#')['total_demand']
+    heat = np.roll(heat.values, -utc_shift(path))  # First hour at local midnight, the hours before wrap to the end
     heat = heat * 1000 * 1.5  # in kWh (1.5 is a scaling factor)
-    #print(heat.mean())
-    #print(len(heat))
-    #print(elec.mean())
+    assert len(heat) % 24 == 0
+    return heat
+
+
+def get_data(heat_path='manaus_heat.csv', households=HOUSEHOLDS):
+    elec = stream_demand(demand_files(), total=annual_elec_demand(households))
+    heat = get_heat(heat_path)
     assert len(elec) == 8760 and len(heat) == 8760
     return np.array(elec), np.array(heat)
 
 
-#get_data()
\ No newline at end of file
+def get_solar(path='maruas_solar.csv'):
+    import pandas as pd
+
+    #solar = pd.read_excel('solar.xlsx', header=None, names=['Solar radiation [kWh/m2]'])
+    solar = pd.read_csv(path, delimiter=',', comment='#')['swgdn']*0.001 # in kWh/m2
+    solar = np.roll(solar.values, -utc_shift(path))
+    assert len(solar) % 24 == 0
+    return solar
+
+
+def year_hours(first_year, years=1):
+    """Hours of the calendar years first_year, ..., first_year + years - 1 (8784 in leap years)."""
+    return np.array([8784 if calendar.isleap(y) else 8760 for y in range(first_year, first_year + years)])
+
+
+def month_hours(first_year, years=1):
+    """Hours of every month of the calendar years (e.g. for dispatch.solve_dispatch)."""
+    return np.array([calendar.monthrange(y, m)[1] * 24 for y in range(first_year, first_year + years) for m in range(1, 13)])
+
+
+def extend_years(series, first_year, years):
+    """Hourly one-year series (8760 values, e.g. the demand profile) repeated over the calendar years from
+    first_year, with February 29 of the leap years a copy of February 28."""
+    series = np.asarray(series, dtype=float)
+    assert len(series) == 8760
+    feb_28 = slice(58 * 24, 59 * 24)
+    leap = np.concatenate([series[:59 * 24], series[feb_28], series[59 * 24:]])
+    return np.concatenate([leap if calendar.isleap(y) else series for y in range(first_year, first_year + years)])
+
+
+def get_years(first_year, heat_paths, solar_paths, households=HOUSEHOLDS, wind_path='wind.xlsx'):
+    """ Inputs (elec, heat, solar, wind_speed) of several calendar years from first_year, one heat and one solar
+    file (renewables.ninja, with February 29 in leap years) per year.
+
+    The demand profile and the wind speeds are only available for one year and are repeated for every year.
+    """
+    years = len(heat_paths)
+    assert len(solar_paths) == years
+    hours = year_hours(first_year, years)
+    heat = np.concatenate([get_heat(p) for p in heat_paths])
+    solar = np.concatenate([get_solar(p) for p in solar_paths])
+    if len(heat) != hours.sum() or len(solar) != hours.sum():
+        raise ValueError(f'The heat and solar files do not cover the {hours.sum()} hours of {first_year}-{first_year + years - 1}')
+    elec = stream_demand(demand_files(), total=annual_elec_demand(households))
+    return extend_years(elec, first_year, years), heat, solar, extend_years(get_wind(wind_path), first_year, years)
+
+
+def get_wind(path='wind.xlsx'):
+    import pandas as pd
+
+    return pd.read_excel(path, header=None, names=['Wind speed [m/s]'])['Wind speed [m/s]'].values
+
+
+#get_data()
@@ -0,0 +1,178 @@
+""" Two-stage evaluation of a given design: hourly dispatch solved as monthly subproblems in parallel.
+
+ With the capacities fixed, the only coupling between the months is the energy stored in the storages (thermal
+ storage tank and battery of the default technologies) at the month boundaries. Every monthly subproblem looks ahead a few hours into the next
+ month, so it does not empty the storages at its end, and only its own hours are kept. All months are solved in
+ parallel with the start states taken from the previous iteration's boundary states of the preceding month,
+ until these no longer change (Jacobi iteration). Since both storages mostly cycle within a day this usually
+ takes two or three iterations.
+
+ Usage (in EnergyHub.py, after a design solve):
+
+    design = dispatch.design_of(hub)
+    result = dispatch.solve_dispatch(build_model, (elec_demand, heat_demand, solar, wind_speed), design)
+    dispatch.assign(hub, result)  # hub.cost.value, hub.co2.value and the node plots now refer to this dispatch
+
+ or re-evaluate the cost optimal design (or a given one) under other prices, stored as scenario dispatch:
+
+    python dispatch.py [--design Cap_gshp=910 Cap_pv=1.2e5] [--set price_gas=0.35 esc_elec=0.03] [--processes 4]
+"""
+
+import argparse
+
+import numpy as np
+import cvxpy as cp
+
+import sweep
+
+# Hours of the months of a (non-leap) year
+MONTH_HOURS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]) * 24
+
+# Time series of the dispatch of the default technologies (the flows of the power, heat and gas node plots and the
+# storage states); series_of and states_of give those of any technology table
+SERIES = ['Imp_elec', 'Imp_gas', 'Exp_elec', 'P_in_gb', 'P_out_gb', 'P_in_gshp', 'P_out_gshp', 'P_in_chp',
+          'P_out_heat_chp', 'P_out_elec_chp', 'P_out_pv', 'P_out_wind', 'Q_in_ts', 'Q_out_ts', 'Q_in_bat', 'Q_out_bat']
+STATES = ['E_ts', 'E_bat']
+
+# Monthly dispatch problems of the current solve_dispatch call (inherited by the forked workers)
+_months = []
+
+
+def design_of(hub):
+    """Capacities of the solved model hub, by name."""
+    return {name: getattr(hub, name).value for name in hub.capacities}
+
+
+def series_of(hub):
+    """Names of the flow time series of hub: grid imports and exports, inputs and outputs of the technologies."""
+    techs = hub.technologies
+    names = [flow for flow, _, _ in hub.streams.values()]
+    for tech in techs['conversion']:
+        outputs = tech['outputs']
+        names += ['P_in_' + tech['name']] + (['P_out_' + tech['name']] if len(outputs) == 1 else
+                                             [f'P_out_{carrier}_{tech["name"]}' for carrier in outputs])
+    names += ['P_out_' + tech['name'] for tech in techs['renewable']]
+    names += [f'Q_{flow}_{tech["name"]}' for tech in techs['storage'] for flow in ['in', 'out']]
+    return names
+
+
+def states_of(hub):
+    """Names of the storage states of hub (E_<storage>, Horizon + 1 values)."""
+    return ['E_' + tech['name'] for tech in hub.technologies['storage']]
+
+
+def _solve_month(args):
+    m, starts = args
+    month, prob, hours = _months[m]
+    for tech, start in zip(month.technologies['storage'], starts):
+        if f'E_{tech["name"]}_start' in vars(month):  # Storages with an upper bound of zero are not in the problem
+            getattr(month, f'E_{tech["name"]}_start').value = start
+    prob.solve(solver='SCIPY')
+    if prob.status != 'optimal':
+        raise RuntimeError(f'Dispatch of month {m + 1} is {prob.status}')
+    # Keep the hours of the month (and the storage states up to its end), drop the look-ahead
+    result = {name: np.asarray(getattr(month, name).value, dtype=float).ravel()[:hours] for name in series_of(month)}
+    result.update({name: np.asarray(getattr(month, name).value, dtype=float)[:hours + 1] for name in states_of(month)})
+    return result
+
+
+def solve_dispatch(build_model, inputs, design, processes=None, lookahead=48, tol=1e-3, max_iter=12,
+                   month_hours=MONTH_HOURS, technologies=None, parameters=None):
+    """Minimum cost dispatch of design (capacities by name) for the hourly inputs (elec, heat, solar, wind).
+
+    lookahead is the number of hours of the next month included in every monthly subproblem. month_hours are the
+    hours of the months of the inputs (see data_import.month_hours for several years). technologies is the
+    technology table of the design (see EnergyHub.build_model) and parameters are values set in every month (see
+    EnergyHub.set_parameters), e.g. other prices. Returns the joined time series by name (storage states with
+    Horizon + 1 values) and the number of iterations.
+    """
+    import components
+    from EnergyHub import set_parameters
+
+    global _months
+    if not isinstance(technologies, dict):
+        technologies = components.load_technologies(technologies)
+    n_months = len(month_hours)
+    bounds = np.concatenate([[0], np.cumsum(month_hours)])
+    _months = []
+    for m in range(n_months):
+        end = min(bounds[m + 1] + lookahead, bounds[-1])
+        month = build_model(*[np.asarray(x)[bounds[m]:end] for x in inputs], technologies=technologies,
+                            storage_start=[0] * len(technologies['storage']))
+        set_parameters(month, parameters or {})
+        fixed = [getattr(month, name) == value for name, value in design.items()]
+        prob = cp.Problem(cp.Minimize(month.cost), month.constraints + fixed)
+        _months.append((month, prob, month_hours[m]))
+
+    states = states_of(_months[0][0])
+    starts = np.zeros((n_months, len(states)))  # Stored energy of every storage at the start of every month
+    for iteration in range(1, max_iter + 1):
+        results = sweep.run_sweep(_solve_month, [(m, starts[m]) for m in range(n_months)], processes)
+        ends = np.array([[r[name][-1] for name in states] for r in results])
+        new_starts = np.vstack([np.zeros((1, len(states))), ends[:-1]])
+        converged = np.abs(new_starts - starts).max(initial=0) <= tol * max(1.0, np.abs(new_starts).max(initial=0))
+        starts = new_starts
+        if converged:
+            break
+
+    joined = {name: np.concatenate([r[name] for r in results]) for name in series_of(_months[0][0])}
+    for name in states:
+        joined[name] = np.concatenate([r[name][:-1] for r in results] + [results[-1][name][-1:]])
+    joined['iterations'] = iteration
+    return joined
+
+
+def assign(hub, result, design=None):
+    """Set the variables of hub to the dispatch result (and design), so its expressions evaluate to them."""
+    for name, value in list(result.items()) + list((design or {}).items()):
+        obj = getattr(hub, name, None)
+        if name in hub.slots:
+            # Slice of a stacked variable of the technology blocks (see components.py)
+            var, index = hub.slots[name]
+            current = np.zeros(var.shape) if var.value is None else np.array(var.value)
+            current[index] = np.reshape(value, current[index].shape)
+            var.value = current
+        elif isinstance(obj, cp.Variable):
+            obj.value = np.reshape(value, obj.shape)
+
+
+def main(argv=None):
+    from EnergyHub import EnergyHubModel, build_model, set_parameters
+    import results_store
+
+    parser = argparse.ArgumentParser(description='Monthly dispatch of an energy hub design, e.g. under other prices.')
+    parser.add_argument('--design', nargs='*', default=None, metavar='NAME=VALUE',
+                        help='capacities of the design, e.g. Cap_gshp=910 (others zero; default: the cost optimal design)')
+    parser.add_argument('--set', nargs='*', default=[], metavar='NAME=VALUE',
+                        help='parameters of the dispatch, e.g. price_gas=0.35 esc_elec=0.03 (see EnergyHub.set_parameters)')
+    parser.add_argument('--technologies', default=None,
+                        help='JSON file of the technologies (default: technologies.json, see components.py)')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='worker processes for the months (default: one per CPU core, 1: no parallelism)')
+    parser.add_argument('--results', default='results', help='directory of the results store (default: results)')
+    args = parser.parse_args(argv)
+
+    model = EnergyHubModel(cache=None, technologies=args.technologies).build()
+    hub = model.hub
+    if args.design is None:
+        model.solve('cost')
+        design = design_of(hub)
+    else:
+        design = dict.fromkeys(hub.capacities, 0.0)
+        for name, value in (item.split('=') for item in args.design):
+            if name not in design:
+                raise ValueError(f'{name!r} is not a capacity of the energy hub, expected one of {hub.capacities}')
+            design[name] = float(value)
+    parameters = {name: float(value) for name, value in (item.split('=') for item in args.set)}
+    set_parameters(hub, parameters)
+
+    result = solve_dispatch(build_model, model.inputs, design, args.processes,
+                            technologies=model.technologies, parameters=parameters)
+    assign(hub, result, design)
+    results_store.ResultsStore(args.results).put('dispatch', model.results())
+    print(f'Dispatch in {result["iterations"]} iterations: cost {float(np.sum(hub.cost.value)):.0f}, '
+          f'co2 {float(np.sum(hub.co2.value)):.0f}')
+
+
+if __name__ == '__main__':
+    main()
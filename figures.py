@@ -0,0 +1,241 @@
+""" Figures of the energy hub analysis, rendered headless in worker processes.
+
+ The figure functions only take plain data (floats, arrays and the results dicts of EnergyHubModel.results), so
+ they can run in a forked worker on the non-interactive Agg backend while the main process keeps solving. The
+ workflow collects the figures of a run as jobs (function name, arguments) and renders them all at once:
+
+    jobs = [('pie_plot_capacity', (results, 'pie_plot_capacity_min_cost.png')), ...]
+    figures.render(jobs, processes)             # PNG files only
+    figures.render(jobs, show=True)             # also open the figure windows (in this process)
+
+ Hourly series are downsampled by min/max bucketing before they are drawn: every bucket keeps its lowest and
+ highest value, so peaks and the envelope of the 8760 values stay visible with a fraction of the points.
+"""
+
+import numpy as np
+
+import sweep
+
+MAX_POINTS = 2000  # Points drawn per time series (None: draw every hour)
+
+# Whether the figures are kept open to be shown at the end of render() instead of being closed after saving
+_show = False
+
+
+def downsample(y, max_points=MAX_POINTS):
+    """Indices of the points of y kept by min/max bucketing, in order (first and last point always kept)."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+    buckets = max(max_points // 2, 1)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    valid = ~np.isnan(padded).all(axis=1)
+    offsets = np.arange(buckets)[valid] * size
+    lowest = np.nanargmin(padded[valid], axis=1) + offsets
+    highest = np.nanargmax(padded[valid], axis=1) + offsets
+    return np.unique(np.concatenate([[0, n - 1], lowest, highest]))
+
+
+def _plot_series(plt, y, label, max_points=MAX_POINTS):
+    # Line plot of an hourly series over the hours of the year, downsampled
+    y = np.asarray(y, dtype=float).ravel()
+    keep = downsample(y, max_points)
+    plt.plot(keep, y[keep], label=label)
+
+
+def _finish(plt, name, **kwargs):
+    plt.savefig(name, **kwargs)
+    if not _show:
+        plt.close()
+
+
+def pie_plot_production(results, name):
+    import matplotlib.pyplot as plt
+
+    # Energy sources and their respective production values
+    energy_sources = ['Solar', 'Natural Gas','CHP','HeatPump', 'Grid']
+    production_values = [results['P_out_pv'].sum(), results['P_out_gb'].sum(), results['P_out_heat_chp'].sum()+results['P_out_elec_chp'].sum() , results['P_out_gshp'].sum(), results['Imp_elec'].sum()]
+
+    # Creating the pie plot
+    plt.figure(figsize=(8, 8))
+    plt.pie(production_values, labels=energy_sources, autopct='%1.1f%%', startangle=140)
+    plt.title('Energy Production by Source')
+    plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+    plt.legend()
+    _finish(plt, name, dpi=300)
+
+
+def pie_plot_capacity(results, name):
+    import matplotlib.pyplot as plt
+
+    # Energy sources and their respective production values
+    energy_sources = ['Solar', 'Natural Gas','CHP' ,'HeatPump', 'Battery', 'Heat Storage']
+    production_values = [results['Cap_pv'], results['Cap_gb'], results['Cap_chp'], results['Cap_gshp'], results['Cap_bat'], results['Cap_ts']]
+
+    # Filter out energy sources with production values of zero
+    filtered_sources = []
+    filtered_values = []
+    for source, value in zip(energy_sources, production_values):
+        if value != 0:
+            filtered_sources.append(source)
+            filtered_values.append(value)
+
+    # Creating the pie plot
+    plt.figure(figsize=(8, 8))
+    plt.pie(filtered_values,labels=[f'{source}: {value}' for source, value in zip(filtered_sources, filtered_values)], startangle=140)
+    plt.title('Capacity Installed by Source')
+    plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+    plt.legend()
+    _finish(plt, name, dpi=300)
+
+
+def front_plot(x, y, xlabel, ylabel, title, name):
+    # Points of a front (e.g. emissions vs costs), connected in the given order
+    import matplotlib.pyplot as plt
+
+    plt.figure()
+    plt.plot(x, y, marker='o', linestyle='-')
+
+    # Adding labels and title
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    plt.title(title)
+
+    plt.grid(True)
+    _finish(plt, name, dpi=300)
+
+
+def investment_plot(scenarios, emissions, costs, name):
+    import matplotlib.pyplot as plt
+
+    # Setting up positions for the bars
+    x = np.arange(len(scenarios))  # the scenario locations
+    width = 0.35  # the width of the bars
+
+    # Plotting emissions
+    fig, ax = plt.subplots()
+    ax.bar(x - width/2, emissions, width, label='Emissions in kg CO2')
+
+    # Plotting costs
+    ax.bar(x + width/2, costs, width, label='Costs in CHF')
+
+    # Adding labels and title
+    ax.set_xlabel('Scenarios')
+    ax.set_ylabel('Values')
+    ax.set_title('Emissions and Costs for Different Scenarios')
+    ax.set_xticks(x)
+    ax.set_xticklabels(scenarios)
+    ax.legend()
+
+    _finish(plt, name, dpi=300)
+
+
+def investment_jobs_plot(scenarios, emissions, costs, jobs_created, name):
+    import matplotlib.pyplot as plt
+
+    # Setting up positions for the bars
+    x = np.arange(len(scenarios))  # the scenario locations
+    width = 0.2  # the width of the bars
+
+    # Plotting emissions
+    fig, ax = plt.subplots()
+    ax.bar(x - width, emissions, width, label='Emissions in kg CO2')
+
+    # Plotting costs
+    ax.bar(x, costs, width, label='Costs in CHF')
+
+    # Plotting jobs created (using a secondary y-axis)
+    ax2 = ax.twinx()
+    ax2.bar(x + width, jobs_created, width, color='orange', label='Jobs Created')
+
+    # Adding labels and title
+    ax.set_xlabel('Scenarios')
+    ax.set_ylabel('Emissions and Costs')
+    ax2.set_ylabel('Jobs Created')
+    ax.set_title('Emissions, Costs, and Jobs Created for Different Scenarios')
+    ax.set_xticks(x)
+    ax.set_xticklabels(scenarios)
+    # Positioning legends
+    ax.legend(loc='upper center', bbox_to_anchor=(0.67, 1))
+    ax2.legend(loc='upper center', bbox_to_anchor=(0.32, 1))
+
+    plt.tight_layout()  # Adjust layout to prevent overlapping labels
+    _finish(plt, name, dpi=300)
+
+
+def power_node_plot(results, name, max_points=MAX_POINTS):
+    import matplotlib.pyplot as plt
+
+    plt.figure()
+    for y, label in [(results['elec_demand'], 'Load'), (results['P_out_elec_chp'], 'CHP'), (-results['P_in_gshp'], 'GSHP'),
+                     (results['P_out_pv'], 'PV'), (results['P_out_wind'], 'Wind'), (results['Imp_elec'], 'Electricity grid'),
+                     (results['Q_out_bat'], 'Battery out'), (-results['Q_in_bat'], 'Battery in')]:
+        _plot_series(plt, y, label, max_points)
+    plt.legend()
+    plt.xlabel('Time [h]')
+    plt.ylabel('Output [kW]')
+    plt.title('Power node')
+    plt.tight_layout()
+    _finish(plt, name, bbox_inches='tight')
+
+
+def heat_node_plot(results, name, max_points=MAX_POINTS):
+    import matplotlib.pyplot as plt
+
+    plt.figure()
+    for y, label in [(results['heat_demand'], 'Load'), (results['P_out_heat_chp'], 'CHP'), (results['P_out_gshp'], 'GSHP'),
+                     (results['P_out_gb'], 'Gas boiler'), (results['Q_out_ts'], 'Storage tank out'),
+                     (-results['Q_in_ts'], 'Storage tank in')]:
+        _plot_series(plt, y, label, max_points)
+    plt.legend()
+    plt.xlabel('Time [h]')
+    plt.ylabel('Output [kW]')
+    plt.title('Heat node')
+    plt.tight_layout()
+    _finish(plt, name, bbox_inches='tight')
+
+
+def gas_node_plot(results, name, max_points=MAX_POINTS):
+    import matplotlib.pyplot as plt
+
+    plt.figure()
+    for y, label in [(results['P_in_chp'], 'CHP'), (results['P_in_gb'], 'Gas boiler'), (results['Imp_gas'], 'Natural gas grid')]:
+        _plot_series(plt, y, label, max_points)
+    plt.legend()
+    plt.xlabel('Time [h]')
+    plt.ylabel('Output [kW]')
+    plt.title('Gas node')
+    plt.tight_layout()
+    _finish(plt, name, bbox_inches='tight')
+
+
+def render_job(job):
+    """Render one figure job (function name, arguments) on the Agg backend."""
+    import matplotlib
+    matplotlib.use('Agg')
+    name, args = job
+    globals()[name](*args)
+
+
+def render(jobs, processes=None, show=False):
+    """Render the figure jobs, headless in a process pool, or in this process and shown at the end with show.
+
+    processes is the number of worker processes (None: one per CPU core, 1: render in this process).
+    """
+    global _show
+    jobs = list(jobs)
+    if not show:
+        sweep.run_sweep(render_job, jobs, processes)
+        return
+    import matplotlib.pyplot as plt
+    _show = True
+    try:
+        for name, args in jobs:
+            globals()[name](*args)
+        plt.show()
+    finally:
+        _show = False
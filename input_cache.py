@@ -0,0 +1,62 @@
+""" Binary cache of the preprocessed input time series.
+
+ Parsing the monthly demand CSVs, the heat and solar CSVs and above all wind.xlsx takes seconds, while the result
+ is a handful of 8760-long arrays. Every dataset is stored as one .npz file together with the size, modification
+ time and sha256 of its source files. As long as sizes and mtimes are unchanged the arrays are read back
+ directly; if an mtime changed but the contents did not (e.g. a fresh checkout) only the stored mtimes are
+ updated, otherwise the dataset is rebuilt from its sources.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Increase when the preprocessing of the inputs changes, so stored datasets are rebuilt
+VERSION = 2
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _stat(path):
+    st = os.stat(path)
+    return [path, st.st_size, st.st_mtime_ns]
+
+
+def _save(path, arrays, single, sources):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp.npz'  # One per process, so concurrent writers never share a temporary file
+    np.savez(tmp, *arrays, single=single, version=VERSION, sources=json.dumps(sources))
+    os.replace(tmp, path)  # Atomic, so parallel workers never read a partly written file
+
+
+def load(name, sources, build, cache_dir='.input_cache'):
+    """Dataset name built by build() from the files sources, read from the cache if none of them changed.
+
+    build returns an array or a tuple of arrays; the cached dataset is returned the same way.
+    """
+    path = os.path.join(cache_dir, name + '.npz')
+    stats = [_stat(p) for p in sources]
+    if os.path.exists(path):
+        with np.load(path) as f:
+            stored = json.loads(str(f['sources'])) if int(f['version']) == VERSION else None
+            single = bool(f['single'])
+            arrays = [f[f'arr_{i}'] for i in range(len(f.files) - 3)]
+        if stored is not None and [s[:3] for s in stored] == stats:
+            return arrays[0] if single else tuple(arrays)
+        if stored is not None and [s[0] for s in stored] == list(sources) and all(s[3] == _sha256(s[0]) for s in stored):
+            _save(path, arrays, single, [stat + [s[3]] for stat, s in zip(stats, stored)])
+            return arrays[0] if single else tuple(arrays)
+
+    values = build()
+    single = not isinstance(values, tuple)
+    arrays = [np.asarray(v) for v in ([values] if single else values)]
+    _save(path, arrays, single, [stat + [_sha256(p)] for stat, p in zip(stats, sources)])
+    return values
@@ -0,0 +1,194 @@
+""" Monte Carlo analysis of the cost optimal energy hub under uncertain prices, escalation rates and efficiencies.
+
+ Every sample draws one value per uncertain parameter from its distribution and minimizes cost. The model is built
+ and compiled once; samples only set parameter values (EnergyHub.set_parameters) and are solved in batches over
+ a process pool (sweep.run_sweep). After every batch the running mean, standard deviation and confidence interval
+ of cost, co2 and the capacities are updated, and sampling stops once the confidence intervals of the watched
+ results are within rtol of their means (or after max_samples).
+
+ Distributions are given as {name: (method, *arguments)} with a method of numpy.random.Generator, e.g.
+ ('triangular', left, mode, right), ('uniform', low, high) or ('normal', mean, sd). Sample i is drawn from its own
+ generator seeded with (seed, i), so the samples do not depend on the batch size or the number of processes.
+
+ Usage:
+
+    python montecarlo.py [--distributions dist.json] [--max-samples 500] [--rtol 0.01] [--aggregation-days 12]
+"""
+
+import argparse
+import csv
+import json
+from statistics import NormalDist
+
+import numpy as np
+
+import sweep
+
+# Default uncertainty of the parameters whose sources are least certain (see the sources in EnergyHub.py)
+DISTRIBUTIONS = {
+    'price_gas': ('triangular', 0.21, 0.21*1.4, 0.21*1.8),  # [CHF, EUR, USD/kWh]
+    'price_elec': ('triangular', 0.12, 0.16, 0.22),  # [CHF/kWh]
+    'esc_gas': ('uniform', 0.0, 0.04),  # Escalation rate per year
+    'esc_elec': ('uniform', 0.0, 0.04),  # Escalation rate per year
+    'co2_elec': ('triangular', 0.08, 0.1295, 0.2),  # [kgCO2/kWh]
+    'cost_pv': ('triangular', 180, 250, 350),  # [CHF, EUR, USD/m2]
+    'eff_pv': ('uniform', 0.13, 0.19),
+}
+
+RESULTS = ['cost', 'co2', 'jobs', 'Inv', 'Cap_gb', 'Cap_gshp', 'Cap_chp', 'Cap_pv', 'Cap_wind', 'Cap_ts', 'Cap_bat']
+
+
+def draw(distributions, seed, i):
+    """Parameter values of sample i."""
+    rng = np.random.default_rng([seed, i])
+    return {name: float(getattr(rng, method)(*args)) for name, (method, *args) in distributions.items()}
+
+
+class RunningStats:
+    """Mean and variance of a fixed set of results, updated one sample at a time (Welford's algorithm)."""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.n = 0
+        self.mean = np.zeros(len(self.names))
+        self.m2 = np.zeros(len(self.names))
+
+    def update(self, results):
+        x = np.array([results[name] for name in self.names], dtype=float)
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def std(self):
+        return np.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.full(len(self.names), np.inf)
+
+    def halfwidth(self, confidence=0.95):
+        """Half width of the confidence interval of the means."""
+        return NormalDist().inv_cdf(0.5 + confidence / 2) * self.std() / np.sqrt(max(self.n, 1))
+
+    def converged(self, names, rtol, confidence=0.95):
+        """Whether the confidence intervals of the means of names are within rtol of the means."""
+        halfwidth = dict(zip(self.names, self.halfwidth(confidence)))
+        mean = dict(zip(self.names, self.mean))
+        return all(halfwidth[name] <= rtol * abs(mean[name]) for name in names)
+
+    def table(self, confidence=0.95):
+        return {name: (m, s, h) for name, m, s, h in zip(self.names, self.mean, self.std(), self.halfwidth(confidence))}
+
+
+# Samples
+# ========
+# Solved in the workers of sweep.run_sweep, which inherit the compiled model
+_model = None
+
+
+def solve_sample(sample):
+    # Minimize cost for one parameter set; None if the problem can not be solved (not optimal or a solver failure,
+    # e.g. of numerically difficult parameter values)
+    import cvxpy as cp
+    from EnergyHub import set_parameters
+
+    i, values = sample
+    set_parameters(_model.hub, values)
+    try:
+        _model.solve('cost')
+    except (RuntimeError, cp.error.SolverError):
+        return None
+    results = _model.results()
+    return {name: results[name] for name in RESULTS}
+
+
+def run(model, distributions=None, max_samples=500, min_samples=30, batch=None, rtol=0.01, confidence=0.95,
+        watch=('cost', 'co2', 'Cap_pv', 'Cap_bat'), seed=0, processes=None, samples_csv=None, verbose=True):
+    """Sample the cost optimum of model (an EnergyHubModel) under distributions (default DISTRIBUTIONS).
+
+    Samples are solved in batches of batch (default: 4 per process) until the confidence intervals of the results
+    in watch are within rtol of their means (at least min_samples) or max_samples are solved. Every sample
+    (parameters and results) is appended to samples_csv if given. Returns the RunningStats.
+    """
+    import multiprocessing
+
+    global _model
+    distributions = DISTRIBUTIONS if distributions is None else distributions
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if batch is None:
+        batch = 4 * processes
+    _model = model
+    if model.hub is None:
+        model.build()
+    nominal = {name: getattr(model.hub, name) for name in distributions}
+    nominal = {name: value if name.startswith('esc_') else value.value for name, value in nominal.items()}
+    model.hub.prob_min_cost.get_problem_data(model.solver)  # Compile once, before forking
+
+    stats = RunningStats(RESULTS)
+    failed = 0
+    f = open(samples_csv, 'w', newline='') if samples_csv else None
+    try:
+        writer = csv.DictWriter(f, fieldnames=['sample'] + list(distributions) + RESULTS) if f else None
+        if writer:
+            writer.writeheader()
+        i = 0
+        while i < max_samples:
+            points = [(j, draw(distributions, seed, j)) for j in range(i, min(i + batch, max_samples))]
+            i += len(points)
+            for (j, values), results in zip(points, sweep.run_sweep(solve_sample, points, processes)):
+                if results is None:
+                    failed += 1
+                    continue
+                stats.update(results)
+                if writer:
+                    writer.writerow(dict(values, sample=j, **results))
+            if f:
+                f.flush()
+            if verbose:
+                table = stats.table(confidence)
+                print(f'{stats.n} samples ({failed} failed): ' + ', '.join(
+                    f'{name} {table[name][0]:.4g} ± {table[name][2]:.2g}' for name in watch))
+            if stats.n >= min_samples and stats.converged(watch, rtol, confidence):
+                break
+    finally:
+        if f:
+            f.close()
+        from EnergyHub import set_parameters
+        set_parameters(model.hub, nominal)
+    return stats
+
+
+def main(argv=None):
+    from EnergyHub import EnergyHubModel
+
+    parser = argparse.ArgumentParser(description='Monte Carlo analysis of the cost optimal energy hub.')
+    parser.add_argument('--distributions', default=None,
+                        help='JSON file {name: [method, arguments...]} (default: DISTRIBUTIONS of montecarlo.py)')
+    parser.add_argument('--max-samples', type=int, default=500, help='maximum number of samples (default: 500)')
+    parser.add_argument('--min-samples', type=int, default=30, help='minimum number of samples (default: 30)')
+    parser.add_argument('--rtol', type=float, default=0.01,
+                        help='stop once the confidence intervals are within rtol of the means (default: 0.01)')
+    parser.add_argument('--confidence', type=float, default=0.95, help='confidence level (default: 0.95)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the samples (default: 0)')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='worker processes (default: one per CPU core, 1: no parallelism)')
+    parser.add_argument('--aggregation-days', type=int, default=None,
+                        help='number of representative days optimized instead of the full year (screening runs)')
+    parser.add_argument('--samples', default='montecarlo_samples.csv',
+                        help='CSV file of the parameters and results of every sample')
+    args = parser.parse_args(argv)
+
+    distributions = None
+    if args.distributions:
+        with open(args.distributions) as f:
+            distributions = json.load(f)
+    # Every sample is a different problem, so the solve cache would only fill up
+    model = EnergyHubModel(aggregation_days=args.aggregation_days, cache=None).build()
+    stats = run(model, distributions, args.max_samples, args.min_samples, rtol=args.rtol, confidence=args.confidence,
+                seed=args.seed, processes=args.processes, samples_csv=args.samples)
+
+    print(f'\n{"":<8} {"mean":>14} {"std":>14} {f"± {args.confidence:.0%}":>14}')
+    for name, (mean, std, halfwidth) in stats.table(args.confidence).items():
+        print(f'{name:<8} {mean:14.1f} {std:14.1f} {halfwidth:14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+""" Adaptive generation of the cost-co2 Pareto front.
+
+ Minimum cost as a function of the co2 bound is convex (the model is an LP), so between two solved points the
+ front lies below their chord and above the extensions of the neighbouring segments. The largest distance
+ between the chord and these supporting lines bounds the approximation error of the segment. The segment with
+ the largest bound is split next, at the co2 value where the bound is attained (this targets the knee instead
+ of the flat stretches), until the bound of all segments is below tol or the solve budget is used up.
+ Distances are measured with co2 and cost scaled to the range between the two anchors.
+
+ Usage (in EnergyHub.py, after solving both anchors):
+
+    front = pareto.adaptive_front(solve_co2_bound, (co2_min, cost_at_co2_min), (co2_at_cost_min, cost_min))
+    for scenario, bound, (cost, co2, jobs) in front: ...
+"""
+
+import multiprocessing
+
+import numpy as np
+
+import sweep
+
+
+def _segment_errors(x, y):
+    # Error bound and split position of every segment of the normalized front (x ascending, y descending)
+    n = len(x)
+    errors, splits = np.zeros(n - 1), np.zeros(n - 1)
+    for i in range(n - 1):
+        w = x[i + 1] - x[i]
+        if w <= 1e-12:
+            continue
+        chord = lambda t: y[i] + (y[i + 1] - y[i]) * (t - x[i]) / w
+        lines = []  # Supporting lines (slope, point) from the neighbouring segments
+        if i > 0 and x[i] - x[i - 1] > 1e-12:
+            lines.append(((y[i] - y[i - 1]) / (x[i] - x[i - 1]), x[i], y[i]))
+        if i + 2 < n and x[i + 2] - x[i + 1] > 1e-12:
+            lines.append(((y[i + 2] - y[i + 1]) / (x[i + 2] - x[i + 1]), x[i + 1], y[i + 1]))
+        elif i + 2 == n:
+            lines.append((0.0, x[i + 1], y[i + 1]))  # No cost below the cost optimum
+        if not lines:
+            lines.append((0.0, x[-1], y[-1]))
+        lower = lambda t: max(s * (t - px) + py for s, px, py in lines)
+        if len(lines) == 2 and lines[0][0] != lines[1][0]:
+            (s0, x0, y0), (s1, x1, y1) = lines
+            vertex = (y1 - y0 + s0 * x0 - s1 * x1) / (s0 - s1)
+            vertex = min(max(vertex, x[i]), x[i + 1])
+        else:
+            vertex = x[i] if lines[0][1] == x[i + 1] else x[i + 1]
+        gap = chord(vertex) - lower(vertex)
+        errors[i] = max(gap, 0) / np.hypot(1, (y[i + 1] - y[i]) / w)  # Distance to the chord
+        splits[i] = x[i] + min(max((vertex - x[i]) / w, 0.1), 0.9) * w
+    return errors, splits
+
+
+def adaptive_front(solve_point, low_co2, low_cost, tol=1e-3, max_solves=9, processes=None, prefix='co2_front'):
+    """Points of the front between the anchors low_co2 = (co2, cost) of the co2 optimum and low_cost = (co2, cost)
+    of the cost optimum.
+
+    solve_point((scenario, co2 bound)) solves one point and returns (cost, co2, ...) (a module level function,
+    see sweep.run_sweep). Up to processes segments are split per round. Returns [(scenario, bound, result)]
+    of the interior points in order of increasing co2.
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    x_range = low_cost[0] - low_co2[0]
+    y_range = low_co2[1] - low_cost[1]
+    if x_range <= 0 or y_range <= 0:
+        return []
+
+    solved = []  # (co2, cost, scenario, bound, result)
+    while len(solved) < max_solves:
+        points = sorted([(low_co2[0], low_co2[1])] + [(p[0], p[1]) for p in solved] + [(low_cost[0], low_cost[1])])
+        x = np.array([(p[0] - low_co2[0]) / x_range for p in points])
+        y = np.array([(p[1] - low_cost[1]) / y_range for p in points])
+        errors, splits = _segment_errors(x, y)
+        order = [i for i in np.argsort(-errors) if errors[i] > tol]
+        batch = order[:max(1, min(processes, max_solves - len(solved)))]
+        if not batch:
+            break
+        jobs = [(f'{prefix}_{len(solved) + k:02d}', low_co2[0] + splits[i] * x_range) for k, i in enumerate(batch)]
+        for (scenario, bound), result in zip(jobs, sweep.run_sweep(solve_point, jobs, processes)):
+            solved.append((float(np.sum(result[1])), float(np.sum(result[0])), scenario, bound, result))
+    solved.sort(key=lambda p: (p[0], -p[1]))
+    return [(scenario, bound, result) for _, _, scenario, bound, result in solved]
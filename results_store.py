@@ -0,0 +1,116 @@
+""" Columnar store of solved scenarios: KPIs, capacities and the full hourly dispatch.
+
+ Every scenario is a directory with one .npy file per time series (float arrays, memory-mapped on access) and a
+ kpis.json with its scalar results (cost, co2, jobs, Inv, capacities). Columns are only read when they are used,
+ so the KPI table of hundreds of scenarios or one series across all of them is cheap to load, and plotting or
+ analysis never needs a re-solve or parsing of the CSV outputs.
+
+ Usage:
+
+    store = ResultsStore('results')
+    store.put('min_cost', model.results())
+    store.kpis()                          # pandas DataFrame, one row per scenario
+    store.load('min_cost')['E_bat']       # memory-mapped array
+    store.series('P_out_pv')              # scenarios x hours
+"""
+
+import errno
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Mapping
+
+import numpy as np
+
+
+class Scenario(Mapping):
+    """Results of one stored scenario by name; series are memory-mapped when accessed."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'kpis.json')) as f:
+            self.kpis = json.load(f)
+        self.series_names = sorted(f[:-len('.npy')] for f in os.listdir(path) if f.endswith('.npy'))
+
+    def __getitem__(self, name):
+        if name in self.kpis:
+            return self.kpis[name]
+        if name in self.series_names:
+            return np.load(os.path.join(self.path, name + '.npy'), mmap_mode='r')
+        raise KeyError(name)
+
+    def __iter__(self):
+        return iter(list(self.kpis) + self.series_names)
+
+    def __len__(self):
+        return len(self.kpis) + len(self.series_names)
+
+
+class ResultsStore:
+    """Directory of scenarios, see the module docstring."""
+
+    def __init__(self, root='results'):
+        self.root = root
+
+    def _path(self, scenario):
+        if not scenario or '/' in scenario or os.sep in scenario or scenario.startswith('.'):
+            raise ValueError(f'Invalid scenario name {scenario!r}')
+        return os.path.join(self.root, scenario)
+
+    def put(self, scenario, results):
+        """Store results (scalars and arrays by name, e.g. EnergyHubModel.results()), replacing the scenario."""
+        path = self._path(scenario)
+        os.makedirs(self.root, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f'.{scenario}.', dir=self.root)
+        kpis = {}
+        for name, value in results.items():
+            value = np.asarray(value, dtype=float)
+            if value.size == 1:
+                kpis[name] = float(value.ravel()[0])
+            else:
+                np.save(os.path.join(tmp, name + '.npy'), value)
+        with open(os.path.join(tmp, 'kpis.json'), 'w') as f:
+            json.dump(kpis, f)
+        # Swap the complete directory in, so readers never see a partial scenario. A rename onto a scenario that
+        # exists fails; it is then moved aside and removed, and the rename is retried, as another writer may have
+        # moved its own directory in (or the old one aside) in the meantime. The last writer wins.
+        old = tmp + '.old'
+        while True:
+            try:
+                os.rename(tmp, path)
+                break
+            except OSError as e:
+                if e.errno not in (errno.ENOTEMPTY, errno.EEXIST):
+                    raise
+            try:
+                os.rename(path, old)
+            except FileNotFoundError:
+                continue
+            shutil.rmtree(old, ignore_errors=True)
+
+    def scenarios(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(s for s in os.listdir(self.root)
+                      if not s.startswith('.') and os.path.exists(os.path.join(self.root, s, 'kpis.json')))
+
+    def __contains__(self, scenario):
+        return os.path.exists(os.path.join(self._path(scenario), 'kpis.json'))
+
+    def load(self, scenario):
+        if scenario not in self:
+            raise KeyError(scenario)
+        return Scenario(self._path(scenario))
+
+    def kpis(self, scenarios=None):
+        """Scalar results of the scenarios (default: all) as a DataFrame indexed by scenario."""
+        import pandas as pd
+
+        scenarios = self.scenarios() if scenarios is None else list(scenarios)
+        return pd.DataFrame([self.load(s).kpis for s in scenarios], index=pd.Index(scenarios, name='scenario'))
+
+    def series(self, name, scenarios=None):
+        """Time series name of the scenarios (default: all), one row per scenario."""
+        scenarios = self.scenarios() if scenarios is None else list(scenarios)
+        return np.vstack([self.load(s)[name] for s in scenarios])
@@ -0,0 +1,281 @@
+""" Sensitivity report of the energy hub from the duals and the optimal basis of a single solve.
+
+ The problem is solved with HiGHS directly on the data of the compiled problem, which keeps the solver with its
+ optimal basis. By the envelope theorem the derivative of the optimal value with respect to a parameter p of the
+ LP  min c'x  s.t.  A x (=, <=) b  is
+
+    d f/dp = dc/dp' x + y' (db/dp - dA/dp x)
+
+ with the primal solution x and the row duals y. dc/dp, db/dp and dA/dp are read from the problem data with p
+ moved by a small step (parameters only update the compiled data, so this takes no solve). The report covers
+
+    balances:    shadow prices of the power, heat and gas balances of every time step (marginal cost of one more
+                 kWh demanded in that hour of every year)
+    parameters:  derivative and elasticity of the optimal value for prices, escalation rates, efficiencies,
+                 investment costs, roof area (max_solar_area) and battery cap (max_cap_bat), and the bounds co2_max
+                 and inv_max if set
+    co2 prices:  the price of the co2 bound (CHF, EUR, USD per kgCO2 avoided) at points of the cost-co2 front
+
+ Parameters that only enter the costs c or the right hand sides b come with a validity range from the ranging of
+ the optimal basis: within it the derivative is exact (the optimal value is linear in the parameter). Where p
+ moves several entries, the range follows from the 100% rule and is conservative. Parameters in the constraint
+ matrix (efficiencies) only have the first order derivative.
+
+ Usage (in EnergyHub.py or an interactive session):
+
+    model = EnergyHubModel().build()
+    rep = sensitivity.report(model)
+    rep.parameters['max_solar_area']  # {'value', 'derivative', 'elasticity', 'lower', 'upper', 'kind'}
+    sensitivity.co2_prices(model, [6e6, 7e6, 8e6])
+
+    python sensitivity.py [--aggregation-days 12] [--co2-points 5] [--results results]
+"""
+
+import argparse
+import csv
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+# Scalar parameters of the report (cvxpy parameters or escalation rates of build_model)
+PARAMETERS = ['price_gas', 'price_elec', 'exp_price_elec', 'esc_gas', 'esc_elec', 'co2_gas', 'co2_elec', 'eff_gb',
+              'eff_gshp', 'eff_elec_chp', 'eff_heat_chp', 'eff_pv', 'cost_gb', 'cost_gshp', 'cost_chp', 'cost_pv',
+              'cost_ts', 'cost_bat', 'max_solar_area', 'max_cap_bat']
+
+# Balances by the carrier of their column of the balance constraint (components.CARRIERS)
+BALANCES = {'power': 'elec', 'heat': 'heat', 'gas': 'gas'}
+
+
+def problem_of(hub, objective='cost', co2_max=None, inv_max=None):
+    """Compiled problem of hub for objective ('cost' or 'co2') and the bounds, with the bound values set."""
+    from EnergyHub import PROBLEMS
+
+    if co2_max is not None:
+        hub.co2_max.value = co2_max
+    if inv_max is not None:
+        hub.inv_max.value = inv_max
+    key = (objective, co2_max is not None, inv_max is not None)
+    if key not in PROBLEMS:
+        raise ValueError(f'No compiled problem for objective {objective!r} with these bounds')
+    return getattr(hub, PROBLEMS[key])
+
+
+def solve_lp(prob):
+    """Solve the problem data of prob with highspy; returns the data, the primal and dual solution and the solver.
+
+    The data is that of cvxpy's HiGHS interface (equality rows first, then the rows A x <= b); the solver keeps the
+    optimal basis for the ranging. The hub objectives have no constant term, so the optimal value is c'x. The
+    variables of prob are set to the solution (see primal); the duals of its constraints are read with dual.
+    """
+    import highspy
+
+    data, _, inverse = prob.get_problem_data('HIGHS')
+    c, A, b = data['c'], data['A'].tocsc(), data['b']
+    zero = data['dims'].zero
+    inf = highspy.kHighsInf
+    model = highspy.HighsLp()
+    model.num_col_, model.num_row_ = A.shape[1], A.shape[0]
+    model.col_cost_ = c
+    model.col_lower_ = np.full(len(c), -inf) if data.get('lower_bounds') is None else data['lower_bounds']
+    model.col_upper_ = np.full(len(c), inf) if data.get('upper_bounds') is None else data['upper_bounds']
+    model.row_lower_ = np.concatenate([b[:zero], np.full(len(b) - zero, -inf)])
+    model.row_upper_ = b
+    model.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+    model.a_matrix_.start_ = A.indptr
+    model.a_matrix_.index_ = A.indices
+    model.a_matrix_.value_ = A.data
+    highs = highspy.Highs()
+    highs.setOptionValue('output_flag', False)
+    highs.passModel(model)
+    highs.run()
+    status = highs.getModelStatus()
+    if status != highspy.HighsModelStatus.kOptimal:
+        raise RuntimeError(f'Energy hub problem is {highs.modelStatusToString(status)}')
+    solution = highs.getSolution()
+    x = np.array(solution.col_value)
+    lp = SimpleNamespace(c=c.copy(), b=b.copy(), A=data['A'].copy(), value=float(c @ x), x=x,
+                         y=np.array(solution.row_dual), highs=highs, ranging=None, inverse=inverse)
+    for var in prob.variables():
+        var.value = primal(lp, var)
+    return lp
+
+
+def primal(lp, var):
+    """Value of the variable var of the problem solved into lp by solve_lp (its columns in the stuffed problem)."""
+    offsets = next(data for data in reversed(lp.inverse[:-1]) if hasattr(data, 'var_offsets')).var_offsets
+    start = offsets[var.id]
+    return lp.x[start:start + var.size].reshape(var.shape, order='F')
+
+
+def dual(lp, con):
+    """Dual of the constraint con of the problem solved into lp by solve_lp, as cvxpy's dual_value.
+
+    The rows of con follow those of the constraints before it in the solver data (equalities first); its id is
+    mapped to that of the canonical constraint through the reductions of the compilation.
+    """
+    con_id = con.id
+    for data in lp.inverse[:-1]:
+        con_id = getattr(data, 'cons_id_map', {}).get(con_id, con_id)
+    solver_data = lp.inverse[-1].inverse_data
+    start = 0
+    for canonical in solver_data['eq_constr'] + solver_data['other_constr']:
+        if canonical.id == con_id:
+            return -lp.y[start:start + canonical.size].reshape(con.shape, order='F')
+        start += canonical.size
+    raise KeyError(f'Constraint {con_id} is not in the solver data')
+
+
+def _get(hub, name):
+    value = getattr(hub, name)
+    return value if name.startswith('esc_') else value.value
+
+
+def _steps(k, current, up, dn):
+    # Largest steps (down, up) of a parameter moving the entries by k per unit, within their ranges together
+    # (100% rule: the fractions of the allowed changes used by all entries add up to at most one)
+    used = k != 0
+    if not used.any():
+        return -np.inf, np.inf
+    k, increase, decrease = k[used], (up - current)[used], (current - dn)[used]
+    with np.errstate(divide='ignore'):
+        s_up = np.sum(np.abs(k) / np.where(k > 0, increase, decrease))
+        s_dn = np.sum(np.abs(k) / np.where(k > 0, decrease, increase))
+    return (-1 / s_dn if s_dn > 0 else -np.inf), (1 / s_up if s_up > 0 else np.inf)
+
+
+def parameter(hub, prob, lp, name, rel_step=1e-4):
+    """Derivative of the optimal value of prob (solved into lp by solve_lp) with respect to parameter name.
+
+    Returns value, derivative, elasticity (relative change of the optimal value per relative change of the
+    parameter), the validity range lower..upper (None for parameters in the constraint matrix) and the kind of the
+    parameter: 'cost', 'rhs', 'matrix' or 'none' (not in the problem).
+    """
+    from EnergyHub import set_parameters
+
+    p = float(_get(hub, name))
+    step = rel_step * abs(p) if p != 0 else rel_step
+    set_parameters(hub, {name: p + step})
+    try:
+        data, _, _ = prob.get_problem_data('HIGHS')
+        dc, db, dA = (data['c'] - lp.c) / step, (data['b'] - lp.b) / step, (data['A'] - lp.A) / step
+    finally:
+        set_parameters(hub, {name: p})
+    dA.eliminate_zeros()
+    derivative = float(dc @ lp.x + lp.y @ (db - dA @ lp.x))
+
+    lower = upper = None
+    if dA.nnz:
+        kind = 'matrix'
+    elif not dc.any() and not db.any():
+        kind, lower, upper = 'none', -np.inf, np.inf
+    else:
+        kind = 'cost' if dc.any() else 'rhs'
+        if lp.ranging is None:
+            lp.ranging = lp.highs.getRanging()[1]
+        r, n = lp.ranging, len(lp.c)  # Cost ranging of the columns comes first (followed by that of the rows)
+        down, up = _steps(np.concatenate([dc, db]), np.concatenate([lp.c, lp.b]),
+                          np.concatenate([np.array(r.col_cost_up.value_)[:n], r.row_bound_up.value_]),
+                          np.concatenate([np.array(r.col_cost_dn.value_)[:n], r.row_bound_dn.value_]))
+        lower, upper = p + down, p + up
+    elasticity = derivative * p / lp.value if lp.value else 0.0
+    return dict(value=p, derivative=derivative, elasticity=elasticity, lower=lower, upper=upper, kind=kind)
+
+
+def report(model, objective='cost', co2_max=None, inv_max=None, parameters=None):
+    """Sensitivity of the optimum of model (an EnergyHubModel) for objective and bounds (see EnergyHubModel.solve).
+
+    Returns value (the optimal value), balances (shadow prices by balance, one per time step) and parameters
+    (see parameter(), by name; default PARAMETERS and the bounds that are set).
+    """
+    from EnergyHub import update_op_prices
+
+    if model.hub is None:
+        model.build()
+    hub = model.hub
+    update_op_prices(hub)
+    prob = problem_of(hub, objective, co2_max, inv_max)
+    lp = solve_lp(prob)
+
+    # Marginal cost of the demand of every time step, per kWh demanded in that hour of every year
+    hours = np.ones(len(hub.elec_demand)) if hub.rep_days is None else hub.rep_days.weights
+    hours = hours / hub.data_years
+    duals = dual(lp, hub.balance_con[0])
+    balances = {name: -duals[:, hub.carriers.index(carrier)] / hours for name, carrier in BALANCES.items()}
+
+    names = list(PARAMETERS if parameters is None else parameters)
+    names += [name for name, bound in [('co2_max', co2_max), ('inv_max', inv_max)] if bound is not None]
+    return SimpleNamespace(value=lp.value, balances=balances,
+                           parameters={name: parameter(hub, prob, lp, name) for name in names})
+
+
+def co2_prices(model, bounds):
+    """Price of the co2 bound (reduction of the minimum cost per kgCO2 more allowed) at every bound of bounds.
+
+    Returns one dict per bound with co2_max, cost, price and the range lower..upper of co2_max over which the
+    price holds (the segment of the piecewise linear cost-co2 front).
+    """
+    from EnergyHub import update_op_prices
+
+    if model.hub is None:
+        model.build()
+    hub = model.hub
+    update_op_prices(hub)
+    rows = []
+    for bound in bounds:
+        prob = problem_of(hub, 'cost', co2_max=bound)
+        lp = solve_lp(prob)
+        s = parameter(hub, prob, lp, 'co2_max')
+        rows.append(dict(co2_max=bound, cost=lp.value, price=-s['derivative'], lower=s['lower'], upper=s['upper']))
+    return rows
+
+
+def _write(path, fieldnames, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    from EnergyHub import EnergyHubModel
+
+    parser = argparse.ArgumentParser(description='Sensitivity report of the cost optimal energy hub.')
+    parser.add_argument('--aggregation-days', type=int, default=None,
+                        help='number of representative days optimized instead of the full year (screening runs)')
+    parser.add_argument('--co2-points', type=int, default=5,
+                        help='points of the cost-co2 front at which the co2 price is reported (default: 5)')
+    parser.add_argument('--results', default='results', help='directory of the CSV files (default: results)')
+    args = parser.parse_args(argv)
+
+    model = EnergyHubModel(aggregation_days=args.aggregation_days, cache=None).build()
+    rep = report(model)
+    co2_at_cost_min = float(model.hub.co2.value)
+    print(f'Minimum cost {rep.value:.1f}\n')
+    print(f'{"parameter":<16} {"value":>12} {"d cost/d p":>14} {"elasticity":>11} {"valid from":>12} {"to":>12}')
+    for name, s in rep.parameters.items():
+        valid = ('', '') if s['lower'] is None else (f'{s["lower"]:.6g}', f'{s["upper"]:.6g}')
+        print(f'{name:<16} {s["value"]:12.6g} {s["derivative"]:14.6g} {s["elasticity"]:11.4f} {valid[0]:>12} {valid[1]:>12}')
+
+    os.makedirs(args.results, exist_ok=True)
+    _write(os.path.join(args.results, 'sensitivity_parameters.csv'),
+           ['parameter', 'value', 'derivative', 'elasticity', 'lower', 'upper', 'kind'],
+           [dict(s, parameter=name) for name, s in rep.parameters.items()])
+    _write(os.path.join(args.results, 'sensitivity_balances.csv'), ['step'] + list(BALANCES),
+           [dict(step=t, **{name: prices[t] for name, prices in rep.balances.items()})
+            for t in range(len(rep.balances['power']))])
+    print('\nMean shadow price ' + ', '.join(f'{name} {prices.mean():.4g}' for name, prices in rep.balances.items()))
+
+    if args.co2_points > 0:
+        model.solve('co2')
+        co2_min = float(model.hub.co2.value)
+        bounds = np.linspace(co2_min, co2_at_cost_min, args.co2_points + 2)[1:-1]
+        rows = co2_prices(model, bounds)
+        _write(os.path.join(args.results, 'sensitivity_co2.csv'), ['co2_max', 'cost', 'price', 'lower', 'upper'], rows)
+        print(f'\n{"co2_max":>14} {"cost":>14} {"co2 price":>10} {"valid from":>14} {"to":>14}')
+        for row in rows:
+            print(f'{row["co2_max"]:14.1f} {row["cost"]:14.1f} {row["price"]:10.4f} {row["lower"]:14.1f} {row["upper"]:14.1f}')
+
+
+if __name__ == '__main__':
+    main()
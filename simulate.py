@@ -0,0 +1,279 @@
+""" Rule-based dispatch of given designs, simulated with NumPy for many designs at once.
+
+ Every time step is dispatched in merit order instead of by the LP (in brackets the default technologies):
+
+    heat:        electric heat producers (heat pump), heat storages (thermal storage tank), cogeneration (CHP),
+                 single output fuel fired (gas boiler), each in the order of the technology table; the rest is
+                 unmet heat
+    storage:     spare capacity of the electric heat producers charges the heat storages
+    electricity: renewables (PV, wind) and cogeneration first; surplus charges the electricity storages (battery)
+                 and the rest is exported, a deficit is covered by the storages and the rest is imported
+
+ with the technologies, efficiencies, rate limits and self-discharge of the built model hub (see
+ EnergyHub.build_model; conversion from electricity or gas to heat, renewables of electricity, storages of
+ electricity and heat). Cost, co2 and jobs follow the formulas of the model, so a simulated design is comparable
+ to (and never cheaper than) its LP dispatch. The designs are the columns of every array, so the storage recursion
+ runs once over the horizon for all designs: a full year takes about a millisecond per design with a thousand
+ designs or more at once. Representative days are not covered: their storages are linked across the year.
+
+ Usage (in EnergyHub.py or an interactive session):
+
+    model = EnergyHubModel().build()
+    res = simulate.simulate(model.hub, {'Cap_pv': np.linspace(0, 3.6e5, 1000), 'Cap_gshp': 910, 'Cap_bat': 4.4e4})
+    res['cost'], res['co2'], res['feasible']
+
+    # A feasible dispatch of one design, e.g. as a starting point or upper bound of the LP
+    res = simulate.simulate(model.hub, design, series=True)
+    names = dispatch.series_of(model.hub) + dispatch.states_of(model.hub)
+    dispatch.assign(model.hub, {name: res[name][:, 0] for name in names}, design)
+
+    python simulate.py --design Cap_gshp=910 Cap_ts=2600 --grid Cap_pv 0 360000 25 --grid Cap_bat 0 70000 25
+"""
+
+import argparse
+import csv
+import itertools
+import time
+
+import numpy as np
+
+from components import CAPACITIES, CLASSES
+
+RESULTS = ['cost', 'co2', 'jobs', 'Inv', 'Imp_elec', 'Imp_gas', 'Exp_elec', 'Unmet_heat', 'feasible']
+GRID = ['Imp_elec', 'Imp_gas', 'Exp_elec']  # Grid flows of the rule-based dispatch
+
+
+def _v(x):
+    # Value of a parameter of the model (or a plain number)
+    return x.value if hasattr(x, 'value') else x
+
+
+def capacities_of(hub):
+    """Capacities of all technologies of the table of hub, including those left out of its problem."""
+    return ['Cap_' + tech['name'] for cls in CLASSES for tech in hub.technologies[cls]]
+
+
+def designs_of(designs, capacities=CAPACITIES):
+    """Capacities by name as arrays of the same length (missing capacities are zero)."""
+    designs = {name: np.atleast_1d(np.asarray(value, dtype=float)).ravel() for name, value in designs.items()}
+    unknown = set(designs) - set(capacities)
+    if unknown:
+        raise ValueError(f'Unknown capacities {sorted(unknown)}, expected some of {capacities}')
+    n = max([len(value) for value in designs.values()] + [1])
+    return {name: np.broadcast_to(designs.get(name, 0.0), n).astype(float) for name in capacities}
+
+
+def _merit_order(hub):
+    # Conversion technologies in the order they cover the heat demand (electric heat producers first, then the heat
+    # storages, cogeneration, single output fuel fired), storages by carrier and the renewables
+    techs = hub.technologies
+    for tech in techs['conversion']:
+        if 'heat' not in tech['outputs'] or tech['input'] not in ('elec', 'gas') or \
+                set(tech['outputs']) - {'heat', 'elec'}:
+            raise ValueError(f'The rule-based dispatch covers conversion technologies from electricity or gas to heat '
+                             f'(and electricity), not {tech["name"]!r}')
+    for tech in techs['renewable']:
+        if tech['carrier'] != 'elec':
+            raise ValueError(f'The rule-based dispatch covers renewables of electricity, not {tech["name"]!r}')
+    for tech in techs['storage']:
+        if tech['carrier'] not in ('elec', 'heat'):
+            raise ValueError(f'The rule-based dispatch covers storages of electricity and heat, not {tech["name"]!r}')
+    electric = [tech for tech in techs['conversion'] if tech['input'] == 'elec']
+    cogeneration = [tech for tech in techs['conversion'] if tech['input'] != 'elec' and len(tech['outputs']) > 1]
+    fuel = [tech for tech in techs['conversion'] if tech['input'] != 'elec' and len(tech['outputs']) == 1]
+    storages = {carrier: [tech for tech in techs['storage'] if tech['carrier'] == carrier] for carrier in ('heat', 'elec')}
+    return electric, cogeneration + fuel, storages, techs['renewable']
+
+
+def simulate(hub, designs, series=False, tol=1e-6):
+    """Rule-based dispatch of designs (capacities by name, scalars or arrays of the same length) on the inputs of hub.
+
+    Returns the yearly imports, export and unmet heat [kWh], cost, co2, jobs and Inv of every design (arrays, one
+    value per design) and feasible: whether the LP of hub admits the design and its dispatch (capacities within
+    their bounds, heat demand met up to tol, no grid flow the table does not have). With series the flows
+    (dispatch.series_of, shape Horizon x designs) and storage states (dispatch.states_of, Horizon + 1 x designs) are
+    returned as well. Representative days are not covered (their storages are linked across the year, see
+    aggregation.linked_storage, and a dispatch of the days in sequence is not a dispatch of the model).
+    """
+    if hub.rep_days is not None:
+        raise ValueError('The rule-based dispatch needs the full horizon, not representative days')
+    capacities = capacities_of(hub)
+    d = designs_of(designs, capacities)
+    n = len(d[capacities[0]]) if capacities else 1
+    dt = hub.dt
+    elec_load = np.asarray(hub.elec_load.value, dtype=float)
+    heat_load = np.asarray(hub.heat_load.value, dtype=float)
+    horizon = len(elec_load)
+    weight = 1 / hub.data_years
+    electric, fired, storages, renewables = _merit_order(hub)
+
+    # Efficiencies of the conversion technologies by output carrier
+    effs = {(tech['name'], carrier): _v(getattr(hub, 'eff_' + tech['name'] if len(tech['outputs']) == 1 else
+                                                 f'eff_{carrier}_{tech["name"]}'))
+            for tech in electric + fired for carrier in tech['outputs']}
+
+    def eff(tech, carrier):
+        return effs[tech['name'], carrier]
+
+    # Per step limits of every design
+
+    P_in_max = {}  # Input energy [kWh]
+    for tech in electric + fired:
+        eff_cap = eff(tech, tech['capacity'])
+        P_in_max[tech['name']] = dt * d['Cap_' + tech['name']] / eff_cap if eff_cap > 0 else np.zeros(n)
+    ch_max = {tech['name']: tech['max_ch'] * dt * d['Cap_' + tech['name']] for tech in hub.technologies['storage']}
+    dis_max = {tech['name']: tech['max_dis'] * dt * d['Cap_' + tech['name']] for tech in hub.technologies['storage']}
+    keep = {tech['name']: (1 - tech['self_dis']) ** dt for tech in hub.technologies['storage']}
+    yields = {}  # Output per unit of capacity [kWh/kW, kWh/m2]
+    for tech in renewables:
+        if 'power_curve' in tech:
+            yields[tech['name']] = np.asarray(getattr(hub, 'cf_' + tech['name']), dtype=float) * dt
+        else:
+            resource = np.asarray(getattr(hub, tech['resource'])[:horizon], dtype=float)
+            yields[tech['name']] = resource * _v(getattr(hub, 'eff_' + tech['name'], 1.0))
+
+    E = {tech['name']: np.zeros(n) for tech in hub.technologies['storage']}
+    totals = {name: np.zeros(n) for name in GRID + ['Unmet_heat']}
+    unmet_max = np.zeros(n)
+    if series:
+        from dispatch import series_of, states_of
+        flows = {name: np.zeros((horizon, n)) for name in series_of(hub)}
+        states = {name: np.zeros((horizon + 1, n)) for name in states_of(hub)}
+
+    for t in range(horizon):
+        # Heat: electric heat producers, heat storages, cogeneration and fuel fired in merit order
+        rest = np.full(n, heat_load[t])
+        P_in, Q_in, Q_out = {}, {}, {}
+        for tech in electric:
+            P_in[tech['name']] = np.minimum(rest / eff(tech, 'heat'), P_in_max[tech['name']])
+            rest -= P_in[tech['name']] * eff(tech, 'heat')
+        for tech in storages['heat']:
+            name = tech['name']
+            Q_out[name] = np.minimum(np.minimum(rest, dis_max[name]), tech['dis_eff'] * keep[name] * E[name])
+            rest -= Q_out[name]
+        for tech in fired:
+            P_in[tech['name']] = np.minimum(rest / eff(tech, 'heat'), P_in_max[tech['name']])
+            rest -= P_in[tech['name']] * eff(tech, 'heat')
+        unmet = np.maximum(rest, 0.0)
+
+        # Spare capacity of the electric heat producers charges the heat storages
+        spare = sum((P_in_max[tech['name']] - P_in[tech['name']]) * eff(tech, 'heat') for tech in electric)
+        for tech in storages['heat']:
+            name = tech['name']
+            Q_in[name] = np.maximum(np.minimum(np.minimum(spare, ch_max[name]),
+                                               (d['Cap_' + name] - keep[name] * E[name]) / tech['ch_eff']), 0.0)
+            spare = spare - Q_in[name]
+        charge = sum(Q_in[tech['name']] for tech in storages['heat'])
+        for tech in electric:
+            heat = np.minimum(charge, (P_in_max[tech['name']] - P_in[tech['name']]) * eff(tech, 'heat'))
+            P_in[tech['name']] = P_in[tech['name']] + heat / eff(tech, 'heat')
+            charge = charge - heat
+
+        # Electricity: renewables and cogeneration first; a surplus charges the electricity storages and the rest
+        # is exported, a deficit is covered by the storages and the rest is imported
+        net = sum(yields[tech['name']][t] * d['Cap_' + tech['name']] for tech in renewables) - elec_load[t]
+        for tech in electric + fired:
+            if 'elec' in tech['outputs']:
+                net = net + P_in[tech['name']] * eff(tech, 'elec')
+            if tech['input'] == 'elec':
+                net = net - P_in[tech['name']]
+        surplus, deficit = np.maximum(net, 0.0), np.maximum(-net, 0.0)
+        for tech in storages['elec']:
+            name = tech['name']
+            Q_in[name] = np.maximum(np.minimum(np.minimum(surplus, ch_max[name]),
+                                               (d['Cap_' + name] - keep[name] * E[name]) / tech['ch_eff']), 0.0)
+            Q_out[name] = np.minimum(np.minimum(deficit, dis_max[name]), tech['dis_eff'] * keep[name] * E[name])
+            surplus, deficit = surplus - Q_in[name], deficit - Q_out[name]
+        for tech in hub.technologies['storage']:
+            name = tech['name']
+            E[name] = np.clip(keep[name] * E[name] + tech['ch_eff'] * Q_in[name] - Q_out[name] / tech['dis_eff'],
+                              0.0, d['Cap_' + name])
+        grid = dict(Imp_elec=deficit, Exp_elec=surplus,
+                    Imp_gas=sum([P_in[tech['name']] for tech in fired if tech['input'] == 'gas'], np.zeros(n)))
+
+        for name in GRID:
+            totals[name] += weight * grid[name]
+        totals['Unmet_heat'] += weight * unmet
+        np.maximum(unmet_max, unmet / max(heat_load[t], 1.0), out=unmet_max)
+        if series:
+            step = dict(grid)
+            for tech in electric + fired:
+                step['P_in_' + tech['name']] = P_in[tech['name']]
+                for carrier in tech['outputs']:
+                    out = 'P_out_' + tech['name'] if len(tech['outputs']) == 1 else f'P_out_{carrier}_{tech["name"]}'
+                    step[out] = P_in[tech['name']] * eff(tech, carrier)
+            for tech in renewables:
+                step['P_out_' + tech['name']] = yields[tech['name']][t] * d['Cap_' + tech['name']]
+            for tech in hub.technologies['storage']:
+                step['Q_in_' + tech['name']], step['Q_out_' + tech['name']] = Q_in[tech['name']], Q_out[tech['name']]
+                states['E_' + tech['name']][t + 1] = E[tech['name']]
+            for name in flows:
+                flows[name][t] = step[name]
+
+    # Objectives (as in build_model)
+    Inv = sum((d[name] * _v(getattr(hub, 'cost_' + name[4:])) for name in capacities), np.zeros(n))
+    cost = Inv + sum(sign * _v(getattr(hub, 'op_price_' + stream)) * totals[flow]
+                     for stream, (flow, _, sign) in hub.streams.items() if flow in totals)
+    if hub.heat_penalty is not None:
+        cost = cost + hub.heat_penalty * totals['Unmet_heat']
+    co2 = 25 * sum((totals['Imp_' + entry['carrier']] * _v(getattr(hub, 'co2_' + entry['carrier']))
+                    for entry in hub.technologies['grid']['imports'] if 'Imp_' + entry['carrier'] in totals), np.zeros(n))
+    jobs = sum((d[name] * getattr(hub, 'jobs_created_' + name[4:]) for name in capacities), np.zeros(n))
+    within = np.ones(n, dtype=bool)
+    for cls in CLASSES:
+        for tech in hub.technologies[cls]:
+            cap = d['Cap_' + tech['name']]
+            bound = tech.get('max_cap')
+            upper = _v(getattr(hub, bound if isinstance(bound, str) else 'max_cap_' + tech['name'], None))
+            within &= (cap >= 0) & ((cap <= upper) if upper is not None else True)
+    # Grid flows the table does not have must be zero (e.g. exports without a feed-in stream)
+    streams = {flow for flow, _, _ in hub.streams.values()}
+    demand = weight * (elec_load.sum() + heat_load.sum())
+    without = np.ones(n, dtype=bool)
+    for name in GRID:
+        if name not in streams:
+            without &= totals[name] <= tol * demand
+    feasible = within & without & ((unmet_max <= tol) | (hub.heat_penalty is not None))
+
+    result = dict(totals, cost=cost, co2=co2, jobs=jobs, Inv=Inv, feasible=feasible, **d)
+    if series:
+        result.update(flows, **states)
+    return result
+
+
+def main(argv=None):
+    from EnergyHub import EnergyHubModel
+
+    parser = argparse.ArgumentParser(description='Rule-based dispatch of a grid of energy hub designs.')
+    parser.add_argument('--design', nargs='*', default=[], metavar='NAME=VALUE',
+                        help='capacities fixed for every design, e.g. Cap_gshp=910 (default: zero)')
+    parser.add_argument('--grid', nargs=4, action='append', default=[], metavar=('NAME', 'START', 'STOP', 'NUM'),
+                        help='capacity varied over NUM values from START to STOP (repeat for a grid)')
+    parser.add_argument('--technologies', default=None,
+                        help='JSON file of the technologies (default: technologies.json, see components.py)')
+    parser.add_argument('--output', default='simulate_designs.csv', help='CSV file of the designs and their results')
+    args = parser.parse_args(argv)
+
+    fixed = {name: float(value) for name, value in (item.split('=') for item in args.design)}
+    axes = {name: np.linspace(float(start), float(stop), int(num)) for name, start, stop, num in args.grid}
+    grid = list(itertools.product(*axes.values()))
+    designs = dict(fixed, **{name: [point[i] for point in grid] for i, name in enumerate(axes)})
+
+    model = EnergyHubModel(cache=None, technologies=args.technologies).build()
+    start = time.perf_counter()
+    result = simulate(model.hub, designs)
+    seconds = time.perf_counter() - start
+    n = len(result['cost'])
+    print(f'{n} designs simulated in {seconds:.2f} s ({1000 * seconds / n:.2f} ms per design), '
+          f'{int(result["feasible"].sum())} feasible')
+
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        columns = capacities_of(model.hub) + RESULTS
+        writer.writerow(columns)
+        for i in range(n):
+            writer.writerow([result[name][i] for name in columns])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+""" Batch runs of the energy hub over several favela sites.
+
+ A manifest (JSON) lists the sites with their weather files, favela area [m2] and number of households (the
+ electricity demand profile is scaled to the households); file paths are relative to the manifest:
+
+    {"sites": [{"name": "manaus", "heat": "manaus_heat.csv", "solar": "maruas_solar.csv", "wind": "wind.xlsx",
+                "size_favela": 1.2e6, "households": 55361}, ...]}
+
+ A site without size_favela or households gets those of Manaus (data_import.SIZE_FAVELA, data_import.HOUSEHOLDS),
+ a site without wind file no wind power. The full hourly model is built and compiled once in this process and
+ inherited by the forked workers. Demands, favela area and the yields of the weather files are parameter values
+ (EnergyHub.set_inputs), so every site reuses the compiled problems. With representative days the days differ per
+ site, so every site builds its own (small) model. Each site is written to the results store as
+ <site>_min_<objective> and appended to sites.csv in the results directory as soon as it is solved, so an
+ interrupted batch keeps all finished sites. A site that fails (missing file, infeasible problem) is reported and
+ the batch goes on.
+
+ Usage:
+
+    python sites.py sites.json [--processes 4] [--objectives cost co2] [--aggregation-days 12]
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+import sweep
+
+SUMMARY = ['site', 'objective', 'status', 'cost', 'co2', 'jobs', 'Inv', 'Cap_gb', 'Cap_gshp', 'Cap_chp', 'Cap_pv',
+           'Cap_wind', 'Cap_ts', 'Cap_bat', 'seconds']
+
+
+def read_manifest(path):
+    """Sites of the manifest at path, with the file paths made relative to the working directory."""
+    import data_import
+
+    with open(path) as f:
+        sites = json.load(f)['sites']
+    root = os.path.dirname(path)
+    names = set()
+    for site in sites:
+        if site['name'] in names:
+            raise ValueError(f'Site {site["name"]!r} appears twice in {path}')
+        names.add(site['name'])
+        for key in ['heat', 'solar', 'wind']:
+            if site.get(key) is not None:
+                site[key] = os.path.join(root, site[key])
+        site.setdefault('households', data_import.HOUSEHOLDS)
+        site.setdefault('size_favela', data_import.SIZE_FAVELA)
+    return sites
+
+
+def _cache_name(kind, path):
+    # Name of a dataset in the input cache, one per source file
+    return kind + '_' + os.path.splitext(path)[0].replace(os.sep, '_').strip('._')
+
+
+def load_site(site):
+    """Hourly inputs (elec_demand, heat_demand, solar, wind_speed) of a site of the manifest."""
+    import data_import
+    import input_cache
+
+    files = data_import.demand_files()
+    elec = input_cache.load('elec_profile', files, lambda: data_import.stream_demand(files))
+    elec = elec * data_import.annual_elec_demand(site['households']) / elec.sum()
+    heat = input_cache.load(_cache_name('heat', site['heat']), [site['heat']], lambda: data_import.get_heat(site['heat']))
+    solar = input_cache.load(_cache_name('solar', site['solar']), [site['solar']], lambda: data_import.get_solar(site['solar']))
+    if site.get('wind') is None:
+        wind_speed = np.zeros(len(elec))  # No wind data: no wind power
+    else:
+        wind_speed = input_cache.load(_cache_name('wind', site['wind']), [site['wind']], lambda: data_import.get_wind(site['wind']))
+    return elec, heat, solar, wind_speed
+
+
+# Site runs
+# ==========
+# Run in the workers of sweep.iter_sweep, which inherit the compiled model, the store and the objectives
+_model = None
+_store = None
+_objectives = ('cost',)
+
+
+def solve_site(site):
+    # Solve all objectives for one site, store the results and return the summary rows
+    from EnergyHub import EnergyHubModel, set_inputs
+
+    rows = []
+    start = time.perf_counter()
+    try:
+        inputs = load_site(site)
+        if _model.aggregation_days is None:
+            model = _model
+            model.hub = set_inputs(model.hub, *inputs, size_favela=site['size_favela'])
+        else:
+            model = EnergyHubModel(inputs, _model.aggregation_days, cache=_model.cache, solver=_model.solver).build()
+            set_inputs(model.hub, model.hub.elec_demand, model.hub.heat_demand, size_favela=site['size_favela'])
+        for objective in _objectives:
+            model.solve(objective)
+            results = model.results()
+            _store.put(f'{site["name"]}_min_{objective}', results)
+            rows.append(dict({k: results[k] for k in SUMMARY if k in results}, site=site['name'], objective=objective,
+                             status='optimal', seconds=round(time.perf_counter() - start, 2)))
+    except Exception as e:
+        rows.append(dict(site=site['name'], objective=None, status=f'{type(e).__name__}: {e}',
+                         seconds=round(time.perf_counter() - start, 2)))
+    return rows
+
+
+def run_sites(sites, processes=None, results_dir='results', objectives=('cost',), aggregation_days=None, cache=True):
+    """Solve objectives ('cost' and/or 'co2') for every site (see read_manifest) over a pool of processes.
+
+    Yields the summary rows of every site as it completes; they are also appended to results_dir/sites.csv and
+    the full results are in a results_store.ResultsStore in results_dir.
+    """
+    import results_store
+    from EnergyHub import EnergyHubModel
+
+    global _model, _store, _objectives
+    sites = list(sites)
+    if not sites:
+        return
+    _objectives = tuple(objectives)
+    _store = results_store.ResultsStore(results_dir)
+    _model = EnergyHubModel(load_site(sites[0]), aggregation_days, cache=cache)
+    if aggregation_days is None:
+        # Build and compile the problems once, in this process, so the workers only update parameter values
+        _model.build()
+        for objective in _objectives:
+            getattr(_model.hub, 'prob_min_' + objective).get_problem_data(_model.solver)
+
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, 'sites.csv')
+    new = not os.path.exists(path)
+    with open(path, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY)
+        if new:
+            writer.writeheader()
+        for _, rows in sweep.iter_sweep(solve_site, sites, processes):
+            writer.writerows(rows)
+            f.flush()
+            yield from rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Energy hub optimization of every favela site of a manifest.')
+    parser.add_argument('manifest', help='JSON file with the sites (see sites.py)')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='worker processes (default: one per CPU core, 1: no parallelism)')
+    parser.add_argument('--objectives', nargs='+', choices=['cost', 'co2'], default=['cost'],
+                        help='objectives minimized for every site (default: cost)')
+    parser.add_argument('--aggregation-days', type=int, default=None,
+                        help='number of representative days optimized instead of the full year (screening runs)')
+    parser.add_argument('--no-cache', action='store_true', help='always solve instead of reading cached solutions')
+    parser.add_argument('--results', default='results', help='directory of the results store (default: results)')
+    args = parser.parse_args(argv)
+
+    sites = read_manifest(args.manifest)
+    for row in run_sites(sites, args.processes, args.results, args.objectives, args.aggregation_days,
+                         cache=None if args.no_cache else True):
+        if row['status'] == 'optimal':
+            print(f'{row["site"]:<20} min {row["objective"]:<5} cost {row["cost"]:14.1f}  co2 {row["co2"]:12.1f}  '
+                  f'PV {row["Cap_pv"]:10.1f} m2  ({row["seconds"]} s)')
+        else:
+            print(f'{row["site"]:<20} failed: {row["status"]}')
+
+
+if __name__ == '__main__':
+    main()
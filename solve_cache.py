@@ -0,0 +1,133 @@
+""" Content-addressed cache for solved energy hub problems.
+
+ The key of a solve is a hash of the canonical problem data that cvxpy passes to the solver (objective vector,
+ constraint matrices and right hand sides) together with the names and shapes of the variables. Demands, solar
+ profiles, prices and bounds all end up in that data, so any change of an input gives a new key and stale
+ results are never returned.
+
+ Solutions (the primal values of all named variables) are kept in an in-memory LRU and in an on-disk store
+ with one .npz file per key. Only optimal solutions are stored. Restoring a solution sets the variable values, the
+ status (optimal) and the value of the problem, so cost.value, co2.value, jobs.value, the dispatch time series and
+ prob.status can be used exactly as after a real solve. Dual values are not stored.
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+import scipy.sparse as sp
+from cvxpy.reductions.solution import Solution
+
+
+def problem_key(prob, solver='SCIPY'):
+    """Hash of the canonical problem data of prob with the current parameter values."""
+    data, _, _ = prob.get_problem_data(solver)
+    h = hashlib.sha256(solver.encode())
+    for v in prob.variables():
+        h.update(f'{v.name()}{v.shape}'.encode())
+    for name in sorted(data):
+        value = data[name]
+        if sp.issparse(value):
+            value = sp.csc_array(value)
+            value.sort_indices()
+            arrays = [value.indptr, value.indices, value.data, np.array(value.shape)]
+        elif isinstance(value, np.ndarray):
+            arrays = [value]
+        elif name == 'dims':
+            arrays = [np.frombuffer(str(value).encode(), dtype=np.uint8)]
+        else:
+            continue
+        h.update(name.encode())
+        for a in arrays:
+            h.update(np.ascontiguousarray(a).tobytes())
+    return h.hexdigest()
+
+
+class SolveCache:
+    """In-memory LRU plus on-disk store of solved problems, keyed by problem_key()."""
+
+    def __init__(self, cache_dir='.solve_cache', max_memory=32, max_disk=256):
+        self.cache_dir = cache_dir
+        self.max_memory = max_memory  # Number of solutions kept in memory
+        self.max_disk = max_disk  # Number of solutions kept on disk (None for no limit, 0 to disable the disk store)
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def get(self, key):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        if self.max_disk != 0 and os.path.exists(self._path(key)):
+            try:
+                with np.load(self._path(key)) as f:
+                    values = {name: f[name] for name in f.files}
+                os.utime(self._path(key))  # Mark as recently used for the disk eviction
+            except FileNotFoundError:  # Evicted by another process in the meantime
+                return None
+            self._remember(key, values)
+            return values
+        return None
+
+    def put(self, key, values):
+        self._remember(key, values)
+        if self.max_disk != 0:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f'{self._path(key)}.{os.getpid()}.tmp.npz'  # Per process: workers may write the same key
+            np.savez(tmp, **values)
+            os.replace(tmp, self._path(key))
+            self._evict_disk()
+
+    def _remember(self, key, values):
+        self.memory[key] = values
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory:
+            self.memory.popitem(last=False)
+
+    def _evict_disk(self):
+        if self.max_disk is None:
+            return
+        # Solutions only, not the files other processes are still writing
+        files = {}
+        for f in os.listdir(self.cache_dir):
+            if f.endswith('.npz') and not f.endswith('.tmp.npz'):
+                try:
+                    files[os.path.join(self.cache_dir, f)] = os.path.getmtime(os.path.join(self.cache_dir, f))
+                except FileNotFoundError:  # Removed by another process
+                    pass
+        for path in sorted(files, key=files.get)[:max(len(files) - self.max_disk, 0)]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:  # Evicted by another process at the same time
+                pass
+
+    def clear(self):
+        """Invalidate all stored solutions, in memory and on disk."""
+        self.memory.clear()
+        if os.path.isdir(self.cache_dir):
+            for f in os.listdir(self.cache_dir):
+                if f.endswith('.npz'):
+                    os.remove(os.path.join(self.cache_dir, f))
+
+    def solve(self, prob, solver='SCIPY', **kwargs):
+        """Solve prob, or restore its variable values if the same problem was solved before.
+
+        Returns the optimal objective value; on a hit prob.status is optimal as after the solve that was stored.
+        The variables of prob must have unique names.
+        """
+        key = problem_key(prob, solver)
+        variables = {v.name(): v for v in prob.variables()}
+        values = self.get(key)
+        if values is not None and set(values) == set(variables):
+            self.hits += 1
+            prob.unpack(Solution('optimal', None, {v.id: values[name] for name, v in variables.items()}, {}, {}))
+            return prob.value
+        self.misses += 1
+        prob.solve(solver=solver, **kwargs)
+        if prob.status == 'optimal':
+            self.put(key, {name: np.asarray(v.value) for name, v in variables.items()})
+        return prob.value
@@ -0,0 +1,208 @@
+""" Direct sparse-matrix assembly of the energy hub LP, solved with HiGHS through scipy.optimize.linprog.
+
+ For the technology blocks of the hub the LP (c, A_ub, b_ub, A_eq, b_eq, bounds) is assembled with vectorized
+ index arithmetic instead of building and canonicalizing a cvxpy expression tree. The technologies, parameters
+ and constraints are those of EnergyHub.build_model (any technology table, full horizon of one or several years
+ at any time step, storages empty at their empty_step); the input series and parameter values are read from a
+ model built by it, so changed parameter values are picked up by assembling again.
+
+ Usage (in EnergyHub.py):
+
+    lp = sparse_backend.build_lp(hub)
+    res = sparse_backend.solve(lp, objective='cost', co2_max=...)
+    res['cost'], res['co2'], res['Cap_pv'], res['P_out_pv'], ...
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import linprog
+
+
+def _v(x):
+    # Value of a cvxpy parameter or plain number
+    return float(x.value) if hasattr(x, 'value') else float(x)
+
+
+class _Rows:
+    # Collects the coordinates of a sparse constraint matrix, one block of rows at a time
+
+    def __init__(self):
+        self.rows, self.cols, self.vals, self.rhs = [], [], [], []
+        self.n = 0
+
+    def add(self, terms, rhs):
+        """Add len(rhs) rows; terms is a list of (column indices, coefficients) with one entry per row."""
+        rhs = np.atleast_1d(np.asarray(rhs, dtype=float))
+        r = self.n + np.arange(len(rhs))
+        for cols, vals in terms:
+            cols = np.broadcast_to(cols, r.shape)
+            self.rows.append(r)
+            self.cols.append(cols)
+            self.vals.append(np.broadcast_to(np.asarray(vals, dtype=float), r.shape))
+        self.rhs.append(rhs)
+        self.n += len(rhs)
+
+    def matrix(self, n_cols):
+        if self.n == 0:
+            return None, None
+        A = sp.csr_array((np.concatenate(self.vals), (np.concatenate(self.rows), np.concatenate(self.cols))),
+                         shape=(self.n, n_cols))
+        return A, np.concatenate(self.rhs)
+
+
+def _eff(hub, tech, carrier):
+    # Efficiency of the output carrier of a conversion technology (see components.conversion_block)
+    name = 'eff_' + tech['name'] if len(tech['outputs']) == 1 else f'eff_{carrier}_{tech["name"]}'
+    return _v(getattr(hub, name))
+
+
+def _yields(hub):
+    # Output of every renewable technology per unit of capacity (time steps x technologies of the block)
+    block = hub.renewable
+    if not block.techs:
+        return np.zeros((hub.Horizon, 0))
+    eff = np.array([_v(getattr(hub, 'eff_' + tech['name'], 1.0)) for tech in block.techs])
+    return np.asarray(block.Y.value, dtype=float) * eff
+
+
+def build_lp(hub):
+    """Assemble the LP of the energy hub model hub (its technologies, input series and current parameter values)."""
+    from components import CARRIERS
+    from EnergyHub import update_op_prices
+
+    if hub.rep_days is not None or hub.storage_start is not None or hub.heat_penalty is not None:
+        raise ValueError('The sparse backend only covers the full horizon model (no representative days, storage '
+                         'start or heat penalty)')
+    n = hub.Horizon
+    dt = hub.dt
+    grid, conversion, renewable, storage = hub.grid, hub.conversion, hub.renewable, hub.storage
+
+    # Variable layout
+    # ================
+    # Capacities of the technologies in the problem (the table's technologies with an upper bound other than zero),
+    # then the series of the grid, conversion and storage blocks by the names of the model
+    sizes = dict.fromkeys(hub.capacities, 1)
+    for key, var in [('imports', 'Imp'), ('exports', 'Exp')]:
+        sizes.update({f'{var}_{entry["carrier"]}': n for entry in hub.technologies['grid'][key]})
+    sizes.update({'P_in_' + tech['name']: n for tech in conversion.techs})
+    for tech in storage.techs:
+        sizes.update({'Q_in_' + tech['name']: n, 'Q_out_' + tech['name']: n, 'E_' + tech['name']: n + 1})
+    index, start = {}, 0
+    for name, size in sizes.items():
+        index[name] = np.arange(start, start + size)
+        start += size
+    n_var = start
+    i = index
+    cap = {name: i[name][0] for name in hub.capacities}
+
+    # All variables are non-negative; capacity limits and empty storages as bounds
+    lower = np.zeros(n_var)
+    upper = np.full(n_var, np.inf)
+    for name, bound in hub.upper_bounds.items():
+        upper[cap[name]] = _v(getattr(hub, bound))
+    for tech in storage.techs:
+        upper[i['E_' + tech['name']][tech.get('empty_step', 0)]] = 0
+
+    # Inequality constraints (A_ub x <= b_ub)
+    # ========================================
+    ub = _Rows()
+    for tech in conversion.techs:
+        name = tech['name']
+        ub.add([(i['P_in_' + name], _eff(hub, tech, tech['capacity'])), (cap['Cap_' + name], -dt)], np.zeros(n))
+    for tech in storage.techs:
+        name = tech['name']
+        ub.add([(i['E_' + name], 1), (cap['Cap_' + name], -1)], np.zeros(n + 1))
+        ub.add([(i['Q_in_' + name], 1), (cap['Cap_' + name], -tech['max_ch'] * dt)], np.zeros(n))
+        ub.add([(i['Q_out_' + name], 1), (cap['Cap_' + name], -tech['max_dis'] * dt)], np.zeros(n))
+
+    # Equality constraints (A_eq x = b_eq)
+    # =====================================
+    eq = _Rows()
+    for tech in storage.techs:
+        name = tech['name']
+        E = i['E_' + name]
+        eq.add([(E[1:], 1), (E[:-1], -(1 - tech['self_dis']) ** dt), (i['Q_in_' + name], -tech['ch_eff']),
+                (i['Q_out_' + name], 1 / tech['dis_eff'])], np.zeros(n))
+
+    # Balance of every carrier: supply of all technologies and the grid == demand
+    terms = {carrier: [] for carrier in CARRIERS}
+    for key, var, sign in [('imports', 'Imp', 1), ('exports', 'Exp', -1)]:
+        for entry in hub.technologies['grid'][key]:
+            terms[entry['carrier']].append((i[f'{var}_{entry["carrier"]}'], sign))
+    for tech in conversion.techs:
+        P_in = i['P_in_' + tech['name']]
+        terms[tech['input']].append((P_in, -1))
+        for carrier in tech['outputs']:
+            terms[carrier].append((P_in, _eff(hub, tech, carrier)))
+    yields = _yields(hub)
+    for j, tech in enumerate(renewable.techs):
+        terms[tech['carrier']].append((cap['Cap_' + tech['name']], yields[:, j]))
+    for tech in storage.techs:
+        terms[tech['carrier']] += [(i['Q_out_' + tech['name']], 1), (i['Q_in_' + tech['name']], -1)]
+    demand = {'elec': hub.elec_load.value, 'heat': hub.heat_load.value}
+    for carrier in CARRIERS:
+        eq.add(terms[carrier], demand.get(carrier, np.zeros(n)))
+
+    # Objectives
+    # ===========
+    inv = np.zeros(n_var)
+    jobs = np.zeros(n_var)
+    for name, col in cap.items():
+        tech = name[len('Cap_'):]
+        inv[col] = _v(getattr(hub, 'cost_' + tech))
+        jobs[col] = getattr(hub, 'jobs_created_' + tech, 0.0)
+    update_op_prices(hub)
+    years = hub.data_years  # Operation is averaged over the years of the input series
+    cost = inv.copy()
+    for stream, (flow, _, sign) in hub.streams.items():
+        cost[i[flow]] += sign * _v(getattr(hub, 'op_price_' + stream)) / years
+    co2 = np.zeros(n_var)
+    for entry in hub.technologies['grid']['imports']:
+        co2[i['Imp_' + entry['carrier']]] = 25 * _v(getattr(hub, 'co2_' + entry['carrier'])) / years
+
+    A_ub, b_ub = ub.matrix(n_var)
+    A_eq, b_eq = eq.matrix(n_var)
+    return SimpleNamespace(A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, bounds=np.column_stack([lower, upper]),
+                           index=index, cost=cost, co2=co2, jobs=jobs, inv=inv, hub=hub)
+
+
+def solve(lp, objective='cost', co2_max=None, inv_max=None):
+    """Solve the LP for objective ('cost' or 'co2'), optionally with bounds on co2 and the investment costs.
+
+    Returns the results by the names of the cvxpy model: capacities, dispatch series, cost, co2, jobs and Inv.
+    """
+    A_ub, b_ub = lp.A_ub, lp.b_ub
+    extra = [(getattr(lp, name), bound) for name, bound in (('co2', co2_max), ('inv', inv_max)) if bound is not None]
+    if extra:
+        A_ub = sp.vstack([A_ub] + [sp.csr_array(row[None, :]) for row, _ in extra], format='csr')
+        b_ub = np.concatenate([b_ub, [bound for _, bound in extra]])
+    res = linprog(getattr(lp, objective), A_ub=A_ub, b_ub=b_ub, A_eq=lp.A_eq, b_eq=lp.b_eq, bounds=lp.bounds,
+                  method='highs')
+    if res.status != 0:
+        raise RuntimeError(f'Sparse backend: {res.message}')
+    x = res.x
+    hub = lp.hub
+    out = {name: x[idx] for name, idx in lp.index.items()}
+
+    # Outputs that are linear images of the variables, as in the cvxpy model, and the zero capacities and series of
+    # the technologies left out of the problem
+    for tech in hub.conversion.techs:
+        for carrier in tech['outputs']:
+            name = 'P_out_' + tech['name'] if len(tech['outputs']) == 1 else f'P_out_{carrier}_{tech["name"]}'
+            out[name] = out['P_in_' + tech['name']] * _eff(hub, tech, carrier)
+    yields = _yields(hub)
+    for j, tech in enumerate(hub.renewable.techs):
+        out['P_out_' + tech['name']] = yields[:, j] * out['Cap_' + tech['name']]
+    for block in [hub.conversion, hub.renewable, hub.storage]:
+        for tech in block.excluded:
+            out['Cap_' + tech['name']] = np.zeros(1)
+            for prefix in ['P_in_', 'P_out_', 'Q_in_', 'Q_out_', 'E_']:
+                if prefix + tech['name'] in block.attrs:
+                    out[prefix + tech['name']] = np.zeros(block.attrs[prefix + tech['name']].shape)
+    out['cost'] = np.array([lp.cost @ x])
+    out['co2'] = lp.co2 @ x
+    out['jobs'] = np.array([lp.jobs @ x])
+    out['Inv'] = np.array([lp.inv @ x])
+    return out
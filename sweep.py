@@ -0,0 +1,42 @@
+""" Parallel execution of independent optimization runs (epsilon points of a Pareto front, investment scenarios).
+
+ The workers are forked from the running script, so they inherit the built (and, if already solved once,
+ compiled) cvxpy problems and only have to update parameter values and solve. run_sweep returns the results in
+ the order of the points, iter_sweep yields them as they complete. Where forking is not available the points are
+ solved one after another.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def run_sweep(solve_point, points, processes=None):
+    """Apply solve_point to every point in a process pool and return the results in order.
+
+    processes is the number of worker processes (None: one per CPU core, 1: solve in the calling process).
+    solve_point must be a module level function.
+    """
+    points = list(points)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = min(processes, len(points))
+    if processes <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        return [solve_point(p) for p in points]
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('fork')) as executor:
+        return list(executor.map(solve_point, points))
+
+
+def iter_sweep(solve_point, points, processes=None):
+    """Like run_sweep, but yield (point, result) pairs as soon as each point is solved (in order of completion)."""
+    points = list(points)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = min(processes, len(points))
+    if processes <= 1 or 'fork' not in multiprocessing.get_all_start_methods():
+        for p in points:
+            yield p, solve_point(p)
+        return
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('fork')) as executor:
+        futures = {executor.submit(solve_point, p): p for p in points}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
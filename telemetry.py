@@ -0,0 +1,139 @@
+""" Per-phase timers and problem statistics of the energy hub runs, written as JSON lines.
+
+ The time of every phase (reading the inputs, building the model, cvxpy compilation, the solver, writing the
+ results, rendering the figures) is added to the record of the current scenario, together with the size of
+ every solved problem (variables, constraints, nonzeros) and the solver's status and iterations. emit()
+ appends the record as one JSON line to the telemetry file and starts the next one; forked workers append their
+ own records. With a profile directory the phases in PROFILED also run under cProfile, dumped to
+ <profile_dir>/<scenario>.prof with every record (read with python -m pstats or snakeviz).
+
+ Usage (EnergyHub.py --telemetry runs.jsonl [--profile profiles]):
+
+    telemetry.configure('runs.jsonl', profile_dir='profiles')
+    with telemetry.phase('build'):
+        ...
+    telemetry.problem('prob_min_cost', prob)
+    telemetry.emit('min_cost')
+
+ Without configure() all calls are no-ops.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+
+PROFILED = {'build', 'solve'}  # Phases run under cProfile with a profile directory
+
+_path = None
+_profile_dir = None
+_record = None
+_profiler = None
+_profiling = 0  # Depth of the profiled phases currently running
+_sizes = {}  # Size statistics by id of the problem and solver, computed once per process
+
+
+def _new_record():
+    return {'phases': {}, 'problems': []}
+
+
+def configure(path, profile_dir=None):
+    """Write records to path (JSON lines, appended) and profiles to profile_dir (None: no profiling)."""
+    global _path, _profile_dir, _record, _profiler
+    _path = path
+    _profile_dir = profile_dir
+    _record = _new_record()
+    _profiler = None
+    if profile_dir is not None:
+        os.makedirs(profile_dir, exist_ok=True)
+
+
+def enabled():
+    return _path is not None
+
+
+@contextmanager
+def phase(name):
+    """Add the wall time of the block to phase name of the current record."""
+    global _profiler, _profiling
+    if _path is None:
+        yield
+        return
+    profile = _profile_dir is not None and name in PROFILED and _profiling == 0
+    if profile:
+        import cProfile
+        if _profiler is None:
+            _profiler = cProfile.Profile()
+        _profiler.enable()
+    _profiling += profile
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - start)
+        _profiling -= profile
+        if profile:
+            _profiler.disable()
+
+
+def add(name, seconds):
+    """Add seconds to phase name of the current record."""
+    if _path is not None:
+        _record['phases'][name] = _record['phases'].get(name, 0.0) + seconds
+
+
+def _size(prob, solver):
+    # Scalar variables, constraints and nonzeros of the problem data passed to the solver. The nonzeros are read from
+    # the program cvxpy compiled for the last solve (its cache), so nothing is canonicalized again; they are None
+    # for a problem that was not compiled in this process (cache hits only)
+    import scipy.sparse as sp
+
+    key = (id(prob), solver)
+    if key not in _sizes or _sizes[key]['nonzeros'] is None:
+        metrics = prob.size_metrics
+        program = prob._cache.param_prog
+        nonzeros = None
+        if program is not None:
+            nonzeros = int(sum(sp.csr_array(x).nnz for x in program.apply_parameters() if sp.issparse(x)))
+        _sizes[key] = {'variables': metrics.num_scalar_variables,
+                       'constraints': metrics.num_scalar_eq_constr + metrics.num_scalar_leq_constr,
+                       'nonzeros': nonzeros}
+    return _sizes[key]
+
+
+def problem(name, prob, solver='SCIPY', cache_hit=False):
+    """Record the size of prob, solved as name, and the solver statistics of its last solve.
+
+    cvxpy's compilation time of the solve is moved from phase 'solve' to phase 'compile'.
+    """
+    if _path is None:
+        return
+    stats = dict(problem=name, cache_hit=cache_hit)
+    if cache_hit:
+        stats['status'] = 'optimal'
+    else:
+        stats['status'] = prob.status
+        stats['iterations'] = prob.solver_stats.num_iters if prob.solver_stats else None
+        compile_time = prob.compilation_time or 0.0
+        add('compile', compile_time)
+        add('solve', -compile_time)
+    stats.update(_size(prob, solver))
+    _record['problems'].append(stats)
+
+
+def emit(scenario, **fields):
+    """Append the current record as scenario (with fields) to the telemetry file and start the next record."""
+    global _record, _profiler
+    if _path is None:
+        return
+    import resource
+
+    record = dict(scenario=scenario, time=time.strftime('%Y-%m-%dT%H:%M:%S'), pid=os.getpid(),
+                  phases={k: round(v, 4) for k, v in _record['phases'].items()}, problems=_record['problems'],
+                  peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1), **fields)
+    with open(_path, 'a') as f:
+        f.write(json.dumps(record) + '\n')  # One write per line, so records of parallel workers do not interleave
+    if _profiler is not None:
+        _profiler.dump_stats(os.path.join(_profile_dir, f'{scenario}.prof'))
+        _profiler = None
+    _record = _new_record()
@@ -0,0 +1,55 @@
+""" Resampling and representative days: energy conservation, and the linked storage against the hourly model.
+
+    python -m pytest test_aggregation.py
+"""
+
+import numpy as np
+import pytest
+
+import aggregation
+import EnergyHub
+
+DAYS = 10  # Horizon of the test problems
+
+
+@pytest.fixture(scope='module')
+def inputs():
+    return [x[:DAYS * 24] for x in EnergyHub.load_inputs()]
+
+
+def test_every_day_reproduces_hourly_model(inputs):
+    # With every day its own representative day the linked storage is the hourly storage balance
+    full = EnergyHub.EnergyHubModel(inputs, cache=None).build()
+    agg = EnergyHub.EnergyHubModel(inputs, aggregation_days=DAYS, cache=None).build()
+    assert np.array_equal(agg.rep_days.medoids[agg.rep_days.days], np.arange(DAYS))
+    assert agg.solve('cost') == pytest.approx(full.solve('cost'), rel=1e-7)
+    assert float(np.sum(agg.hub.co2.value)) == pytest.approx(float(np.sum(full.hub.co2.value)), rel=1e-6)
+    for name in ['E_ts', 'E_bat']:
+        assert getattr(agg.hub, name).value == pytest.approx(getattr(full.hub, name).value, abs=1e-3)
+
+
+
+@pytest.mark.parametrize('dt', [0.25, 0.5, 2, 4, 24])
+def test_resample_conserves_energy(dt):
+    elec = EnergyHub.load_inputs()[0]
+    steps = aggregation.resample(elec, dt)
+    assert len(steps) == len(elec) / dt
+    assert steps.sum() == pytest.approx(elec.sum(), rel=1e-12)
+    if dt < 1:  # The steps within an hour share its energy
+        assert steps.reshape(len(elec), -1).sum(axis=1) == pytest.approx(elec, rel=1e-12, abs=1e-9)
+    assert np.all(steps >= 0)
+
+
+def test_resample_mean():
+    wind = EnergyHub.load_inputs()[3]
+    assert aggregation.resample(wind, 24, mean=True) == pytest.approx(wind.reshape(-1, 24).mean(axis=1))
+    assert aggregation.resample(wind, 0.5, mean=True).mean() == pytest.approx(wind.mean(), rel=1e-3)
+    with pytest.raises(ValueError):
+        aggregation.resample(wind, 7)  # Does not divide the 8760 hours
+
+
+def test_aggregate_conserves_energy():
+    inputs = EnergyHub.load_inputs()
+    rep_days = aggregation.representative_days(list(inputs[:3]), 12)
+    for series in inputs[:3]:
+        assert rep_days.weights @ aggregation.aggregate(series, rep_days) == pytest.approx(series.sum(), rel=1e-12)
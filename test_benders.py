@@ -0,0 +1,40 @@
+""" Benders decomposition against the monolithic model, on two tiled years at daily time steps.
+
+    python -m pytest test_benders.py
+"""
+
+import numpy as np
+import pytest
+
+import aggregation
+import benders
+import EnergyHub
+
+DT = 24  # Time step of the test problems [h]
+
+
+def daily(inputs):
+    elec, heat, solar, wind = inputs
+    return [aggregation.resample(x, DT) for x in (elec, heat, solar)] + [aggregation.resample(wind, DT, mean=True)]
+
+
+@pytest.fixture(scope='module')
+def year():
+    return EnergyHub.load_inputs()
+
+
+def test_two_years(year):
+    # Operation is averaged over the years, in the monolithic model and in the subproblem
+    inputs = [np.tile(x, 2) for x in year]
+    monolithic = EnergyHub.EnergyHubModel(inputs, cache=None, dt=DT).build()
+    result = benders.solve_benders(EnergyHub.build_model, daily(inputs), dt=DT, log=None)
+    assert result.cost == pytest.approx(monolithic.solve('cost'), rel=1e-3)
+
+
+def test_year_blocks(year):
+    # Blocks of one year each, with empty storages at their start: the monolithic cost of one year
+    inputs = [np.tile(x, 2) for x in year]
+    one_year = EnergyHub.EnergyHubModel(year, cache=None, dt=DT).build()
+    result = benders.solve_benders(EnergyHub.build_model, daily(inputs), blocks=[len(year[0]) // DT] * 2, dt=DT,
+                                   processes=1, log=None)
+    assert result.cost == pytest.approx(one_year.solve('cost'), rel=1e-3)
@@ -0,0 +1,34 @@
+""" Monte Carlo samples that can not be solved are counted as failed.
+
+    python -m pytest test_montecarlo.py
+"""
+
+import cvxpy as cp
+import pytest
+
+import EnergyHub
+import montecarlo
+
+HOURS = 2 * 24  # Horizon of the test problem
+
+
+@pytest.fixture
+def model(monkeypatch):
+    inputs = [x[:HOURS] for x in EnergyHub.load_inputs()]
+    model = EnergyHub.EnergyHubModel(inputs, cache=None).build()
+    monkeypatch.setattr(montecarlo, '_model', model)
+    return model
+
+
+def test_sample(model):
+    results = montecarlo.solve_sample((0, montecarlo.draw(montecarlo.DISTRIBUTIONS, 0, 0)))
+    assert set(results) == set(montecarlo.RESULTS)
+
+
+@pytest.mark.parametrize('error', [RuntimeError('Energy hub problem is infeasible'), cp.error.SolverError('HiGHS')])
+def test_failed_sample(model, monkeypatch, error):
+    def solve(objective):
+        raise error
+
+    monkeypatch.setattr(model, 'solve', solve)
+    assert montecarlo.solve_sample((0, montecarlo.draw(montecarlo.DISTRIBUTIONS, 0, 0))) is None
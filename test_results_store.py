@@ -0,0 +1,47 @@
+""" Writing and reading scenarios of the results store, also from parallel writers.
+
+    python -m pytest test_results_store.py
+"""
+
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from results_store import ResultsStore
+
+
+def results(value):
+    return {'cost': value, 'E_bat': np.full(25, value)}
+
+
+def test_put_and_load(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    store.put('min_cost', results(1.0))
+    store.put('min_cost', results(2.0))  # Replaces the scenario
+    assert store.scenarios() == ['min_cost']
+    assert store.load('min_cost')['cost'] == 2.0
+    assert np.array_equal(store.load('min_cost')['E_bat'], np.full(25, 2.0))
+
+
+def _write(args):
+    root, worker = args
+    store = ResultsStore(root)
+    for i in range(20):
+        store.put('min_cost', results(float(worker)))
+
+
+def test_parallel_writers(tmp_path):
+    # Writers replacing the same scenario neither fail nor leave a mixed or temporary directory behind
+    with multiprocessing.get_context('fork').Pool(4) as pool:
+        pool.map(_write, [(str(tmp_path), worker) for worker in range(4)])
+    store = ResultsStore(str(tmp_path))
+    scenario = store.load('min_cost')
+    assert scenario['cost'] in range(4)
+    assert np.array_equal(scenario['E_bat'], np.full(25, scenario['cost']))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['min_cost']
+
+
+def test_invalid_name(tmp_path):
+    with pytest.raises(ValueError):
+        ResultsStore(str(tmp_path)).put('../min_cost', results(1.0))
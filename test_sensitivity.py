@@ -0,0 +1,28 @@
+""" Values and duals of the direct HiGHS solve of the sensitivity report against cvxpy's solve.
+
+    python -m pytest test_sensitivity.py
+"""
+
+import numpy as np
+import pytest
+
+import EnergyHub
+import sensitivity
+
+HOURS = 4 * 24  # Horizon of the test problem
+
+
+def test_primal_and_dual():
+    inputs = [x[:HOURS] for x in EnergyHub.load_inputs()]
+    model = EnergyHub.EnergyHubModel(inputs, cache=None).build()
+    EnergyHub.update_op_prices(model.hub)
+    prob = sensitivity.problem_of(model.hub)
+    lp = sensitivity.solve_lp(prob)
+    values = {var.id: var.value for var in prob.variables()}
+    duals = [sensitivity.dual(lp, con) for con in prob.constraints]
+    prob.solve(solver='HIGHS')
+    assert lp.value == pytest.approx(prob.value, rel=1e-9)
+    for var in prob.variables():
+        assert values[var.id] == pytest.approx(np.asarray(var.value), rel=1e-6, abs=1e-6)
+    for con, value in zip(prob.constraints, duals):
+        assert value == pytest.approx(np.reshape(con.dual_value, con.shape), rel=1e-6, abs=1e-9)
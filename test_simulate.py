@@ -0,0 +1,63 @@
+""" The rule-based dispatch against the LP: never cheaper than the optimal dispatch of the same design.
+
+    python -m pytest test_simulate.py
+"""
+
+import cvxpy as cp
+import numpy as np
+import pytest
+
+import components
+import dispatch
+import EnergyHub
+import simulate
+
+HOURS = 4 * 24  # Horizon of the test problems
+
+
+def lp_cost(model, design):
+    # Cost of the optimal dispatch of the design
+    hub = model.hub
+    fixed = [getattr(hub, name) == value for name, value in design.items() if name in hub.capacities]
+    prob = cp.Problem(cp.Minimize(hub.cost), hub.constraints + fixed)
+    prob.solve(solver='SCIPY')
+    assert prob.status == 'optimal'
+    return prob.value
+
+
+def check(model):
+    model.solve('cost')
+    optimum = dispatch.design_of(model.hub)
+    for scale in [1.0, 1.5, 2.0]:
+        design = {name: scale * float(value[0]) for name, value in optimum.items()}
+        res = simulate.simulate(model.hub, design)
+        assert res['feasible'][0]
+        assert res['cost'][0] >= lp_cost(model, design) * (1 - 1e-9)
+
+
+def test_default_technologies():
+    inputs = [x[:HOURS] for x in EnergyHub.load_inputs()]
+    check(EnergyHub.EnergyHubModel(inputs, cache=None).build())
+
+
+def test_technologies():
+    # No battery, wind turbines and an electric boiler
+    techs = components.load_technologies()
+    techs['storage'] = [tech for tech in techs['storage'] if tech['name'] != 'bat']
+    techs['renewable'][1]['max_cap'] = 500
+    techs['conversion'].append({'name': 'eb', 'input': 'elec', 'outputs': {'heat': 0.98}, 'capacity': 'heat',
+                                'cost': 150})
+    inputs = [x[:HOURS] for x in EnergyHub.load_inputs()]
+    model = EnergyHub.EnergyHubModel(inputs, cache=None, technologies=techs).build()
+    check(model)
+    res = simulate.simulate(model.hub, {'Cap_eb': 1000, 'Cap_pv': 1e4}, series=True)
+    assert res['Unmet_heat'][0] == pytest.approx(0, abs=1e-6)
+    assert np.all(res['P_in_eb'] >= 0) and 'Q_in_bat' not in res
+    with pytest.raises(ValueError):
+        simulate.simulate(model.hub, {'Cap_bat': 1000})
+
+
+def test_representative_days():
+    model = EnergyHub.EnergyHubModel(aggregation_days=4, cache=None).build()
+    with pytest.raises(ValueError):
+        simulate.simulate(model.hub, {'Cap_gb': 1000})
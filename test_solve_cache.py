@@ -0,0 +1,50 @@
+""" Hits, misses and the restored state of the solve cache.
+
+    python -m pytest test_solve_cache.py
+"""
+
+import cvxpy as cp
+import pytest
+
+from solve_cache import SolveCache
+
+
+def problem():
+    # min x s.t. x >= lower, x <= 10 (infeasible for lower > 10)
+    lower = cp.Parameter(value=1.0)
+    x = cp.Variable(name='x')
+    return cp.Problem(cp.Minimize(x), [x >= lower, x <= 10]), lower, x
+
+
+def test_hit_and_miss(tmp_path):
+    cache = SolveCache(str(tmp_path))
+    prob, lower, x = problem()
+    assert cache.solve(prob) == pytest.approx(1)
+    assert cache.solve(prob) == pytest.approx(1)
+    assert (cache.hits, cache.misses) == (1, 1)
+    lower.value = 2.0  # Other parameter values are another problem
+    assert cache.solve(prob) == pytest.approx(2)
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_disk_store(tmp_path):
+    prob, lower, x = problem()
+    SolveCache(str(tmp_path)).solve(prob)
+    cache = SolveCache(str(tmp_path))  # A new process, with an empty memory
+    x.value = None
+    assert cache.solve(prob) == pytest.approx(1)
+    assert cache.hits == 1 and x.value == pytest.approx(1)
+
+
+def test_hit_after_infeasible(tmp_path):
+    # The status of a hit is that of the stored solve, not that of the last real solve
+    cache = SolveCache(str(tmp_path))
+    prob, lower, x = problem()
+    cache.solve(prob)
+    lower.value = 20.0
+    cache.solve(prob)
+    assert prob.status == 'infeasible'
+    lower.value = 1.0
+    assert cache.solve(prob) == pytest.approx(1)
+    assert cache.hits == 1
+    assert prob.status == 'optimal' and prob.value == pytest.approx(1) and x.value == pytest.approx(1)
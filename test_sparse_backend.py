@@ -0,0 +1,73 @@
+""" The sparse backend against the cvxpy model, on a few days of the input series.
+
+    python -m pytest test_sparse_backend.py
+"""
+
+import numpy as np
+import pytest
+
+import components
+import EnergyHub
+import sparse_backend
+
+HOURS = 4 * 24  # Horizon of the test problems
+
+
+@pytest.fixture(scope='module')
+def model():
+    inputs = [x[:HOURS] for x in EnergyHub.load_inputs()]
+    return EnergyHub.EnergyHubModel(inputs, cache=None).build()
+
+
+@pytest.fixture(scope='module')
+def lp(model):
+    return sparse_backend.build_lp(model.hub)
+
+
+def check(model, res):
+    for name in ['cost', 'co2']:
+        assert float(np.sum(res[name])) == pytest.approx(float(np.sum(getattr(model.hub, name).value)), rel=1e-6)
+
+
+def test_min_cost(model, lp):
+    model.solve('cost')
+    check(model, sparse_backend.solve(lp, 'cost'))
+
+
+def test_min_co2(model, lp):
+    co2 = model.solve('co2')
+    assert float(np.sum(sparse_backend.solve(lp, 'co2')['co2'])) == pytest.approx(co2, rel=1e-6)  # The cost is not unique
+
+
+def test_co2_bound(model, lp):
+    co2_min = float(model.solve('co2'))
+    model.solve('cost')
+    co2_max = (co2_min + float(np.sum(model.hub.co2.value))) / 2
+    model.solve('cost', co2_max=co2_max)
+    res = sparse_backend.solve(lp, 'cost', co2_max=co2_max)
+    check(model, res)
+    assert float(np.sum(res['co2'])) == pytest.approx(co2_max, rel=1e-6)
+
+
+def test_years():
+    # Two years of inputs at daily time steps: operation is averaged over the years
+    inputs = [np.tile(x, 2) for x in EnergyHub.load_inputs()]
+    model = EnergyHub.EnergyHubModel(inputs, cache=None, dt=24).build()
+    assert model.hub.data_years == 2
+    model.solve('cost')
+    check(model, sparse_backend.solve(sparse_backend.build_lp(model.hub), 'cost'))
+
+
+def test_technologies(tmp_path):
+    # Another technology table: no battery, wind turbines and an electric boiler
+    techs = components.load_technologies()
+    techs['storage'] = [tech for tech in techs['storage'] if tech['name'] != 'bat']
+    techs['renewable'][1]['max_cap'] = 500
+    techs['conversion'].append({'name': 'eb', 'input': 'elec', 'outputs': {'heat': 0.98}, 'capacity': 'heat',
+                                'cost': 150})
+    inputs = [x[:HOURS] for x in EnergyHub.load_inputs()]
+    model = EnergyHub.EnergyHubModel(inputs, cache=None, technologies=techs).build()
+    model.solve('cost')
+    res = sparse_backend.solve(sparse_backend.build_lp(model.hub), 'cost')
+    check(model, res)
+    assert 'Cap_bat' not in res and res['Cap_eb'].shape == (1,)
@@ -0,0 +1,45 @@
+""" Problem statistics of the telemetry records, read from the compiled problem.
+
+    python -m pytest test_telemetry.py
+"""
+
+import json
+
+import cvxpy as cp
+import pytest
+import scipy.sparse as sp
+
+import telemetry
+
+
+@pytest.fixture
+def path(tmp_path, monkeypatch):
+    monkeypatch.setattr(telemetry, '_sizes', {})
+    telemetry.configure(str(tmp_path / 'runs.jsonl'))
+    yield tmp_path / 'runs.jsonl'
+    telemetry.configure(None)
+
+
+def test_problem_sizes(path, monkeypatch):
+    x = cp.Variable(3)
+    prob = cp.Problem(cp.Minimize(cp.sum(x)), [x >= cp.Parameter(3, value=[1, 2, 3]), x[0] + x[1] <= 10])
+    prob.solve(solver='SCIPY')
+    data, _, _ = prob.get_problem_data('SCIPY')
+    nonzeros = sum(v.nnz for v in data.values() if sp.issparse(v))
+
+    def compile_again(*args, **kwargs):
+        raise AssertionError('compiled again')
+
+    monkeypatch.setattr(prob, 'get_problem_data', compile_again)
+    telemetry.problem('prob', prob)
+    telemetry.emit('test')
+    stats = json.loads(path.read_text())['problems'][0]
+    assert (stats['status'], stats['variables'], stats['constraints'], stats['nonzeros']) == ('optimal', 3, 4, nonzeros)
+
+
+def test_cache_hit(path):
+    # A problem read from the solve cache was never compiled in this process
+    prob = cp.Problem(cp.Minimize(cp.sum(cp.Variable(2))), [])
+    telemetry.problem('prob', prob, cache_hit=True)
+    telemetry.emit('test')
+    assert json.loads(path.read_text())['problems'][0]['nonzeros'] is None
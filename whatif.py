@@ -0,0 +1,364 @@
+""" Local what-if service: a compiled energy hub kept in memory, answering scenario queries over HTTP/JSON.
+
+ The inputs are loaded and the problems of the model compiled once at startup; the worker processes are forked
+ from the server and inherit them, so a query only sets parameter values, solves and restores the baseline. A
+ scenario is a JSON object
+
+    {"objective": "cost" | "co2",          minimized (default cost)
+     "set": {"max_cap_bat": 100000},       parameter values (see EnergyHub.set_parameters, GET /parameters)
+     "scale": {"price_gas": 1.2},          parameters relative to their baseline values
+     "co2_max": 6e6, "inv_max": 3e7}       bounds on the total emissions (cost objective only) and investment
+                                           costs (optional)
+
+ and is answered with status, cost, co2, jobs, Inv and the capacities. Concurrent queries are collected into
+ batches (for window seconds, up to max_batch queries); identical scenarios in a batch or already being solved
+ share one solve and the unique ones are spread over the worker pool. Solutions are also read from the solve
+ cache of the model (solve_cache.py), so repeated scenarios are answered without solving across restarts.
+
+    POST /scenario      one scenario, or a list of scenarios (answered in order)
+    GET  /parameters    baseline values of the parameters
+    GET  /metrics       request counts and latencies (mean and percentiles of the queue, solve and total time)
+    GET  /health
+
+ The service only uses the standard library and binds to localhost by default.
+
+ Usage:
+
+    python whatif.py serve [--port 8765] [--aggregation-days 12] [--processes 4] [--window 0.005]
+    python whatif.py query '{"scale": {"price_gas": 1.2}}' '{"objective": "co2", "set": {"max_cap_bat": 1e5}}'
+    python whatif.py metrics
+
+ or, in Python, whatif.request('/scenario', {'scale': {'price_gas': 1.2}}).
+"""
+
+import argparse
+import asyncio
+import collections
+import http.client
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from components import CAPACITIES
+
+HOST = '127.0.0.1'
+PORT = 8765
+KPIS = ['cost', 'co2', 'jobs', 'Inv']
+OBJECTIVES = ['cost', 'co2']
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def baseline(hub):
+    """Scalar parameters of hub that queries may change (cvxpy parameters with a value and escalation rates)."""
+    import cvxpy as cp
+
+    values = {}
+    for name, value in vars(hub).items():
+        if isinstance(value, cp.Parameter) and value.size == 1 and value.value is not None:
+            values[name] = float(value.value)
+        elif name.startswith('esc_'):
+            values[name] = float(value)
+    return values
+
+
+def normalize(scenario, parameters):
+    """Scenario with defaults filled in, checked against the parameter names; its JSON text is the batching key."""
+    if not isinstance(scenario, dict):
+        raise ValueError('A scenario is a JSON object')
+    unknown = set(scenario) - {'objective', 'set', 'scale', 'co2_max', 'inv_max'}
+    if unknown:
+        raise ValueError(f'Unknown scenario fields {sorted(unknown)}')
+    objective = scenario.get('objective', 'cost')
+    if objective not in OBJECTIVES:
+        raise ValueError(f'Objective must be one of {OBJECTIVES}')
+    normal = {'objective': objective}
+    for key in ['set', 'scale']:
+        values = scenario.get(key, {})
+        if not isinstance(values, dict):
+            raise ValueError(f'{key!r} maps parameter names to numbers')
+        for name, value in values.items():
+            if name not in parameters:
+                raise ValueError(f'{name!r} is not a parameter of the energy hub (see GET /parameters)')
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or not np.isfinite(value):
+                raise ValueError(f'{key} {name!r} must be a finite number')
+        normal[key] = {name: float(value) for name, value in values.items()}
+    for key in ['co2_max', 'inv_max']:
+        if scenario.get(key) is not None:
+            value = scenario[key]
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or not value >= 0:
+                raise ValueError(f'{key} must be a nonnegative number')
+            normal[key] = float(value)
+    if objective == 'co2' and 'co2_max' in normal:
+        raise ValueError('co2_max bounds the cost objective, minimize co2 without it')
+    return normal
+
+
+# Scenario solves
+# ================
+# Run in the worker processes (forked from the server, so they inherit the compiled model and its baseline) or,
+# without forking, in a single worker thread of the server
+_model = None
+_baseline = {}
+
+
+def solve_scenario(key):
+    # Solve one normalized scenario (its JSON text) and restore the baseline parameter values
+    from EnergyHub import set_parameters
+
+    scenario = json.loads(key)
+    hub = _model.hub
+    values = dict(scenario['set'])
+    values.update({name: factor * _baseline[name] for name, factor in scenario['scale'].items()})
+    cache = _model.cache
+    hits = cache.hits if cache is not None else 0
+    start = time.perf_counter()
+    try:
+        set_parameters(hub, values)
+        _model.solve(scenario['objective'], co2_max=scenario.get('co2_max'), inv_max=scenario.get('inv_max'))
+        capacities = CAPACITIES + [name for name in hub.capacities if name not in CAPACITIES]
+        result = dict(status='optimal', **{name: float(np.sum(getattr(hub, name).value)) for name in KPIS + capacities})
+    except RuntimeError as e:
+        result = dict(status='error', error=str(e))
+    finally:
+        set_parameters(hub, {name: _baseline[name] for name in values})
+    result.update(solve_seconds=time.perf_counter() - start, cache_hit=cache is not None and cache.hits > hits)
+    return result
+
+
+class Metrics:
+    """Request counters and the latencies of the last window requests, by kind (queue, solve, total)."""
+
+    def __init__(self, window=1000):
+        self.start = time.time()
+        self.counts = collections.Counter()
+        self.latencies = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self.batch_sizes = collections.deque(maxlen=window)
+
+    def observe(self, kind, seconds):
+        self.latencies[kind].append(seconds)
+
+    def summary(self, in_flight=0):
+        latencies = {}
+        for kind, values in self.latencies.items():
+            x = np.array(values)
+            latencies[kind] = {'count': len(x), 'mean': float(x.mean()), 'p50': float(np.percentile(x, 50)),
+                               'p90': float(np.percentile(x, 90)), 'p99': float(np.percentile(x, 99)),
+                               'max': float(x.max())}
+        batches = np.array(self.batch_sizes) if self.batch_sizes else np.zeros(1)
+        return dict(uptime_seconds=time.time() - self.start, in_flight=in_flight, counts=dict(self.counts),
+                    mean_batch_size=float(batches.mean()), latency_seconds=latencies)
+
+
+class WhatIfService:
+    """Scenario queries of model (a built EnergyHubModel) over a pool of processes workers.
+
+    window is the time [s] a batch waits for concurrent queries after its first one, max_batch its largest size.
+    """
+
+    def __init__(self, model, processes=None, window=0.005, max_batch=64):
+        global _model, _baseline
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        self.model = model
+        self.window = window
+        self.max_batch = max_batch
+        self.metrics = Metrics()
+        hub = model.hub
+        _model, _baseline = model, baseline(hub)
+        self.parameters = dict(_baseline)
+        # Compile the problems of every objective and bounds once, before forking, so the workers only update
+        # parameter values
+        from EnergyHub import PROBLEMS
+        for name in PROBLEMS.values():
+            getattr(hub, name).get_problem_data(model.solver)
+        if processes > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            self.pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('fork'))
+            self.pool.submit(int).result()  # Fork all workers now, before the event loop runs
+        else:
+            self.pool = ThreadPoolExecutor(max_workers=1)
+        self.queue = None
+        self.in_flight = {}  # Futures of the scenarios being solved, by key
+
+    async def query(self, scenario):
+        """Answer one scenario (see the module docstring); ValueError for an invalid scenario."""
+        start = time.perf_counter()
+        key = json.dumps(normalize(scenario, self.parameters), sort_keys=True)
+        self.metrics.counts['scenarios'] += 1
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((key, future, start))
+        result = dict(await future)
+        self.metrics.observe('total', time.perf_counter() - start)
+        result['latency_seconds'] = time.perf_counter() - start
+        return result
+
+    async def _batches(self):
+        # Collect concurrent queries into batches and solve every new scenario of a batch once
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+            self.metrics.batch_sizes.append(len(batch))
+            self.metrics.counts['batches'] += 1
+            now = time.perf_counter()
+            for key, future, start in batch:
+                self.metrics.observe('queue', now - start)
+                if key in self.in_flight:
+                    self.metrics.counts['shared'] += 1
+                else:
+                    self.in_flight[key] = loop.run_in_executor(self.pool, solve_scenario, key)
+                    self.in_flight[key].add_done_callback(lambda _, key=key: self._solved(key))
+                self.in_flight[key].add_done_callback(lambda done, future=future: self._reply(done, future))
+
+    def _solved(self, key):
+        done = self.in_flight.pop(key)
+        if done.exception() is not None:
+            self.metrics.counts['errors'] += 1
+            return
+        result = done.result()
+        self.metrics.counts['solves'] += not result['cache_hit']
+        self.metrics.counts['cache_hits'] += result['cache_hit']
+        self.metrics.counts['errors'] += result['status'] != 'optimal'
+        self.metrics.observe('solve', result['solve_seconds'])
+
+    @staticmethod
+    def _reply(done, future):
+        if not future.done():
+            if done.exception() is not None:
+                future.set_exception(done.exception())
+            else:
+                future.set_result(done.result())
+
+    async def _respond(self, method, path, body):
+        # Status code and JSON reply of one HTTP request
+        if path == '/scenario':
+            if method != 'POST':
+                return 405, {'error': 'POST a scenario or a list of scenarios'}
+            try:
+                payload = json.loads(body or b'null')
+                if isinstance(payload, list):
+                    return 200, list(await asyncio.gather(*[self.query(scenario) for scenario in payload]))
+                return 200, await self.query(payload)
+            except ValueError as e:  # Also invalid JSON
+                self.metrics.counts['rejected'] += 1
+                return 400, {'error': str(e)}
+        if method != 'GET':
+            return 405, {'error': f'GET {path}'}
+        if path == '/metrics':
+            return 200, self.metrics.summary(len(self.in_flight))
+        if path == '/parameters':
+            return 200, self.parameters
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        return 404, {'error': f'Unknown path {path}'}
+
+    async def handle(self, reader, writer):
+        """Serve one HTTP/1.1 request of a connection (the connection is closed after the reply)."""
+        try:
+            method, path, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            self.metrics.counts['requests'] += 1
+            code, reply = await self._respond(method, path.split('?')[0], body)
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            code, reply = 400, {'error': f'Malformed request: {e}'}
+        except Exception as e:
+            code, reply = 500, {'error': f'{type(e).__name__}: {e}'}
+        data = json.dumps(reply).encode()
+        writer.write(f'HTTP/1.1 {code} {REASONS[code]}\r\nContent-Type: application/json\r\n'
+                     f'Content-Length: {len(data)}\r\nConnection: close\r\n\r\n'.encode() + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT, ready=None):
+        """Serve until cancelled; ready (a callable) is called once the server listens."""
+        self.queue = asyncio.Queue()
+        batches = asyncio.create_task(self._batches())
+        server = await asyncio.start_server(self.handle, host, port)
+        if ready is not None:
+            ready()
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batches.cancel()
+            self.pool.shutdown(cancel_futures=True)
+
+
+def request(path, payload=None, host=HOST, port=PORT, timeout=600):
+    """Client: GET path (or POST payload as JSON to it) on the service; returns the decoded reply.
+
+    Raises RuntimeError with the service's error for a reply other than 200.
+    """
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        if payload is None:
+            connection.request('GET', path)
+        else:
+            connection.request('POST', path, json.dumps(payload), {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        reply = json.loads(response.read())
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise RuntimeError(f'{response.status} {response.reason}: {reply.get("error")}')
+    return reply
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local what-if service of the energy hub (HTTP/JSON).')
+    parser.add_argument('command', choices=['serve', 'query', 'metrics'],
+                        help='run the service, send scenarios to it or print its metrics')
+    parser.add_argument('scenarios', nargs='*', help='query: scenarios as JSON objects (see whatif.py)')
+    parser.add_argument('--host', default=HOST, help=f'address of the service (default: {HOST})')
+    parser.add_argument('--port', type=int, default=PORT, help=f'port of the service (default: {PORT})')
+    parser.add_argument('--aggregation-days', type=int, default=None,
+                        help='serve: number of representative days optimized instead of the full year')
+    parser.add_argument('--technologies', default=None, help='serve: JSON file of the technologies')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='serve: worker processes (default: one per CPU core, 1: a single worker thread)')
+    parser.add_argument('--window', type=float, default=0.005,
+                        help='serve: seconds a batch waits for concurrent queries (default: 0.005)')
+    parser.add_argument('--no-cache', action='store_true', help='serve: always solve instead of reading cached solutions')
+    args = parser.parse_intermixed_args(argv)
+
+    if args.command == 'query':
+        scenarios = [json.loads(scenario) for scenario in args.scenarios] or [{}]
+        for scenario, result in zip(scenarios, request('/scenario', scenarios, args.host, args.port)):
+            print(json.dumps(scenario), '->', json.dumps(result))
+        return
+    if args.command == 'metrics':
+        print(json.dumps(request('/metrics', host=args.host, port=args.port), indent=2))
+        return
+
+    from EnergyHub import EnergyHubModel
+
+    start = time.perf_counter()
+    model = EnergyHubModel(aggregation_days=args.aggregation_days, cache=None if args.no_cache else True,
+                           technologies=args.technologies).build()
+    service = WhatIfService(model, args.processes, args.window)
+    print(f'Model built and compiled in {time.perf_counter() - start:.1f} s')
+    try:
+        asyncio.run(service.serve(args.host, args.port, ready=lambda: print(
+            f'Serving what-if queries on http://{args.host}:{args.port} (POST /scenario, GET /metrics)', flush=True)))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()